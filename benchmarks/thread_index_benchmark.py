@@ -0,0 +1,128 @@
+"""
+Thread Index Benchmark for SmartBrew Email Automation System
+Handles timing ThreadIndex against the dict-of-sets threading it replaced
+
+Run from the repository root:
+
+    python -m benchmarks.thread_index_benchmark [--messages 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.thread_index import ThreadIndex
+
+
+def synthetic_messages(count, seed=7):
+    """
+    Build (Message-ID, References, In-Reply-To) for conversations of 1 to 8 messages.
+
+    Most replies reference every earlier message of their conversation; one
+    in four carries only In-Reply-To, as some mail clients send. The list is
+    shuffled, so replies often come before the messages they answer.
+    """
+    rng = random.Random(seed)
+    messages = []
+    conversation = 0
+    while len(messages) < count:
+        chain = []
+        for _ in range(min(rng.randint(1, 8), count - len(messages))):
+            message_id = f'<{conversation}.{len(chain)}.{rng.getrandbits(48):012x}@mail.example.com>'
+            references = '' if rng.random() < 0.25 else ' '.join(chain)
+            messages.append((message_id, references, chain[-1] if chain else ''))
+            chain.append(message_id)
+        conversation += 1
+    rng.shuffle(messages)
+    return messages, conversation
+
+
+def legacy_threads(messages):
+    """The threading extract_emails used before ThreadIndex: a set of Message-IDs per thread."""
+    thread_mapping = {}
+    message_id_to_thread = {}
+
+    for message_id, references, in_reply_to in messages:
+        if not message_id:
+            continue
+
+        ref_list = references.split() if references else []
+        if in_reply_to and in_reply_to not in ref_list:
+            ref_list.append(in_reply_to)
+
+        candidates = [message_id] + ref_list
+        thread_id = next((message_id_to_thread[ref] for ref in candidates if ref in message_id_to_thread), None)
+        if not ref_list:
+            thread_id = thread_id or message_id
+            thread_mapping.setdefault(thread_id, set()).add(message_id)
+            message_id_to_thread[message_id] = thread_id
+            continue
+
+        if thread_id:
+            thread_mapping[thread_id].add(message_id)
+            message_id_to_thread[message_id] = thread_id
+        else:
+            thread_mapping[message_id] = set(candidates)
+            for ref in candidates:
+                message_id_to_thread[ref] = message_id
+
+    return message_id_to_thread, thread_mapping
+
+
+def measure(build):
+    """Return (result, seconds, peak bytes) of one build."""
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--messages', type=int, default=100000, help='Number of synthetic messages')
+    args = parser.parse_args()
+
+    messages, conversations = synthetic_messages(args.messages)
+    print(f"{len(messages)} messages in {conversations} conversations")
+
+    def build_index():
+        threads = ThreadIndex()
+        threads.add_all(messages)
+        return threads
+
+    threads, index_seconds, index_peak = measure(build_index)
+    (legacy_mapping, _), legacy_seconds, legacy_peak = measure(lambda: legacy_threads(messages))
+
+    start = time.perf_counter()
+    for message_id, _, _ in messages:
+        threads.thread_size(message_id)
+    lookup_seconds = time.perf_counter() - start
+
+    index_count = len({threads.thread_id(message_id) for message_id, _, _ in messages})
+    legacy_count = len({legacy_mapping[message_id] for message_id, _, _ in messages})
+
+    reordered = ThreadIndex()
+    reordered.add_all(reversed(messages))
+    order_independent = all(
+        threads.thread_id(message_id) == reordered.thread_id(message_id) for message_id, _, _ in messages
+    )
+
+    print(f"{'':12}{'build':>10}{'peak memory':>14}{'threads':>10}")
+    print(f"{'ThreadIndex':12}{index_seconds:>9.3f}s{index_peak / 2 ** 20:>11.1f} MB{index_count:>10}")
+    print(f"{'legacy':12}{legacy_seconds:>9.3f}s{legacy_peak / 2 ** 20:>11.1f} MB{legacy_count:>10}")
+    print(f"thread_size lookups: {lookup_seconds / len(messages) * 1e6:.2f} µs each")
+    print(f"expected threads: {conversations}, same threads in reverse order: {order_independent}")
+
+
+if __name__ == '__main__':
+    main()
@@ -217,6 +217,52 @@ def create_pie_chart(data, value_column, names_column, title, color_map=None):
     
     return fig
 
+def create_bar_chart(data, x_column, y_column, title, x_title=None, y_title=None):
+    """
+    Create a bar chart for data visualization, keeping the categories in data order
+    
+    Parameters:
+    -----------
+    data : pandas.DataFrame
+        Data to visualize
+    x_column : str
+        Column name for the categories
+    y_column : str
+        Column name for the bar heights
+    title : str
+        Chart title
+    x_title : str, optional
+        X axis title; defaults to x_column
+    y_title : str, optional
+        Y axis title; defaults to y_column
+    
+    Returns:
+    --------
+    plotly.graph_objects.Figure
+        Plotly figure object
+    """
+    fig = px.bar(
+        data,
+        x=x_column,
+        y=y_column,
+        title=title,
+        labels={x_column: x_title or x_column, y_column: y_title or y_column}
+    )
+    
+    # Keep categories such as weekdays in the order given, and match the pie chart's look
+    fig.update_xaxes(type='category', categoryorder='array', categoryarray=list(data[x_column]))
+    fig.update_layout(
+        height=300,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(
+            color='gray' if st.session_state.theme == 'dark' else 'black',
+            size=12
+        )
+    )
+    
+    return fig
+
 # CSV download link
 def get_csv_download_link(df, filename="data.csv"):
     """
@@ -7,12 +7,36 @@ import streamlit as st
 import pandas as pd
 import os
 import tempfile
+import io
 from datetime import datetime
 
 # Import utility functions
-from src.utils.email_sender import send_email, send_bulk_emails
+from src.utils.email_sender import send_email
+from src.utils.rate_limiter import RateLimitPolicy, WarmupRamp, WARMUP_CURVES
+from src.utils.job_store import JobStore, JOB_QUEUED, JOB_RUNNING, JOB_FAILED, JOB_CANCELLED
+from src.utils.sender_pool import SenderAccount, SHARDING_STRATEGIES
+from src.utils.recipient_preflight import (
+    PreflightResult, load_blocked_domains, preflight_recipients, read_recipients_frame
+)
+from src.services.bulk_send_worker import BulkSendWorker
 from src.components.ui_components import create_pie_chart
 
+@st.cache_resource
+def get_job_store():
+    """Return the job store shared by all sessions"""
+    return JobStore()
+
+@st.cache_resource
+def get_bulk_send_worker():
+    """Return the background worker shared by all sessions"""
+    return BulkSendWorker(get_job_store())
+
+@st.cache_data(show_spinner="Checking recipients...")
+def run_preflight(file_bytes: bytes, drop_role_accounts: bool, blocked_domains: frozenset) -> PreflightResult:
+    """Run the recipient preflight once per uploaded file and settings"""
+    df = read_recipients_frame(io.BytesIO(file_bytes))
+    return preflight_recipients(df, blocked_domains, drop_role_accounts)
+
 def show_bulk_email_sender_page():
     """Display the Bulk Email Sender page with all functionality"""
     st.subheader("📨 Bulk Email Sender")
@@ -144,6 +168,36 @@ def show_bulk_email_sender_page():
                 help="CSV file must include 'Name' and 'Email' columns"
             )
             
+            # Clean the list before anything is sent
+            preflight = None
+            if uploaded_file:
+                drop_role_accounts = st.checkbox(
+                    "Skip role accounts",
+                    value=False,
+                    help="Leave out shared mailboxes such as info@, sales@ and support@"
+                )
+                try:
+                    preflight = run_preflight(uploaded_file.getvalue(), drop_role_accounts, load_blocked_domains())
+                except Exception as e:
+                    st.error(f"Error checking recipients: {str(e)}")
+                else:
+                    summary = preflight.summary()
+                    check_col1, check_col2, check_col3, check_col4 = st.columns(4)
+                    check_col1.metric("Recipients", summary['total'])
+                    check_col2.metric("Ready to Send", summary['clean'])
+                    check_col3.metric("Rejected", summary['rejected'])
+                    check_col4.metric("Role Accounts", summary['role_accounts'])
+
+                    if summary['rejected']:
+                        with st.expander(f"Rejected Recipients ({summary['rejected']})"):
+                            st.dataframe(preflight.rejects, use_container_width=True)
+                            st.download_button(
+                                "Download Rejects Report",
+                                preflight.rejects.to_csv(index=False),
+                                "rejected_recipients.csv",
+                                "text/csv"
+                            )
+
             # Sample CSV template download
             if not uploaded_file:
                 sample_data = {
@@ -162,6 +216,134 @@ def show_bulk_email_sender_page():
                     "text/csv",
                     help="Download a sample CSV template to see the required format"
                 )
+
+            # Sending rate settings
+            with st.expander("Sending Rate"):
+                rate_col1, rate_col2 = st.columns(2)
+                with rate_col1:
+                    messages_per_minute = st.number_input(
+                        "Emails per minute",
+                        min_value=0.1,
+                        max_value=60.0,
+                        value=1.0,
+                        step=0.1,
+                        help="Sustained sending rate for this account"
+                    )
+                    burst = st.number_input(
+                        "Burst size",
+                        min_value=1,
+                        max_value=50,
+                        value=1,
+                        help="Number of emails that may go out back-to-back before pacing starts"
+                    )
+                with rate_col2:
+                    jitter = st.number_input(
+                        "Random jitter (seconds)",
+                        min_value=0,
+                        max_value=120,
+                        value=0,
+                        help="Adds a random delay of up to this many seconds between emails"
+                    )
+                    warmup_curve = st.selectbox(
+                        "Warm-up ramp",
+                        ["None"] + [curve.title() for curve in WARMUP_CURVES],
+                        help="Start slower and ramp up to the full rate over the first emails"
+                    )
+                    warmup_messages = st.number_input(
+                        "Warm-up length (emails)",
+                        min_value=1,
+                        max_value=1000,
+                        value=50,
+                        disabled=warmup_curve == "None"
+                    )
+                concurrency = st.number_input(
+                    "Parallel SMTP sessions",
+                    min_value=1,
+                    max_value=10,
+                    value=1,
+                    help="Keep several connections open to reach the sending rate when it is higher than one connection can deliver"
+                )
+
+            rate_limit_policy = RateLimitPolicy(
+                messages_per_minute=messages_per_minute,
+                burst=int(burst),
+                jitter=float(jitter),
+                warmup=WarmupRamp(messages=int(warmup_messages), curve=warmup_curve.lower())
+                if warmup_curve != "None" else None
+            )
+
+            # Extra sender accounts to spread the campaign over
+            with st.expander("Additional Sender Accounts"):
+                extra_account_count = st.number_input(
+                    "Number of additional accounts",
+                    min_value=0,
+                    max_value=10,
+                    value=0,
+                    help="Shard recipients across several mailboxes to raise the daily volume"
+                )
+                primary_quota = st.number_input(
+                    "Daily quota for your account",
+                    min_value=1,
+                    max_value=10000,
+                    value=500,
+                    help="Stop using an account once it has sent this many emails today, across all campaigns"
+                )
+                sharding_strategy = st.selectbox(
+                    "Sharding strategy",
+                    list(SHARDING_STRATEGIES),
+                    format_func=lambda strategy: strategy.replace('_', ' ').title(),
+                    help="Least loaded sends from the account that is free soonest; weighted round-robin takes turns"
+                )
+
+                extra_accounts = []
+                for index in range(int(extra_account_count)):
+                    acc_col1, acc_col2, acc_col3 = st.columns([2, 2, 1])
+                    with acc_col1:
+                        extra_email = st.text_input(f"Account {index + 2} Email", key=f"extra_sender_email_{index}")
+                    with acc_col2:
+                        extra_password = st.text_input(
+                            f"Account {index + 2} App Password", type="password", key=f"extra_sender_password_{index}"
+                        )
+                    with acc_col3:
+                        extra_quota = st.number_input(
+                            "Daily quota", min_value=1, max_value=10000, value=500, key=f"extra_sender_quota_{index}"
+                        )
+                    if extra_email and extra_password:
+                        extra_accounts.append(SenderAccount(
+                            extra_email, extra_password, int(extra_quota), rate_limit_policy=rate_limit_policy
+                        ))
+
+            sender_accounts = None
+            if extra_accounts:
+                sender_accounts = [
+                    SenderAccount(email_id, app_password, int(primary_quota), rate_limit_policy=rate_limit_policy)
+                ] + extra_accounts
+
+            # Jobs that stopped before finishing can be resumed from the job store
+            job_store = get_job_store()
+            worker = get_bulk_send_worker()
+            unfinished_jobs = [
+                job for job in job_store.list_jobs(statuses=[JOB_QUEUED, JOB_RUNNING, JOB_FAILED, JOB_CANCELLED])
+                if not worker.is_running(job['id'])
+            ]
+            resume_job = None
+            if unfinished_jobs:
+                job_labels = {
+                    f"{job['id']} · {job['subject'] or '(No Subject)'} · {job['created_at']}": job
+                    for job in unfinished_jobs
+                }
+                resume_choice = st.selectbox(
+                    "Resume an interrupted job",
+                    ["Start a new job"] + list(job_labels),
+                    help="Continue a previous campaign from the first recipient that was not yet sent"
+                )
+                resume_job = job_labels.get(resume_choice)
+                if resume_job:
+                    progress = job_store.progress(resume_job['id'])
+                    st.info(
+                        f"{progress['sent']} sent, {progress['failed']} failed, {progress['pending']} pending "
+                        f"of {progress['total']}. The job's saved subject and message will be used."
+                    )
         else:
             # Single email section
             col1, col2 = st.columns(2)
@@ -371,36 +553,49 @@ Warm regards,
                                 }
                                 
                     else:  # Bulk Email (CSV)
-                        if not uploaded_file:
+                        if not uploaded_file and not resume_job:
                             st.error("Please upload a CSV file")
+                        elif not resume_job and (preflight is None or preflight.clean.empty):
+                            st.error("The CSV has no valid recipients to send to")
                         else:
-                            with st.spinner("Sending emails..."):
-                                try:
-                                    # Send bulk emails
-                                    result = send_bulk_emails(
-                                        email_id, app_password, uploaded_file,
-                                        subject, message, cc_email, 
+                            try:
+                                if resume_job:
+                                    # Resume with the content saved for the job
+                                    job_id = worker.resume(
+                                        resume_job['id'], app_password,
+                                        attachment_paths if attachment_paths else None,
+                                        rate_limit_policy=rate_limit_policy,
+                                        cleanup_paths=temp_files,
+                                        concurrency=int(concurrency),
+                                        accounts=sender_accounts,
+                                        sharding_strategy=sharding_strategy
+                                    )
+                                else:
+                                    # Queue bulk emails in the background
+                                    job_id = worker.submit(
+                                        email_id, app_password, preflight.clean_csv(),
+                                        subject, message, cc_email,
                                         attachment_paths if attachment_paths else None,
-                                        executive_name, executive_number, executive_gender
+                                        executive_name, executive_number, executive_gender,
+                                        rate_limit_policy=rate_limit_policy,
+                                        cleanup_paths=temp_files,
+                                        concurrency=int(concurrency),
+                                        accounts=sender_accounts,
+                                        sharding_strategy=sharding_strategy
                                     )
-                                    
-                                    # Store in session state
-                                    st.session_state.last_send_result = {
-                                        'type': 'bulk',
-                                        'success': result['success_count'],
-                                        'failed': result['failed_count'],
-                                        'last_email': result['last_email'],
-                                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    }
-                                    
-                                    # Show success card
-                                    st.success(f"Successfully sent {result['success_count']} emails. Last email sent to {result['last_email']}")
-                                    
-                                    # Show visualization
-                                    show_send_results(result)
-                                    
-                                except Exception as e:
-                                    st.error(f"Error sending bulk emails: {str(e)}")
+
+                                # The worker now owns the attachment files
+                                temp_files = []
+
+                                # Track the job for this session
+                                st.session_state.setdefault('bulk_job_ids', [])
+                                if job_id not in st.session_state.bulk_job_ids:
+                                    st.session_state.bulk_job_ids.append(job_id)
+
+                                st.success(f"Bulk send job {job_id} started in the background. You can keep using the app while it runs.")
+
+                            except Exception as e:
+                                st.error(f"Error sending bulk emails: {str(e)}")
                     
                     # Clean up temporary files
                     for temp_file in temp_files:
@@ -472,6 +667,10 @@ Warm regards,
                             )
                             
                             st.plotly_chart(fig)
+
+        # Background bulk send jobs started from this session
+        if st.session_state.get('bulk_job_ids'):
+            show_bulk_jobs(get_bulk_send_worker(), st.session_state.bulk_job_ids)
     
     with tab2:
         st.markdown("### Email Templates")
@@ -631,6 +830,47 @@ Warm regards,
             - Balance your text-to-link ratio
             """)
 
+def show_bulk_jobs(worker, job_ids):
+    """Display the progress of background bulk send jobs"""
+    st.markdown("### 📬 Bulk Send Jobs")
+
+    refresh_col1, refresh_col2 = st.columns([3, 1])
+    with refresh_col1:
+        st.caption("Jobs keep sending in the background. Refresh to see their latest progress.")
+    with refresh_col2:
+        st.button("Refresh Progress", key="refresh_bulk_jobs", use_container_width=True)
+
+    for job_id in reversed(job_ids):
+        job = worker.status(job_id)
+        if not job:
+            continue
+
+        progress = job['progress']
+        processed = progress['sent'] + progress['failed']
+        total = progress['total']
+
+        with st.container():
+            st.markdown(f"**Job {job_id}** · {job['subject'] or '(No Subject)'} · started {job['created_at']}")
+            st.progress(
+                processed / total if total else 1.0,
+                text=f"{processed} of {total} processed ({progress['sent']} sent, {progress['failed']} failed)"
+            )
+
+            if job['active']:
+                if st.button("Cancel Job", key=f"cancel_bulk_job_{job_id}"):
+                    worker.cancel(job_id)
+                    st.info("Cancelling after the current email...")
+            elif job['finished']:
+                if job['error']:
+                    st.error(f"Job stopped with an error: {job['error']}")
+                show_send_results({
+                    'success': progress['sent'],
+                    'failed': progress['failed'],
+                    'last_email': worker.job_store.last_sent_email(job_id)
+                })
+            else:
+                st.warning("This job was interrupted. Select it under \"Resume an interrupted job\" to continue.")
+
 def show_send_results(result):
     """Display sending results with visualization"""
     # Create results container
@@ -9,7 +9,8 @@ from datetime import datetime, timedelta
 
 # Import utility functions
 from src.utils.campaign_matcher import match_campaigns
-from src.components.ui_components import create_pie_chart, get_csv_download_link
+from src.utils.campaign_analytics import analyze_campaigns
+from src.components.ui_components import create_bar_chart, create_pie_chart, get_csv_download_link
 
 def show_campaign_matcher_page():
     """Display the Campaign Matcher page with all functionality"""
@@ -152,9 +153,9 @@ def show_campaign_matcher_page():
             )
         with col2:
             executive_email = st.text_input(
-                "Executive Email (optional)", 
-                placeholder="executive@smartbrew.com",
-                help="Filter campaigns that have this executive in CC"
+                "Executive Emails (optional)", 
+                placeholder="executive@smartbrew.com, another@smartbrew.com",
+                help="Filter campaigns that have any of these executives in CC. Separate several with commas; each is reported on its own"
             )
         
         # Filter options in a clean layout
@@ -200,9 +201,11 @@ def show_campaign_matcher_page():
                         
                     with st.spinner(f"Matching campaigns {date_range_text}... This may take a few minutes."):
                         # Use the campaign matcher utility
+                        # Several executives are matched in one pass over the Sent folder
                         df = match_campaigns(
                             campaign_email, app_password, 
-                            executive_email, start_date, end_date, subject_filter
+                            start_date=start_date, end_date=end_date, subject_filter=subject_filter,
+                            executive_emails=[executive_email] if executive_email else None
                         )
                         
                         # Check if we got results
@@ -269,7 +272,8 @@ def show_campaign_matcher_page():
         
         - Date range: Filter campaigns between specific dates
         - Subject keywords: Filter by campaign type
-        - Executive: See performance by team member
+        - Executive: See performance by team member. Enter several executives, separated by
+          commas, to compare them in one run
         
         For best results, use specific date ranges and executive filters to focus your analysis.
         """)
@@ -301,7 +305,11 @@ def show_matching_results(df, executive_email, date_range_text=None):
             "Date": st.column_config.TextColumn("Date Sent"),
             "Subject": st.column_config.TextColumn("Subject Line"),
             "Status": st.column_config.TextColumn("Response Status"),
-            "Executive Name": st.column_config.TextColumn("Executive")
+            "Executive Name": st.column_config.TextColumn("Executive"),
+            # Used by the reply analytics below, and kept in the CSV download
+            "Sent At": None,
+            "First Reply At": None,
+            "Thread ID": None
         },
         use_container_width=True,
         hide_index=True
@@ -384,4 +392,103 @@ def show_matching_results(df, executive_email, date_range_text=None):
         except Exception:
             # If visualization fails, don't show it
             st.warning("Could not create visualizations for this data.") 
-            st.warning("Could not create visualizations for this data.") 
\ No newline at end of file
+            st.warning("Could not create visualizations for this data.")
+
+    # Reply timing and follow-up attribution
+    show_reply_analytics(df)
+
+def show_reply_analytics(df):
+    """Display time to first reply, reply rate by send time, and replies per follow-up and executive"""
+    try:
+        analytics = analyze_campaigns(df)
+    except Exception:
+        st.warning("Could not analyze reply timing for this data.")
+        return
+
+    summary = analytics.summary
+    if not summary['sends']:
+        return
+
+    st.markdown("### Reply Analytics")
+    st.caption(
+        "Each message to a recipient is a touch. A reply is credited to the last touch sent before it, "
+        "and the time to reply is measured from that touch."
+    )
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Messages Sent", summary['sends'])
+    col2.metric("Replied", summary['replies'], f"{summary['reply_rate']}%", delta_color="off")
+    col3.metric("Median Time to Reply", _format_hours(summary['median_hours']))
+    col4.metric("90% Replied Within", _format_hours(summary['p90_hours']))
+
+    tab1, tab2, tab3, tab4 = st.tabs(["Time to Reply", "Send Time", "Follow-ups", "Executives"])
+
+    with tab1:
+        if summary['median_hours'] is None:
+            st.info("No reply times found. Run the matcher again to record when replies arrived.")
+        else:
+            _show_bar_chart(
+                analytics.latency.rename_axis('Bucket').reset_index(), 'Bucket', 'Replies',
+                "Time to First Reply", x_title="Time to first reply"
+            )
+
+    with tab2:
+        col1, col2 = st.columns(2)
+        with col1:
+            _show_bar_chart(
+                analytics.by_hour.reset_index(), 'Hour', 'Reply Rate',
+                "Reply Rate by Hour Sent", y_title="Reply rate (%)"
+            )
+        with col2:
+            _show_bar_chart(
+                analytics.by_weekday.reset_index(), 'Weekday', 'Reply Rate',
+                "Reply Rate by Day Sent", x_title="Day", y_title="Reply rate (%)"
+            )
+
+    with tab3:
+        st.dataframe(
+            analytics.by_touch.reset_index(),
+            column_config={
+                "Touch": st.column_config.TextColumn("Follow-up Number"),
+                "Sent": st.column_config.NumberColumn("Sent"),
+                "Replied": st.column_config.NumberColumn("Replied"),
+                "Reply Rate": st.column_config.NumberColumn("Reply Rate (%)"),
+                "Median Hours": st.column_config.NumberColumn("Median Hours to Reply"),
+                "P90 Hours": st.column_config.NumberColumn("90th Percentile Hours")
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+    with tab4:
+        st.dataframe(
+            analytics.by_executive.reset_index(),
+            column_config={
+                "Executive Name": "Executive",
+                "Sent": st.column_config.NumberColumn("Sent"),
+                "Replied": st.column_config.NumberColumn("Replied"),
+                "Reply Rate": st.column_config.NumberColumn("Reply Rate (%)"),
+                "Median Hours": st.column_config.NumberColumn("Median Hours to Reply"),
+                "P90 Hours": st.column_config.NumberColumn("90th Percentile Hours")
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+def _show_bar_chart(data, x_column, y_column, title, x_title=None, y_title=None):
+    """Display a bar chart, with a warning instead if it cannot be drawn"""
+    try:
+        st.plotly_chart(
+            create_bar_chart(data, x_column, y_column, title, x_title, y_title),
+            use_container_width=True
+        )
+    except Exception:
+        st.warning(f"Could not create the {title.lower()} chart.")
+
+def _format_hours(hours):
+    """Format a number of hours for display, in days once it passes two days"""
+    if hours is None:
+        return "-"
+    if hours >= 48:
+        return f"{hours / 24:.1f} days"
+    return f"{hours:.1f} hours" 
@@ -3,14 +3,21 @@ Email Extractor Page Module for SmartBrew Email Automation System
 Handles the UI and functionality for extracting emails
 """
 
+import tempfile
+import time
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 
 # Import utility functions
-from src.utils.email_extractor import extract_emails
+from src.services.imap_search import SearchFilter
+from src.utils.email_extractor import iter_extracted_emails
 from src.components.ui_components import create_pie_chart, get_csv_download_link
 
+# Rows kept for the on-page table; the CSV download always has every row
+PREVIEW_ROWS = 5000
+
 def show_email_extractor_page():
     """Display the Email Extractor page with all functionality"""
     st.subheader("📧 Email Extractor")
@@ -18,7 +25,7 @@ def show_email_extractor_page():
     # Create a professional card-like container
     st.markdown("""
     <div style="padding: 10px; border-radius: 10px; background-color: var(--background-color); border: 1px solid var(--border-color);">
-    <p style="color: var(--text-color); margin: 0;">Extract email data from your inbox or sent folder based on filters. Process up to 3000+ emails at once for detailed analysis.</p>
+    <p style="color: var(--text-color); margin: 0;">Extract email data from your inbox or sent folder based on filters. Process whole folders at once for detailed analysis.</p>
     </div>
     """, unsafe_allow_html=True)
     
@@ -162,9 +169,60 @@ def show_email_extractor_page():
         subject_filter = st.text_input(
             "Subject Filter (optional)",
             placeholder="Enter keywords to filter by subject",
-            help="Only extract emails containing these words in the subject line"
+            help="Only extract emails containing all of these words in the subject line. Put a phrase in double quotes to match it as a whole"
         )
         
+        # Address, attachment and size filters, all applied by the mail server
+        with st.expander("More Filters"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                sender_filter = st.text_input("From", placeholder="name@example.com", help="Only emails whose sender contains this text")
+            with col2:
+                recipient_filter = st.text_input("To", placeholder="name@example.com", help="Only emails whose recipients contain this text")
+            with col3:
+                cc_filter = st.text_input("CC", placeholder="name@example.com", help="Only emails whose CC contains this text")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                has_attachment = st.checkbox("Has attachment", help="Only emails with attachments")
+            with col2:
+                min_size_kb = st.number_input("Larger than (KB)", min_value=0, value=0, help="0 for no minimum")
+            with col3:
+                max_size_kb = st.number_input("Smaller than (KB)", min_value=0, value=0, help="0 for no maximum")
+        
+        # Limits are off by default, so every matching email is extracted
+        with st.expander("Advanced Options"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                max_emails = st.number_input(
+                    "Maximum Emails",
+                    min_value=0,
+                    value=0,
+                    step=500,
+                    help="Stop after this many emails (0 for no limit)"
+                )
+            with col2:
+                batch_size = st.number_input(
+                    "Batch Size",
+                    min_value=10,
+                    max_value=1000,
+                    value=100,
+                    step=10,
+                    help="Emails fetched per IMAP request"
+                )
+            with col3:
+                time_budget = st.number_input(
+                    "Time Limit (minutes)",
+                    min_value=0,
+                    value=0,
+                    help="Stop extracting after this long and keep what was found (0 for no limit)"
+                )
+            st.caption(
+                "The first extraction copies the headers of your whole Sent and Inbox folders into a local "
+                "index, whatever the date range, so it can take a while on a large mailbox. Later extractions "
+                "only download new mail. If the time limit runs out while indexing, extract again to continue."
+            )
+        
         # Extract button
         extract_col1, extract_col2, extract_col3 = st.columns([1, 2, 1])
         with extract_col2:
@@ -178,7 +236,7 @@ def show_email_extractor_page():
                     if end_date:
                         date_range_text += f" to {end_date}"
                     
-                    # Extract emails with progress
+                    # Extract emails with live progress
                     with st.spinner("Extracting Email ids..."):
                         # Create a progress bar
                         progress_bar = st.progress(0)
@@ -186,69 +244,99 @@ def show_email_extractor_page():
                         
                         # Show thread mapping message
                         status_text.text("Analyzing email threads for accurate response tracking...")
-                        progress_bar.progress(25)
+                        
+                        # Rows are shown and written to CSV batch by batch as they arrive
+                        st.markdown("### Email Data")
+                        st.markdown("""
+                        <style>
+                            .dataframe-container {
+                                max-height: 400px;
+                                overflow-y: auto;
+                                border: 1px solid var(--border-color);
+                                border-radius: 5px;
+                                padding: 5px;
+                            }
+                        </style>
+                        """, unsafe_allow_html=True)
+                        
+                        with st.container():
+                            st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
+                            table_slot = st.empty()
+                            st.markdown('</div>', unsafe_allow_html=True)
+                        # Only the first PREVIEW_ROWS rows stay in memory; counts are kept as rows arrive
+                        frames = []
+                        preview_count = 0
+                        table_refreshed_at = 0  # The table is redrawn at most once a second
+                        extracted_count = 0
+                        responded_count = 0
+                        notice = None
+                        csv_file = tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8')
                         
                         # Extract emails with optimized settings
-                        emails = extract_emails(
+                        for progress in iter_extracted_emails(
                             email_id=email_id,
                             app_password=app_password,
                             start_date=start_date,
                             end_date=end_date,
                             folder=folder,
-                            batch_size=100,  # Process 100 emails at a time
-                            max_emails=3000,  # Allow up to 3000 emails
-                            subject_filter=subject_filter if subject_filter else None
-                        )
+                            batch_size=int(batch_size),
+                            max_emails=int(max_emails) or None,
+                            subject_filter=subject_filter if subject_filter else None,
+                            time_budget=time_budget * 60 if time_budget else None,
+                            search=SearchFilter(
+                                sender=sender_filter or None,
+                                recipient=recipient_filter or None,
+                                cc=cc_filter or None,
+                                has_attachment=has_attachment,
+                                larger=int(min_size_kb) * 1024 or None,
+                                smaller=int(max_size_kb) * 1024 or None
+                            )
+                        ):
+                            notice = progress.notice or notice
+                            if progress.total:
+                                progress_bar.progress(
+                                    progress.processed / progress.total,
+                                    text=f"Processed {progress.processed} of {progress.total} emails"
+                                )
+                            
+                            # Filters were applied by the server's search, so every row is kept
+                            if not progress.rows:
+                                continue
+                            batch_df = pd.DataFrame(progress.rows)
+                            
+                            batch_df.to_csv(csv_file, index=False, header=not extracted_count)
+                            extracted_count += len(batch_df)
+                            responded_count += int((batch_df['Status'] == 'Responded').sum())
+                            if preview_count < PREVIEW_ROWS:
+                                frames.append(batch_df.head(PREVIEW_ROWS - preview_count))
+                                preview_count += len(frames[-1])
+                                if time.monotonic() - table_refreshed_at >= 1:
+                                    show_table(table_slot, pd.concat(frames, ignore_index=True))
+                                    table_refreshed_at = time.monotonic()
+                            status_text.text(f"Extracted {extracted_count} emails so far...")
                         
                         # Update progress
                         progress_bar.progress(100)
                         status_text.text("Extraction complete!")
+                        if notice:
+                            st.warning(notice)
                         
-                        if emails:
-                            # Convert to DataFrame
-                            df = pd.DataFrame(emails)
-                            
-                            # Apply client-side subject filtering if provided
-                            if subject_filter and not df.empty and 'Subject' in df.columns:
-                                # Case-insensitive subject filtering
-                                df = df[df['Subject'].str.contains(subject_filter, case=False, na=False)]
-                                if df.empty:
-                                    st.warning(f"No emails found with subject containing '{subject_filter}'")
-                                    return
+                        if frames:
+                            df = pd.concat(frames, ignore_index=True)
+                            show_table(table_slot, df)
+                            if extracted_count > len(df):
+                                st.caption(f"Showing the first {len(df)} of {extracted_count} emails. Download the CSV for all of them.")
                             
                             # Store in session state
                             st.session_state.extracted_emails = {
                                 'data': df,
+                                'total': extracted_count,
                                 'folder': folder,
                                 'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                             }
                             
                             # Show success message
-                            st.success(f"Successfully extracted {len(df)} emails from {folder} folder")
-                            
-                            # Show data preview in a scrollable container
-                            st.markdown("### Email Data")
-                            st.markdown("""
-                            <style>
-                                .dataframe-container {
-                                    max-height: 400px;
-                                    overflow-y: auto;
-                                    border: 1px solid var(--border-color);
-                                    border-radius: 5px;
-                                    padding: 5px;
-                                }
-                            </style>
-                            """, unsafe_allow_html=True)
-                            
-                            with st.container():
-                                st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
-                                st.dataframe(
-                                    df,
-                                    height=350,
-                                    use_container_width=True,
-                                    hide_index=True
-                                )
-                                st.markdown('</div>', unsafe_allow_html=True)
+                            st.success(f"Successfully extracted {extracted_count} emails from {folder} folder")
                             
                             # Add visualization section
                             st.markdown("### 📊 Email Response Analysis")
@@ -257,10 +345,9 @@ def show_email_extractor_page():
                             col1, col2 = st.columns([2, 1])
                             
                             with col1:
-                                # Calculate response statistics
-                                total_emails = len(df)
-                                responded_count = len(df[df['Status'] == 'Responded'])
-                                not_responded_count = len(df[df['Status'] == 'Not Responded'])
+                                # Response statistics cover every extracted email, not just the preview
+                                total_emails = extracted_count
+                                not_responded_count = total_emails - responded_count
                                 
                                 # Create pie chart data
                                 chart_data = pd.DataFrame({
@@ -293,16 +380,20 @@ def show_email_extractor_page():
                                     not_responded_count, (not_responded_count/total_emails*100)
                                 ))
                             
-                            # Show download button
-                            csv = df.to_csv(index=False)
+                            # Show download button for the CSV written during extraction
+                            csv_file.seek(0)
+                            csv = csv_file.read()
                             st.download_button(
                                 label="Download CSV",
                                 data=csv,
                                 file_name=f"extracted_emails_{folder}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                                 mime="text/csv"
                             )
+                        elif subject_filter:
+                            st.warning(f"No emails found with subject containing '{subject_filter}'")
                         else:
                             st.warning("No emails found matching the criteria")
+                        csv_file.close()
                 except Exception as e:
                     st.error(f"Error extracting emails: {str(e)}")
             else:
@@ -326,7 +417,8 @@ def show_email_extractor_page():
         3. Set a date range to filter emails:
            - Start Date: Only include emails from this date onwards
            - End Date: Optionally limit to emails before this date
-        4. Optionally, enter subject keywords to filter emails by subject
+        4. Optionally, enter subject keywords to filter emails by subject, and open
+           "More Filters" to filter by sender, recipient, CC, attachments or size
         5. Click "Extract Emails" to begin the extraction process
         
         #### What Gets Extracted
@@ -344,7 +436,8 @@ def show_email_extractor_page():
         
         #### Limitations
         
-        - Only processes up to 3000 emails at once for performance reasons
+        - Large folders take a while; set a maximum or a time limit under Advanced Options to stop early
+        - The table shows the first 5000 emails; the CSV download has all of them
         - Only extracts from Gmail accounts (other providers coming soon)
         - Processes only email headers for faster extraction, not full content
         
@@ -353,6 +446,15 @@ def show_email_extractor_page():
         Your email credentials are used only during the current session and are never stored or saved.
         """)
 
+def show_table(table_slot, df):
+    """Draw the extracted rows into the table placeholder, replacing what it showed"""
+    table_slot.dataframe(
+        df,
+        height=350,
+        use_container_width=True,
+        hide_index=True
+    )
+
 def display_extraction_results(df, folder):
     """Display the extraction results with data table and visualization"""
     # Results header
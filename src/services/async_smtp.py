@@ -0,0 +1,211 @@
+"""
+Async SMTP Module for SmartBrew Email Automation System
+Minimal asyncio SMTP client with STARTTLS, AUTH and command pipelining
+"""
+
+import asyncio
+import base64
+import re
+import smtplib
+import socket
+import ssl
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.services.smtp_pool import SMTPDataDisconnected
+
+_EOL = re.compile(rb'\r\n|\n|\r')
+_LEADING_DOT = re.compile(rb'(?m)^\.')
+
+
+def _prepare_data(payload: Union[str, bytes]) -> bytes:
+    """Normalize line endings to CRLF and dot-stuff a message for DATA."""
+    if isinstance(payload, str):
+        payload = payload.encode('ascii')
+    data = _LEADING_DOT.sub(b'..', _EOL.sub(b'\r\n', payload))
+    if not data.endswith(b'\r\n'):
+        data += b'\r\n'
+    return data + b'.\r\n'
+
+
+class AsyncSMTPSession:
+    """
+    One SMTP session on an asyncio stream.
+
+    When the server advertises PIPELINING (RFC 2920), MAIL FROM, every
+    RCPT TO and DATA go out in a single write and their replies are read
+    back together, saving a round-trip per command. Errors use the
+    smtplib exception types so callers can treat both senders alike.
+
+    Args:
+        host: SMTP server host
+        port: SMTP server port
+        use_starttls: Upgrade the connection with STARTTLS after the greeting
+        timeout: Seconds to wait for each server reply
+    """
+
+    def __init__(self, host: str, port: int, use_starttls: bool = True, timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.use_starttls = use_starttls
+        self.timeout = timeout
+        self.extensions: Dict[str, str] = {}
+        self.messages_sent = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def supports_pipelining(self) -> bool:
+        return 'pipelining' in self.extensions
+
+    async def _read_reply(self) -> Tuple[int, str]:
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            except asyncio.TimeoutError:
+                raise smtplib.SMTPServerDisconnected("Timed out waiting for the SMTP server")
+            if not line:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            text = line.decode('utf-8', 'replace').rstrip('\r\n')
+            lines.append(text[4:])
+            if len(text) < 4 or text[3] != '-':
+                try:
+                    return int(text[:3]), '\n'.join(lines)
+                except ValueError:
+                    raise smtplib.SMTPServerDisconnected(f"Malformed SMTP reply: {text}")
+
+    async def _write(self, data: bytes):
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+        except (ConnectionError, OSError) as e:
+            raise smtplib.SMTPServerDisconnected(str(e))
+
+    async def command(self, line: str) -> Tuple[int, str]:
+        """Send one command and return its reply."""
+        await self._write(line.encode('ascii') + b'\r\n')
+        return await self._read_reply()
+
+    async def _ehlo(self):
+        code, reply = await self.command(f"EHLO {socket.getfqdn()}")
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, reply)
+        self.extensions = {}
+        for line in reply.split('\n')[1:]:
+            keyword, _, params = line.partition(' ')
+            self.extensions[keyword.lower()] = params
+
+    async def connect(self):
+        """Open the connection, greet the server and upgrade to TLS if configured."""
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        except (asyncio.TimeoutError, OSError) as e:
+            raise smtplib.SMTPConnectError(-1, f"Could not connect to {self.host}:{self.port}: {e}")
+
+        code, reply = await self._read_reply()
+        if code != 220:
+            raise smtplib.SMTPConnectError(code, reply)
+        await self._ehlo()
+
+        if self.use_starttls:
+            if 'starttls' not in self.extensions:
+                raise smtplib.SMTPNotSupportedError("STARTTLS extension not supported by server")
+            code, reply = await self.command("STARTTLS")
+            if code != 220:
+                raise smtplib.SMTPResponseException(code, reply)
+            await self._start_tls()
+            await self._ehlo()
+
+    async def _start_tls(self):
+        context = ssl.create_default_context()
+        try:
+            if hasattr(self._writer, 'start_tls'):
+                await asyncio.wait_for(self._writer.start_tls(context, server_hostname=self.host), self.timeout)
+                return
+            # Before Python 3.11 StreamWriter has no start_tls; upgrade the transport under it instead
+            loop = asyncio.get_running_loop()
+            transport = self._writer.transport
+            protocol = transport.get_protocol()
+            tls_transport = await asyncio.wait_for(
+                loop.start_tls(transport, protocol, context, server_hostname=self.host), self.timeout
+            )
+        except (asyncio.TimeoutError, ConnectionError, OSError) as e:
+            raise smtplib.SMTPServerDisconnected(f"STARTTLS failed: {e}")
+        # The protocol keeps feeding the same reader; writes must go through the TLS transport
+        self._writer = asyncio.StreamWriter(tls_transport, protocol, self._reader, loop)
+
+    async def login(self, user: str, password: str):
+        """Authenticate with AUTH PLAIN."""
+        token = base64.b64encode(f"\0{user}\0{password}".encode('utf-8')).decode('ascii')
+        code, reply = await self.command(f"AUTH PLAIN {token}")
+        if code != 235:
+            raise smtplib.SMTPAuthenticationError(code, reply)
+
+    async def sendmail(self, sender_email: str, recipients: List[str], payload: Union[str, bytes]) -> str:
+        """
+        Send one message and return the server's reply to DATA.
+
+        Raises the same exceptions as smtplib.SMTP.sendmail. Succeeds if at
+        least one recipient is accepted. A connection lost while the message
+        content is sent or confirmed raises SMTPDataDisconnected, since the
+        server may already have accepted it.
+        """
+        commands = [f"MAIL FROM:<{sender_email}>"] + [f"RCPT TO:<{address}>" for address in recipients] + ["DATA"]
+
+        if self.supports_pipelining:
+            await self._write(''.join(f"{command}\r\n" for command in commands).encode('ascii'))
+            replies = [await self._read_reply() for _ in commands]
+        else:
+            replies = []
+            for command in commands:
+                replies.append(await self.command(command))
+                if command.startswith("MAIL") and replies[-1][0] != 250:
+                    break
+
+        mail_reply, rcpt_replies = replies[0], replies[1:1 + len(recipients)]
+        data_reply = replies[-1] if len(replies) == len(commands) else None
+        refused = {
+            address: reply for address, reply in zip(recipients, rcpt_replies)
+            if reply[0] not in (250, 251)
+        }
+
+        if mail_reply[0] != 250 or len(refused) == len(recipients) or data_reply[0] != 354:
+            if data_reply and data_reply[0] == 354:
+                # The server is waiting for content we will not send; end it empty
+                await self._write(b'.\r\n')
+                await self._read_reply()
+            await self.command("RSET")
+            if mail_reply[0] != 250:
+                raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], sender_email)
+            if len(refused) == len(recipients):
+                raise smtplib.SMTPRecipientsRefused(refused)
+            raise smtplib.SMTPDataError(data_reply[0], data_reply[1])
+
+        try:
+            await self._write(_prepare_data(payload))
+            code, reply = await self._read_reply()
+        except smtplib.SMTPServerDisconnected as e:
+            raise SMTPDataDisconnected(str(e)) from e
+        if code != 250:
+            await self.command("RSET")
+            raise smtplib.SMTPDataError(code, reply)
+        self.messages_sent += 1
+        return f"{code} {reply}"
+
+    async def quit(self):
+        """Close the session politely, ignoring errors from a dead connection."""
+        if self._writer is None:
+            return
+        try:
+            await self.command("QUIT")
+        except Exception:
+            pass
+        finally:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._writer = None
@@ -0,0 +1,228 @@
+"""
+Bulk Send Worker Module for SmartBrew Email Automation System
+Runs bulk email jobs in the background so the UI stays responsive
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.utils.async_email_sender import send_bulk_emails_concurrent
+from src.utils.email_sender import create_bulk_send_job, send_bulk_emails
+from src.utils.job_store import JobStore, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED
+from src.utils.rate_limiter import RateLimitPolicy
+from src.utils.sender_pool import SenderAccount, send_bulk_emails_multi_account
+
+
+def job_sender_accounts(job: Dict) -> List[str]:
+    """Return the sender addresses of a job; sharded jobs store them comma-separated."""
+    return [address.strip() for address in job['sender_email'].split(',') if address.strip()]
+
+
+def _check_sharding(concurrency: int, accounts: Optional[List[SenderAccount]]):
+    if accounts and concurrency > 1:
+        raise ValueError(
+            "Parallel SMTP sessions cannot be combined with additional sender accounts; "
+            "set parallel sessions to 1 or remove the extra accounts"
+        )
+
+
+class BulkSendWorker:
+    """
+    Background execution engine for bulk send jobs.
+
+    Jobs are recorded in the job store before they are queued, so submit()
+    returns a job ID at once and progress can be polled from the store by
+    any session. Sending is I/O-bound and mostly waiting on the rate
+    limiter, so a thread pool is enough to run several campaigns side by
+    side.
+
+    Args:
+        job_store: Store holding job and recipient state
+        max_workers: Maximum number of jobs sending at the same time
+    """
+
+    def __init__(self, job_store: JobStore, max_workers: int = 4):
+        self.job_store = job_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-send")
+        self._futures: Dict[str, Future] = {}
+        self._stop_events: Dict[str, threading.Event] = {}
+        self._cleanup_paths: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        sender_email: str,
+        app_password: str,
+        recipients_file,
+        subject: str,
+        message: str,
+        cc_email: Optional[str] = None,
+        attachment_paths: Optional[List[Union[str, Tuple[str, str]]]] = None,
+        executive_name: Optional[str] = None,
+        executive_number: Optional[str] = None,
+        executive_gender: Optional[str] = None,
+        rate_limit_policy: Optional[RateLimitPolicy] = None,
+        cleanup_paths: Optional[List[str]] = None,
+        concurrency: int = 1,
+        accounts: Optional[List[SenderAccount]] = None,
+        sharding_strategy: str = 'least_loaded'
+    ) -> str:
+        """
+        Record a new job and queue it for sending.
+
+        Args:
+            cleanup_paths: Temporary files (such as attachments) to delete once
+                the job stops, whether it finished, failed or was cancelled
+            concurrency: Number of concurrent SMTP sessions. Above 1 the job
+                runs on the asyncio sending engine.
+            accounts: Sender accounts to shard the campaign across. When given,
+                sender_email and app_password are ignored.
+            sharding_strategy: How recipients are spread over the accounts
+
+        Returns:
+            str: The job ID
+        """
+        _check_sharding(concurrency, accounts)
+        if accounts:
+            sender_email = ', '.join(account.email for account in accounts)
+        job_id = create_bulk_send_job(
+            self.job_store, sender_email, recipients_file, subject, message,
+            cc_email, executive_name, executive_number, executive_gender
+        )
+        self._start(job_id, cleanup_paths, dict(
+            app_password=app_password, attachment_paths=attachment_paths, rate_limit_policy=rate_limit_policy,
+            concurrency=concurrency, accounts=accounts, sharding_strategy=sharding_strategy
+        ))
+        return job_id
+
+    def resume(
+        self,
+        job_id: str,
+        app_password: str,
+        attachment_paths: Optional[List[Union[str, Tuple[str, str]]]] = None,
+        rate_limit_policy: Optional[RateLimitPolicy] = None,
+        cleanup_paths: Optional[List[str]] = None,
+        concurrency: int = 1,
+        accounts: Optional[List[SenderAccount]] = None,
+        sharding_strategy: str = 'least_loaded'
+    ) -> str:
+        """
+        Queue an existing job to continue from its pending recipients.
+
+        A job sharded across several accounts only stores their addresses,
+        so it can only be resumed with the accounts passed again.
+        """
+        _check_sharding(concurrency, accounts)
+        job = self.job_store.get_job(job_id)
+        if not job:
+            raise ValueError(f"Unknown bulk send job: {job_id}")
+        job_accounts = job_sender_accounts(job)
+        if len(job_accounts) > 1 and not accounts:
+            raise ValueError(
+                f"Bulk send job {job_id} was sent from {', '.join(job_accounts)}; "
+                "enter the additional sender accounts again to resume it"
+            )
+        self._start(job_id, cleanup_paths, dict(
+            app_password=app_password, attachment_paths=attachment_paths, rate_limit_policy=rate_limit_policy,
+            concurrency=concurrency, accounts=accounts, sharding_strategy=sharding_strategy
+        ))
+        return job_id
+
+    def _start(self, job_id: str, cleanup_paths: Optional[List[str]], options: Dict):
+        stop_event = threading.Event()
+        with self._lock:
+            # Checked and registered under one lock hold, so two resumes cannot both start the job
+            future = self._futures.get(job_id)
+            if future is not None and not future.done():
+                raise ValueError(f"Bulk send job {job_id} is already running")
+            self._stop_events[job_id] = stop_event
+            self._cleanup_paths[job_id] = cleanup_paths or []
+            self._futures[job_id] = self._executor.submit(self._run, job_id, stop_event, options)
+
+    def _finish(self, job_id: str, stop_event: threading.Event):
+        """Delete the temporary files of the run owning stop_event and forget its stop event."""
+        with self._lock:
+            # A later run of the same job has registered its own event and files; leave those alone
+            if self._stop_events.get(job_id) is not stop_event:
+                return
+            self._stop_events.pop(job_id)
+            cleanup_paths = self._cleanup_paths.pop(job_id, [])
+        for path in cleanup_paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _run(self, job_id: str, stop_event: threading.Event, options: Dict):
+        try:
+            # Read the job content from the store so resumed jobs send the same message
+            job = self.job_store.get_job(job_id)
+            content = (job['subject'], job['message'], job['cc_email'], options['attachment_paths'],
+                       job['executive_name'], job['executive_number'], job['executive_gender'])
+
+            if options['accounts']:
+                return send_bulk_emails_multi_account(
+                    options['accounts'], None, *content,
+                    strategy=options['sharding_strategy'],
+                    job_store=self.job_store,
+                    job_id=job_id,
+                    stop_event=stop_event
+                )
+
+            engine_options = {'concurrency': options['concurrency']} if options['concurrency'] > 1 else {}
+            send = send_bulk_emails_concurrent if options['concurrency'] > 1 else send_bulk_emails
+            return send(
+                job['sender_email'], options['app_password'], None, *content,
+                rate_limit_policy=options['rate_limit_policy'],
+                job_store=self.job_store,
+                job_id=job_id,
+                stop_event=stop_event,
+                **engine_options
+            )
+        except Exception as e:
+            print(f"Bulk send job {job_id} failed: {str(e)}")
+            raise
+        finally:
+            self._finish(job_id, stop_event)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Ask a job to stop before its next recipient.
+
+        Returns:
+            bool: True if the job was queued or running
+        """
+        with self._lock:
+            stop_event = self._stop_events.get(job_id)
+            future = self._futures.get(job_id)
+        if stop_event is None:
+            return False
+        stop_event.set()
+        if future is not None and future.cancel():
+            # Never started, so nothing will update the store for us
+            self.job_store.set_job_status(job_id, JOB_CANCELLED)
+            self._finish(job_id, stop_event)
+        return True
+
+    def is_running(self, job_id: str) -> bool:
+        """Return True if the job is queued or sending in this process."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        return future is not None and not future.done()
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        Return the job record with recipient counts and whether it is active.
+
+        A job the store shows as running but which has no live task was
+        interrupted by a restart and can be resumed.
+        """
+        job = self.job_store.get_job(job_id)
+        if not job:
+            return None
+        job['progress'] = self.job_store.progress(job_id)
+        job['active'] = self.is_running(job_id)
+        job['finished'] = job['status'] in (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED) and not job['active']
+        return job
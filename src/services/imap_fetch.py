@@ -0,0 +1,395 @@
+"""
+IMAP Fetch Module for SmartBrew Email Automation System
+Handles batched FETCH commands over message-set ranges and parses their responses
+"""
+
+import base64
+import imaplib
+import quopri
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Parsed FETCH values: atoms are str, strings and literals are bytes, lists are lists, NIL is None
+FetchValue = Union[str, bytes, list, None]
+FetchRecord = Dict[str, FetchValue]
+
+_MESSAGE_START = re.compile(rb'^(\d+) \(')
+
+# Gmail's IMAP extensions: X-GM-THRID, X-GM-MSGID, X-GM-LABELS and X-GM-RAW
+GMAIL_EXTENSION = 'X-GM-EXT-1'
+GMAIL_ID_ITEMS = 'X-GM-THRID X-GM-MSGID'
+
+
+def supports_gmail_extensions(mail: imaplib.IMAP4) -> bool:
+    """Return whether the server advertises Gmail's IMAP extensions."""
+    return GMAIL_EXTENSION in mail.capabilities
+
+
+def gmail_id(record: FetchRecord, name: str) -> Optional[int]:
+    """Return a Gmail ID such as 'X-GM-THRID' from a FETCH record as an integer, or None."""
+    try:
+        return int(record[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def compress_message_set(numbers: Iterable[Union[int, bytes, str]]) -> str:
+    """
+    Build an IMAP message set from message numbers or UIDs.
+
+    Consecutive numbers are collapsed into ranges, so [1, 2, 3, 7, 9, 10]
+    becomes '1:3,7,9:10'.
+    """
+    values = sorted({int(number) for number in numbers})
+    ranges = []
+    start = previous = None
+    for value in values:
+        if start is None:
+            start = previous = value
+        elif value == previous + 1:
+            previous = value
+        else:
+            ranges.append(f"{start}:{previous}" if previous != start else str(start))
+            start = previous = value
+    if start is not None:
+        ranges.append(f"{start}:{previous}" if previous != start else str(start))
+    return ','.join(ranges)
+
+
+def expand_message_set(message_set: Union[bytes, str]) -> List[int]:
+    """
+    Expand an IMAP message set of explicit numbers, e.g. '1:3,7' -> [1, 2, 3, 7].
+
+    Sets containing '*' are not supported, as their upper end is only known to the server.
+    """
+    if isinstance(message_set, bytes):
+        message_set = message_set.decode('ascii')
+    numbers = []
+    for piece in message_set.strip().split(','):
+        if not piece:
+            continue
+        start, _, end = piece.partition(':')
+        start, end = int(start), int(end or start)
+        numbers.extend(range(min(start, end), max(start, end) + 1))
+    return numbers
+
+
+class _Tokenizer:
+    """Tokenizes one FETCH response made of text segments and literals."""
+
+    def __init__(self, segments: List[Union[bytes, Tuple[bytes]]]):
+        # Literals are wrapped in a 1-tuple so they can be told apart from text
+        self.segments = segments
+        self.segment = 0
+        self.position = 0
+
+    def _text(self) -> Optional[bytes]:
+        while self.segment < len(self.segments):
+            current = self.segments[self.segment]
+            if isinstance(current, tuple):
+                return None
+            if self.position < len(current):
+                return current
+            self.segment += 1
+            self.position = 0
+        return None
+
+    def _skip_spaces(self):
+        while True:
+            text = self._text()
+            if text is None:
+                return
+            while self.position < len(text) and text[self.position:self.position + 1] in (b' ', b'\r', b'\n'):
+                self.position += 1
+            if self.position < len(text):
+                return
+
+    def next(self):
+        """Return the next token: '(', ')', an atom (str), a string (bytes), a literal (bytes) or None at the end."""
+        self._skip_spaces()
+        if self.segment >= len(self.segments):
+            return None
+        current = self.segments[self.segment]
+        if isinstance(current, tuple):
+            self.segment += 1
+            self.position = 0
+            return ('literal', current[0])
+
+        char = current[self.position:self.position + 1]
+        if char in (b'(', b')'):
+            self.position += 1
+            return char.decode()
+        if char == b'"':
+            return ('string', self._quoted(current))
+        if char == b'{':
+            # Literal marker; the literal itself is the next segment
+            end = current.index(b'}', self.position)
+            self.position = end + 1
+            return self.next()
+        return self._atom(current)
+
+    def _quoted(self, text: bytes) -> bytes:
+        self.position += 1
+        value = bytearray()
+        while self.position < len(text):
+            char = text[self.position:self.position + 1]
+            if char == b'\\':
+                value += text[self.position + 1:self.position + 2]
+                self.position += 2
+                continue
+            self.position += 1
+            if char == b'"':
+                break
+            value += char
+        return bytes(value)
+
+    def _atom(self, text: bytes) -> str:
+        start = self.position
+        depth = 0
+        while self.position < len(text):
+            char = text[self.position:self.position + 1]
+            if char == b'[':
+                depth += 1
+            elif char == b']':
+                depth -= 1
+            elif depth == 0 and char in (b' ', b'(', b')'):
+                break
+            self.position += 1
+        return text[start:self.position].decode('utf-8', 'replace')
+
+
+def _parse_value(tokenizer: _Tokenizer, token) -> FetchValue:
+    if token == '(':
+        items = []
+        while True:
+            token = tokenizer.next()
+            if token == ')' or token is None:
+                return items
+            items.append(_parse_value(tokenizer, token))
+    if isinstance(token, tuple):
+        return token[1]
+    if token == 'NIL':
+        return None
+    return token
+
+
+def _parse_message(segments: List[Union[bytes, Tuple[bytes]]]) -> Tuple[int, FetchRecord]:
+    tokenizer = _Tokenizer(segments)
+    number = int(tokenizer.next())
+    if tokenizer.next() != '(':
+        raise imaplib.IMAP4.error("Malformed FETCH response")
+
+    record: FetchRecord = {}
+    while True:
+        name = tokenizer.next()
+        if name == ')' or name is None:
+            break
+        record[name.upper()] = _parse_value(tokenizer, tokenizer.next())
+    return number, record
+
+
+def parse_fetch_response(data: Sequence[Union[bytes, Tuple[bytes, bytes]]]) -> List[Tuple[int, FetchRecord]]:
+    """
+    Split a multi-message FETCH response from imaplib into per-message records.
+
+    imaplib returns each literal as a (prefix, literal) tuple followed by
+    the rest of the line, and every other response line as bytes. A new
+    message starts at an element beginning with '<number> ('.
+
+    Returns:
+        List[Tuple[int, FetchRecord]]: (message number, attributes) in response order.
+        Attribute names are upper-cased, e.g. 'UID', 'FLAGS', 'BODY[HEADER]'.
+    """
+    messages: List[List[Union[bytes, Tuple[bytes]]]] = []
+    for element in data:
+        if element is None:
+            continue
+        prefix = element[0] if isinstance(element, tuple) else element
+        if _MESSAGE_START.match(prefix) or not messages:
+            messages.append([])
+        if isinstance(element, tuple):
+            messages[-1].extend([element[0], (element[1],)])
+        else:
+            messages[-1].append(element)
+
+    records = []
+    for segments in messages:
+        try:
+            records.append(_parse_message(segments))
+        except (ValueError, TypeError, imaplib.IMAP4.error) as e:
+            print(f"Warning: Could not parse FETCH response: {str(e)}")
+    return records
+
+
+def fetch_batch(
+    mail: imaplib.IMAP4,
+    numbers: Sequence[Union[int, bytes, str]],
+    items: str,
+    uid: bool = False
+) -> Dict[int, FetchRecord]:
+    """
+    Fetch several messages with a single FETCH command.
+
+    Args:
+        mail: Connection with a mailbox selected
+        numbers: Message sequence numbers, or UIDs when uid is True
+        items: FETCH data items, e.g. '(UID BODY.PEEK[HEADER])'
+        uid: Address messages by UID (UID FETCH) instead of sequence number
+
+    Returns:
+        Dict[int, FetchRecord]: Records keyed by sequence number, or by UID when uid is True
+    """
+    if not numbers:
+        return {}
+    message_set = compress_message_set(numbers)
+    if uid:
+        status, data = mail.uid('FETCH', message_set, items)
+    else:
+        status, data = mail.fetch(message_set, items)
+    if status != 'OK':
+        raise imaplib.IMAP4.error(f"FETCH failed with status: {status}")
+
+    records = {}
+    for number, record in parse_fetch_response(data):
+        if uid:
+            if 'UID' not in record:
+                continue
+            number = int(record['UID'])
+        # Servers may send unsolicited FETCH updates; merge them into one record
+        records.setdefault(number, {}).update(record)
+    return records
+
+
+def fetch_batched(
+    mail: imaplib.IMAP4,
+    numbers: Sequence[Union[int, bytes, str]],
+    items: str,
+    batch_size: int = 100,
+    uid: bool = False
+) -> Iterator[Tuple[List[int], Dict[int, FetchRecord]]]:
+    """
+    Fetch messages in batches, one FETCH command per batch.
+
+    Yields:
+        Tuple[List[int], Dict[int, FetchRecord]]: The batch's numbers in the
+        requested order and the records returned for them
+    """
+    numbers = [int(number) for number in numbers]
+    for start in range(0, len(numbers), batch_size):
+        batch = numbers[start:start + batch_size]
+        yield batch, fetch_batch(mail, batch, items, uid=uid)
+
+
+def body_section(record: FetchRecord, prefix: str = 'BODY[') -> Optional[bytes]:
+    """Return the first body section in a record, e.g. BODY[HEADER] or BODY[1]<0>."""
+    for name, value in record.items():
+        if name.startswith(prefix) and isinstance(value, bytes):
+            return value
+    if prefix == 'BODY[' and isinstance(record.get('RFC822'), bytes):
+        return record['RFC822']
+    return None
+
+
+def _text(value: FetchValue) -> str:
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value or ''
+
+
+def find_text_part(structure: FetchValue, subtype: str = 'plain', section: str = '') -> Optional[Tuple[str, str, str]]:
+    """
+    Find the first inline text part of a parsed BODYSTRUCTURE, depth first.
+
+    Parts with an 'attachment' disposition are skipped, as are parts inside
+    attached messages.
+
+    Returns:
+        Tuple[str, str, str]: (section, transfer encoding, charset), e.g.
+        ('1.1', 'quoted-printable', 'utf-8'), or None if there is no such part
+    """
+    if not isinstance(structure, list) or not structure:
+        return None
+
+    if isinstance(structure[0], list):
+        # Multipart: child parts come first, followed by the subtype
+        for index, child in enumerate(structure, start=1):
+            if not isinstance(child, list):
+                break
+            found = find_text_part(child, subtype, f"{section}.{index}" if section else str(index))
+            if found:
+                return found
+        return None
+
+    if len(structure) < 7 or _text(structure[0]).lower() != 'text' or _text(structure[1]).lower() != subtype:
+        return None
+
+    # Text parts carry a line count, so the disposition is the 10th field
+    disposition = structure[9] if len(structure) > 9 else None
+    if isinstance(disposition, list) and disposition and _text(disposition[0]).lower() == 'attachment':
+        return None
+
+    params = structure[2] if isinstance(structure[2], list) else []
+    charset = 'us-ascii'
+    for key, value in zip(params[::2], params[1::2]):
+        if _text(key).lower() == 'charset':
+            charset = _text(value)
+    # A single-part message has its body at section 1
+    return section or '1', _text(structure[5]).lower() or '7bit', charset
+
+
+def decode_part(data: bytes, encoding: str, charset: str) -> str:
+    """
+    Decode a (possibly truncated) body part fetched with BODY[section].
+
+    Truncated base64 is cut back to a whole number of quanta before decoding.
+    """
+    if encoding == 'base64':
+        compact = b''.join(data.split())
+        data = base64.b64decode(compact[:len(compact) - len(compact) % 4] or b'')
+    elif encoding == 'quoted-printable':
+        data = quopri.decodestring(data)
+    try:
+        return data.decode(charset or 'us-ascii', 'replace')
+    except LookupError:
+        return data.decode('utf-8', 'replace')
+
+
+def fetch_text_bodies(
+    mail: imaplib.IMAP4,
+    records: Dict[int, FetchRecord],
+    max_bytes: Optional[int] = None,
+    uid: bool = False
+) -> Dict[int, str]:
+    """
+    Fetch just the plain-text part of messages whose BODYSTRUCTURE is known.
+
+    Messages are grouped by the section that holds their text, so a batch
+    usually needs one or two FETCH commands.
+
+    Args:
+        mail: Connection with the mailbox selected
+        records: Records that include 'BODYSTRUCTURE', keyed as by fetch_batch
+        max_bytes: Fetch at most this many bytes of each part (<0.N> partial fetch)
+        uid: Records are keyed by UID
+
+    Returns:
+        Dict[int, str]: Decoded text keyed like records; messages without a text part are left out
+    """
+    by_section: Dict[str, List[int]] = {}
+    parts: Dict[int, Tuple[str, str, str]] = {}
+    for number, record in records.items():
+        part = find_text_part(record.get('BODYSTRUCTURE'))
+        if part:
+            parts[number] = part
+            by_section.setdefault(part[0], []).append(number)
+
+    bodies = {}
+    for section, numbers in by_section.items():
+        partial = f"<0.{max_bytes}>" if max_bytes else ''
+        fetched = fetch_batch(mail, numbers, f"(BODY.PEEK[{section}]{partial})", uid=uid)
+        for number, record in fetched.items():
+            data = body_section(record, f"BODY[{section}]")
+            if data is not None and number in parts:
+                _, encoding, charset = parts[number]
+                bodies[number] = decode_part(data, encoding, charset)
+    return bodies
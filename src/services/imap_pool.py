@@ -0,0 +1,240 @@
+"""
+IMAP Pool Module for SmartBrew Email Automation System
+Handles a small pool of authenticated IMAP connections and spreads fetch work across them
+"""
+
+import imaplib
+import os
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, TypeVar
+
+IMAP_HOST = os.getenv('DEFAULT_IMAP_SERVER', 'imap.gmail.com')
+
+# Gmail allows 15 simultaneous IMAP connections per account, shared with mail clients
+DEFAULT_POOL_SIZE = 4
+
+T = TypeVar('T')
+
+# Connections on which QRESYNC has been enabled; it stays on for the whole session
+_QRESYNC_ENABLED: 'weakref.WeakSet[imaplib.IMAP4]' = weakref.WeakSet()
+
+
+def enable_qresync(mail: imaplib.IMAP4) -> bool:
+    """
+    Enable QRESYNC (RFC 7162) on a connection if the server offers it.
+
+    ENABLE is only valid before a mailbox is selected, so connections call
+    this right after LOGIN. The outcome is recorded per connection: later
+    calls, even with a mailbox selected, return whether it is on.
+    """
+    if mail in _QRESYNC_ENABLED:
+        return True
+    if not {'QRESYNC', 'ENABLE'} <= set(mail.capabilities) or mail.state != 'AUTH':
+        return False
+    status, _ = mail.enable('QRESYNC')
+    enabled = b' '.join(value for value in mail.response('ENABLED')[1] if value)
+    if status == 'OK' and b'QRESYNC' in enabled.upper():
+        _QRESYNC_ENABLED.add(mail)
+        return True
+    return False
+
+
+def _quote_mailbox(folder: str) -> str:
+    """Quote a mailbox name for SELECT, e.g. [Gmail]/Sent Mail -> "[Gmail]/Sent Mail"."""
+    folder = folder.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{folder}"'
+
+
+class IMAPConnectionPool:
+    """
+    A fixed number of authenticated IMAP connections to one account.
+
+    Connections are opened when first needed and lent out exclusively, as
+    an imaplib connection can only run one command at a time; borrowers
+    wait while every connection is in use. A connection that failed while
+    borrowed is logged out and replaced on a later borrow.
+
+    The pool remembers which mailbox each connection has selected
+    read-only, so consecutive borrowers working on the same folder do not
+    pay for another SELECT. QRESYNC is enabled on each connection as it
+    logs in, while no mailbox is selected yet.
+
+    Args:
+        account: Email address to log in as
+        password: App-specific password
+        size: Maximum number of open connections
+        host: IMAP server host
+    """
+
+    def __init__(self, account: str, password: str, size: int = DEFAULT_POOL_SIZE, host: str = IMAP_HOST):
+        self.account = account
+        self.password = password
+        self.size = max(1, size)
+        self.host = host
+        self._idle: List[imaplib.IMAP4] = []
+        self._selected: Dict[imaplib.IMAP4, str] = {}
+        self._open_count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def __enter__(self) -> 'IMAPConnectionPool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close_all()
+
+    def _connect(self) -> imaplib.IMAP4:
+        mail = imaplib.IMAP4_SSL(self.host)
+        try:
+            mail.login(self.account, self.password)
+            enable_qresync(mail)
+        except Exception:
+            _logout(mail)
+            raise
+        return mail
+
+    def acquire(self, timeout: Optional[float] = None) -> imaplib.IMAP4:
+        """Borrow a connection, opening one if none is idle and the pool is not full."""
+        with self._condition:
+            if self._closed:
+                raise imaplib.IMAP4.error(f"IMAP connection pool for {self.account} is closed")
+            while not self._idle and self._open_count >= self.size:
+                if not self._condition.wait(timeout=timeout):
+                    raise TimeoutError(f"No IMAP connection available for {self.account}")
+            if self._idle:
+                return self._idle.pop()
+            self._open_count += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._condition:
+                self._open_count -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, mail: imaplib.IMAP4, broken: bool = False):
+        """Return a borrowed connection, logging it out if it failed or the pool has been closed."""
+        with self._condition:
+            broken = broken or self._closed
+            if broken:
+                self._selected.pop(mail, None)
+                self._open_count -= 1
+            else:
+                self._idle.append(mail)
+            self._condition.notify()
+        if broken:
+            _logout(mail)
+
+    def select(self, mail: imaplib.IMAP4, folder: str):
+        """Select a folder read-only on a borrowed connection, unless it already is."""
+        if self._selected.get(mail) == folder:
+            return
+        status, _ = mail.select(_quote_mailbox(folder), readonly=True)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Could not select folder {folder}")
+        self._selected[mail] = folder
+
+    @contextmanager
+    def connection(self, folder: Optional[str] = None) -> Iterator[imaplib.IMAP4]:
+        """
+        Borrow a connection for the duration of a with block.
+
+        With a folder, the connection comes with that folder selected
+        read-only. Without one, the borrower may select anything, so the
+        pool forgets what the connection had selected.
+        """
+        mail = self.acquire()
+        broken = False
+        try:
+            if folder is None:
+                self._selected.pop(mail, None)
+            else:
+                self.select(mail, folder)
+            yield mail
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(mail, broken=broken)
+
+    def close_all(self):
+        """Log out every idle connection, and borrowed ones as they are returned."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open_count -= len(idle)
+            for mail in idle:
+                self._selected.pop(mail, None)
+            self._condition.notify_all()
+        for mail in idle:
+            _logout(mail)
+
+
+def _logout(mail: imaplib.IMAP4):
+    try:
+        mail.logout()
+    except Exception:
+        pass
+
+
+def map_uid_chunks(
+    pool: IMAPConnectionPool,
+    folder: str,
+    uids: Sequence[int],
+    work: Callable[[imaplib.IMAP4, List[int]], T],
+    chunk_size: int = 100,
+    max_in_flight: Optional[int] = None
+) -> Iterator[T]:
+    """
+    Run work(mail, chunk) over consecutive UID chunks of a folder, spread over the pool.
+
+    Up to pool.size chunks are fetched at once, each on its own connection
+    with the folder selected read-only. Results are yielded in chunk
+    order as soon as they, and every chunk before them, are done. At most
+    max_in_flight chunks are submitted but not yet consumed, so a slow
+    consumer holds the workers back instead of piling up finished results.
+    Closing the iterator early cancels the chunks that have not started.
+
+    Args:
+        pool: Connections to the folder's account
+        folder: Mailbox name, e.g. '[Gmail]/Sent Mail'
+        uids: UIDs to process, in the order results should come back
+        work: Called with a borrowed connection and a list of UIDs; should use UID commands
+        chunk_size: UIDs per call to work, typically one FETCH batch
+        max_in_flight: Chunks submitted ahead of the consumer; defaults to twice the pool size
+
+    Yields:
+        The result of work for each chunk
+    """
+    uids = [int(uid) for uid in uids]
+    chunks = [uids[start:start + chunk_size] for start in range(0, len(uids), chunk_size)]
+    if not chunks:
+        return
+
+    def run(chunk: List[int]) -> T:
+        with pool.connection(folder) as mail:
+            return work(mail, chunk)
+
+    max_in_flight = max(1, max_in_flight or pool.size * 2)
+    executor = ThreadPoolExecutor(max_workers=min(pool.size, len(chunks)), thread_name_prefix='imap-fetch')
+    pending = iter(chunks)
+    in_flight: Deque[Future] = deque()
+    try:
+        for chunk in pending:
+            in_flight.append(executor.submit(run, chunk))
+            if len(in_flight) >= max_in_flight:
+                break
+        while in_flight:
+            result = in_flight.popleft().result()
+            # Refill before handing the result over, so the workers stay busy meanwhile
+            chunk = next(pending, None)
+            if chunk is not None:
+                in_flight.append(executor.submit(run, chunk))
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,208 @@
+"""
+IMAP Search Module for SmartBrew Email Automation System
+Handles compiling extraction filters into a server-side IMAP SEARCH, with Gmail's X-GM-RAW where available
+"""
+
+import imaplib
+import shlex
+from dataclasses import dataclass, fields, replace
+from datetime import date
+from typing import List, Optional, Sequence, Tuple, Union
+
+# A search key is an atom sent as is (bytes) or a string argument (str), quoted or sent as a literal
+_Token = Union[bytes, str]
+
+# Quoted strings may hold any 7-bit character except NUL, CR and LF
+_QUOTABLE = frozenset(range(0x01, 0x80)) - {0x0a, 0x0d}
+
+
+def subject_keywords(subject: Optional[str]) -> List[str]:
+    """
+    Split a subject filter into keywords that must all appear in the subject.
+
+    Words in double quotes stay together as one phrase, so 'price "new menu"'
+    gives ['price', 'new menu'].
+    """
+    if not subject:
+        return []
+    try:
+        words = shlex.split(subject)
+    except ValueError:
+        # Unbalanced quotes; fall back to plain words
+        words = subject.replace('"', ' ').split()
+    return [word for word in words if word.strip()]
+
+
+def any_of(value: Union[str, Sequence[str], None]) -> List[str]:
+    """Return the non-empty values of a criterion that takes one string or several alternatives."""
+    values = [value] if isinstance(value, str) else list(value or ())
+    return [item.strip() for item in values if item and item.strip()]
+
+
+def _imap_date(value: date) -> bytes:
+    return value.strftime('%d-%b-%Y').encode('ascii')
+
+
+def _gmail_term(value: str) -> str:
+    """Quote a value for a Gmail search operator, e.g. from:"Jane Doe"."""
+    value = ' '.join(value.replace('"', ' ').split())
+    return f'"{value}"'
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Filters on the messages of a folder, answered by the server's SEARCH.
+
+    Every criterion that is set must match. Text criteria are
+    case-insensitive substrings of the header, as in IMAP SEARCH, except
+    that on Gmail they go through X-GM-RAW and match whole words, as
+    Gmail's own search box does.
+    """
+    since: Optional[date] = None         # Internal date on or after this date
+    before: Optional[date] = None        # Internal date before this date
+    subject: Optional[str] = None        # Keywords that must all appear in the subject; see subject_keywords
+    sender: Optional[str] = None         # Text in the From header, e.g. an address or domain
+    recipient: Optional[str] = None      # Text in the To header
+    cc: Union[str, Sequence[str], None] = None  # Text in the Cc header; with several, any of them
+    has_attachment: bool = False         # Only messages with attachments
+    larger: Optional[int] = None         # Size above this many bytes
+    smaller: Optional[int] = None        # Size below this many bytes
+
+    def narrowed(self, **criteria) -> 'SearchFilter':
+        """Return a copy with the given criteria set, ignoring those that are None or empty."""
+        return replace(self, **{name: value for name, value in criteria.items() if value})
+
+    def is_empty(self) -> bool:
+        """Return whether the filter matches every message."""
+        return not any(getattr(self, field.name) for field in fields(self))
+
+    def needs_message_structure(self) -> bool:
+        """Return whether the filter looks at size or attachments, which only the server knows."""
+        return bool(self.has_attachment or self.larger or self.smaller)
+
+    def _tokens(self, gmail: bool) -> List[_Token]:
+        tokens: List[_Token] = []
+        if self.since:
+            tokens += [b'SINCE', _imap_date(self.since)]
+        if self.before:
+            tokens += [b'BEFORE', _imap_date(self.before)]
+        if self.larger:
+            tokens += [b'LARGER', str(int(self.larger)).encode('ascii')]
+        if self.smaller:
+            tokens += [b'SMALLER', str(int(self.smaller)).encode('ascii')]
+
+        keywords = subject_keywords(self.subject)
+        addresses = [
+            (operator, key, value)
+            for operator, key, value in (('from', b'FROM', self.sender), ('to', b'TO', self.recipient))
+            if value and value.strip()
+        ]
+        cc = any_of(self.cc)
+
+        if gmail:
+            # One X-GM-RAW string carries every text criterion, in Gmail's search syntax
+            terms = []
+            if keywords:
+                terms.append('subject:(' + ' '.join(_gmail_term(word) for word in keywords) + ')')
+            terms += [f'{operator}:{_gmail_term(value)}' for operator, _, value in addresses]
+            if cc:
+                # Braces make Gmail match any of the terms
+                terms.append('{' + ' '.join(f'cc:{_gmail_term(value)}' for value in cc) + '}')
+            if self.has_attachment:
+                terms.append('has:attachment')
+            if terms:
+                tokens += [b'X-GM-RAW', ' '.join(terms)]
+            return tokens
+
+        for word in keywords:
+            tokens += [b'SUBJECT', word]
+        for _, key, value in addresses:
+            tokens += [key, value.strip()]
+        if cc:
+            # OR takes two keys, so n alternatives need n - 1 of them in front
+            tokens += [b'OR'] * (len(cc) - 1)
+            for value in cc:
+                tokens += [b'CC', value]
+        if self.has_attachment:
+            # No standard key exists; mail with attachments is multipart/mixed
+            tokens += [b'HEADER', b'Content-Type', 'multipart/mixed']
+        return tokens
+
+    def compile(self, gmail: bool = False) -> Tuple[Optional[str], List[bytes]]:
+        """
+        Build the SEARCH arguments for this filter.
+
+        ASCII strings are sent as quoted strings, with backslashes and
+        double quotes escaped. Any other string is sent as an IMAP literal
+        ({n} followed by its UTF-8 bytes), and the search is declared
+        CHARSET UTF-8.
+
+        Args:
+            gmail: Use X-GM-RAW for the text criteria (server has X-GM-EXT-1)
+
+        Returns:
+            Tuple[Optional[str], List[bytes]]: The charset to declare, or None
+            for plain ASCII, and the criteria split at each literal: the
+            first piece goes on the command line, and each following piece
+            starts with a literal's bytes and runs up to the next {n}
+        """
+        pieces: List[bytes] = []
+        line: List[bytes] = []
+        charset = None
+        for token in self._tokens(gmail) or [b'ALL']:
+            if isinstance(token, bytes):
+                line.append(token)
+                continue
+            data = token.encode('utf-8')
+            if all(byte in _QUOTABLE for byte in data):
+                line.append(b'"' + data.replace(b'\\', b'\\\\').replace(b'"', b'\\"') + b'"')
+                continue
+            charset = 'UTF-8'
+            line.append(b'{%d}' % len(data))
+            pieces.append(b' '.join(line))
+            line = [data]
+        pieces.append(b' '.join(line))
+        return charset, pieces
+
+
+class _Continuations:
+    """Hands imaplib the rest of a command, one piece per continuation request."""
+
+    def __init__(self, pieces: List[bytes]):
+        self._pieces = iter(pieces)
+
+    def next_piece(self, continuation: bytes) -> bytes:
+        return next(self._pieces)
+
+
+def search_messages(
+    mail: imaplib.IMAP4,
+    search: SearchFilter,
+    gmail: bool = False,
+    uid: bool = True
+) -> List[bytes]:
+    """
+    Run a SEARCH for the filter on the selected folder.
+
+    Args:
+        mail: Connection with the folder selected
+        search: What to look for
+        gmail: Use X-GM-RAW for the text criteria (server has X-GM-EXT-1)
+        uid: Return UIDs (UID SEARCH) rather than message sequence numbers
+
+    Returns:
+        List[bytes]: Matching UIDs or sequence numbers, in ascending order
+    """
+    charset, pieces = search.compile(gmail)
+    if len(pieces) > 1:
+        # imaplib sends the first piece, then calls this for each literal the server asks for
+        mail.literal = _Continuations(pieces[1:]).next_piece
+
+    if uid:
+        status, data = mail.uid('SEARCH', *(('CHARSET', charset) if charset else ()), pieces[0])
+    else:
+        status, data = mail.search(charset, pieces[0])
+    if status != 'OK':
+        raise imaplib.IMAP4.error(f"SEARCH failed with status: {status}")
+    return data[0].split() if data and data[0] else []
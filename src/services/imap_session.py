@@ -0,0 +1,303 @@
+"""
+IMAP Session Module for SmartBrew Email Automation System
+Keeps an authenticated IMAP session per account warm across runs, with its folder map and capabilities cached
+"""
+
+import hashlib
+import hmac
+import imaplib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.services.imap_pool import IMAP_HOST, enable_qresync
+
+SessionKey = Tuple[str, str]
+
+# RFC 6154 special-use attributes, plus Gmail's \Important
+SPECIAL_USE_SENT = '\\Sent'
+_SPECIAL_USE = {
+    flag.lower(): flag
+    for flag in ('\\All', '\\Archive', '\\Drafts', '\\Flagged', '\\Junk', '\\Sent', '\\Trash', '\\Important')
+}
+
+# Used when the server marks no folder \Sent, tried in this order
+SENT_FOLDER_NAMES = ('[Gmail]/Sent Mail', '[Gmail]/Sent', 'Sent', 'Sent Items', 'Sent Messages')
+
+# Failures after which the connection can no longer be trusted
+_SESSION_BROKEN = (imaplib.IMAP4.abort, OSError, EOFError)
+
+_LIST_LINE = re.compile(rb'\((?P<flags>[^)]*)\) (?P<delimiter>NIL|"(?:[^"\\]|\\.)*") (?P<name>.+)$')
+
+
+def _unquote(name: bytes) -> str:
+    name = name.strip()
+    if name.startswith(b'"') and name.endswith(b'"'):
+        name = re.sub(rb'\\(.)', rb'\1', name[1:-1])
+    return name.decode('utf-8', 'replace')
+
+
+def _credential(password: str) -> bytes:
+    return hashlib.sha256(password.encode('utf-8')).digest()
+
+
+class FolderMap(NamedTuple):
+    """The folders of an account, as listed by the server."""
+    names: List[str]               # Every mailbox name
+    special_use: Dict[str, str]    # Special-use attribute, e.g. '\\Sent', -> mailbox name
+
+    def sent_folder(self) -> str:
+        """Return the Sent folder: the one marked \\Sent, else the first well-known name present."""
+        if SPECIAL_USE_SENT in self.special_use:
+            return self.special_use[SPECIAL_USE_SENT]
+        present = {name.lower(): name for name in self.names}
+        for name in SENT_FOLDER_NAMES:
+            if name.lower() in present:
+                return present[name.lower()]
+        return SENT_FOLDER_NAMES[0]
+
+
+def list_folders(mail: imaplib.IMAP4) -> FolderMap:
+    """
+    List every folder of the account with LIST "" "*".
+
+    Servers with SPECIAL-USE (Gmail among them) report attributes such as
+    \\Sent and \\Trash with each name in the plain LIST response.
+    """
+    status, lines = mail.list('""', '"*"')
+    if status != 'OK':
+        raise imaplib.IMAP4.error(f"LIST failed with status: {status}")
+
+    names, special_use = [], {}
+    for line in lines:
+        if isinstance(line, tuple):
+            # Name sent as a literal
+            line = line[0].rsplit(b'{', 1)[0] + b'"' + line[1].replace(b'\\', b'\\\\').replace(b'"', b'\\"') + b'"'
+        match = _LIST_LINE.match(line or b'')
+        if not match:
+            continue
+        name = _unquote(match.group('name'))
+        names.append(name)
+        for flag in match.group('flags').decode('ascii', 'replace').split():
+            # Keep the first folder for each attribute
+            if flag.lower() in _SPECIAL_USE:
+                special_use.setdefault(_SPECIAL_USE[flag.lower()], name)
+    return FolderMap(names, special_use)
+
+
+class IMAPSession:
+    """An authenticated IMAP connection with the account's folder map and capabilities."""
+
+    def __init__(self, mail: imaplib.IMAP4, key: SessionKey, credential: bytes, folders: FolderMap, now: float):
+        self.mail = mail
+        self.key = key
+        self.credential = credential
+        self.folders = folders
+        self.created_at = now
+        self.last_used = now
+
+    @property
+    def capabilities(self) -> Tuple[str, ...]:
+        return self.mail.capabilities
+
+    def sent_folder(self) -> str:
+        """Return the name of the account's Sent folder."""
+        return self.folders.sent_folder()
+
+    def logout(self):
+        """Log out, ignoring errors from a dead connection."""
+        try:
+            self.mail.logout()
+        except Exception:
+            pass
+
+
+class IMAPSessionManager:
+    """
+    Warm, authenticated IMAP sessions keyed by (host, account).
+
+    A session is returned to the manager after use and handed to the next
+    caller for the same account and password, so repeated runs skip the
+    TCP and TLS handshakes, LOGIN, CAPABILITY and LIST. Sessions are
+    exclusive while borrowed. If the account's session is already in use,
+    another one is opened, and on return only max_idle_per_account are
+    kept.
+
+    A session unused for longer than keepalive_interval is probed with
+    NOOP before reuse, and one unused for longer than idle_timeout is
+    logged out. The folder map and CAPABILITY response are cached per
+    account for folder_cache_ttl seconds, so even a fresh session skips
+    them.
+
+    Args:
+        host: IMAP server host
+        idle_timeout: Seconds after which an unused session is logged out. IMAP
+            servers may drop a connection idle for 30 minutes (RFC 3501)
+        keepalive_interval: Idle seconds after which a session is NOOP-probed before reuse
+        folder_cache_ttl: Seconds the folder map and capabilities of an account are reused
+        max_idle_per_account: Sessions kept open per account between runs
+        imap_factory: Callable creating an imaplib.IMAP4-like object from the host
+        clock: Monotonic clock, injectable for tests
+    """
+
+    def __init__(
+        self,
+        host: str = IMAP_HOST,
+        idle_timeout: float = 600,
+        keepalive_interval: float = 60,
+        folder_cache_ttl: float = 3600,
+        max_idle_per_account: int = 1,
+        imap_factory: Callable[[str], imaplib.IMAP4] = imaplib.IMAP4_SSL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.host = host
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.folder_cache_ttl = folder_cache_ttl
+        self.max_idle_per_account = max_idle_per_account
+        self.imap_factory = imap_factory
+        self.clock = clock
+        self._idle: Dict[SessionKey, List[IMAPSession]] = {}
+        self._account_cache: Dict[SessionKey, Tuple[float, Tuple[str, ...], FolderMap]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, account: str) -> SessionKey:
+        return (self.host, account.strip().lower())
+
+    def _connect(self, key: SessionKey, account: str, password: str) -> IMAPSession:
+        mail = self.imap_factory(self.host)
+        try:
+            mail.login(account, password)
+
+            with self._lock:
+                cached = self._account_cache.get(key)
+            if cached and self.clock() - cached[0] <= self.folder_cache_ttl:
+                _, capabilities, folders = cached
+            else:
+                # Servers may announce more after LOGIN than in their greeting
+                status, data = mail.capability()
+                capabilities = tuple(data[-1].decode('ascii').upper().split()) if status == 'OK' else mail.capabilities
+                folders = list_folders(mail)
+                with self._lock:
+                    self._account_cache[key] = (self.clock(), capabilities, folders)
+            mail.capabilities = capabilities
+            # Before any SELECT, the only time ENABLE is allowed
+            enable_qresync(mail)
+        except Exception:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+            raise
+        return IMAPSession(mail, key, _credential(password), folders, self.clock())
+
+    @staticmethod
+    def _is_alive(session: IMAPSession) -> bool:
+        try:
+            status, _ = session.mail.noop()
+            return status == 'OK'
+        except Exception:
+            return False
+
+    def evict_idle(self):
+        """Log out every idle session that has exceeded the idle timeout."""
+        now = self.clock()
+        expired = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                keep = []
+                for session in idle:
+                    (expired if now - session.last_used > self.idle_timeout else keep).append(session)
+                self._idle[key] = keep
+        for session in expired:
+            session.logout()
+
+    def acquire(self, account: str, password: str) -> IMAPSession:
+        """Borrow the account's warm session, or open one if none is idle and alive."""
+        self.evict_idle()
+        key = self._key(account)
+        credential = _credential(password)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key) or []
+                # Only a caller with the password the session logged in with may reuse it
+                index = next(
+                    (i for i, session in enumerate(idle) if hmac.compare_digest(session.credential, credential)),
+                    None
+                )
+                session = idle.pop(index) if index is not None else None
+            if session is None:
+                return self._connect(key, account, password)
+
+            # Probe sessions that have sat idle long enough for the server to drop them
+            if self.clock() - session.last_used <= self.keepalive_interval or self._is_alive(session):
+                return session
+            session.logout()
+
+    def release(self, session: IMAPSession, broken: bool = False):
+        """Return a borrowed session, logging it out if it failed or enough are kept already."""
+        if not broken:
+            try:
+                self._deselect(session.mail)
+            except Exception:
+                broken = True
+
+        session.last_used = self.clock()
+        with self._lock:
+            idle = self._idle.setdefault(session.key, [])
+            if not broken and len(idle) < self.max_idle_per_account:
+                idle.append(session)
+                return
+        session.logout()
+
+    @staticmethod
+    def _deselect(mail: imaplib.IMAP4):
+        """Leave the selected mailbox, so the next borrower starts in the authenticated state."""
+        if mail.state != 'SELECTED':
+            return
+        if 'UNSELECT' in mail.capabilities:
+            mail.unselect()
+        elif mail.is_readonly:
+            # CLOSE only expunges when the mailbox was opened read-write
+            mail.close()
+
+    @contextmanager
+    def connection(self, account: str, password: str) -> Iterator[IMAPSession]:
+        """Context manager borrowing the account's session and returning it afterwards."""
+        session = self.acquire(account, password)
+        broken = False
+        try:
+            yield session
+        except _SESSION_BROKEN:
+            broken = True
+            raise
+        finally:
+            self.release(session, broken=broken)
+
+    def forget(self, account: str):
+        """Drop the cached folder map and capabilities of an account, e.g. after folders change."""
+        with self._lock:
+            self._account_cache.pop(self._key(account), None)
+
+    def close_all(self):
+        """Log out every idle session."""
+        with self._lock:
+            idle = [session for sessions in self._idle.values() for session in sessions]
+            self._idle.clear()
+        for session in idle:
+            session.logout()
+
+
+_session_manager: Optional[IMAPSessionManager] = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> IMAPSessionManager:
+    """Return the process-wide session manager, which lives as long as the Streamlit server."""
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = IMAPSessionManager()
+        return _session_manager
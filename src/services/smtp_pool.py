@@ -0,0 +1,330 @@
+"""
+SMTP Pool Module for SmartBrew Email Automation System
+Keeps authenticated SMTP connections open for reuse across sends
+"""
+
+import hashlib
+import hmac
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+SMTP_HOST = os.getenv('DEFAULT_SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = 587
+
+PoolKey = Tuple[str, int, str]
+
+# Rejections after which the SMTP session is still usable
+_SESSION_INTACT = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+class SMTPDataDisconnected(smtplib.SMTPServerDisconnected):
+    """The connection dropped once DATA was sent, so the server may have accepted the message."""
+
+
+def _credential(password: str) -> bytes:
+    return hashlib.sha256(password.encode('utf-8')).digest()
+
+
+def transmit(
+    server: smtplib.SMTP,
+    sender_email: str,
+    recipients: List[str],
+    payload: Union[str, bytes]
+) -> str:
+    """
+    Send a message over an open SMTP connection and return the server's final response.
+
+    Mirrors smtplib.SMTP.sendmail, but keeps the reply to DATA so it can be
+    recorded against the recipient. Succeeds if at least one recipient is
+    accepted, like sendmail does.
+
+    Returns:
+        str: The DATA reply, e.g. "250 2.0.0 OK ..."
+
+    Raises:
+        SMTPDataDisconnected: The connection dropped during or after DATA;
+            sending again could deliver the message twice
+    """
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(sender_email)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, sender_email)
+
+    refused = {}
+    for address in recipients:
+        code, resp = server.rcpt(address)
+        if code not in (250, 251):
+            refused[address] = (code, resp)
+    if len(refused) == len(recipients):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    try:
+        code, resp = server.data(payload)
+    except smtplib.SMTPServerDisconnected as e:
+        raise SMTPDataDisconnected(str(e)) from e
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+    return f"{code} {resp.decode('utf-8', 'replace') if isinstance(resp, bytes) else resp}"
+
+
+class PooledConnection:
+    """An authenticated SMTP connection with usage bookkeeping."""
+
+    def __init__(self, server: smtplib.SMTP, key: PoolKey, credential: bytes, now: float):
+        self.server = server
+        self.key = key
+        self.credential = credential
+        self.created_at = now
+        self.last_used = now
+        self.messages_sent = 0
+
+    def close(self):
+        """Close the connection, ignoring errors from a dead socket."""
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Pool of authenticated SMTP connections keyed by (host, port, account).
+
+    Borrowed connections are exclusive to the borrower. An idle connection
+    is only handed to a caller with the password it logged in with. Before an idle
+    connection is handed out it is probed with NOOP if it has been unused for
+    longer than keepalive_interval. Connections idle for longer than
+    idle_timeout are closed, and a connection is retired after
+    max_messages_per_connection messages.
+
+    Args:
+        host: SMTP server host
+        port: SMTP server port
+        use_starttls: Upgrade the connection with STARTTLS before logging in.
+            Disable for a local plain-text test server.
+        max_connections_per_key: Maximum open connections per account
+        idle_timeout: Seconds after which an idle connection is closed
+        keepalive_interval: Idle seconds after which a connection is NOOP-probed before reuse
+        max_messages_per_connection: Messages after which a connection is recycled
+        timeout: Socket timeout for new connections
+        smtp_factory: Callable creating an smtplib.SMTP-like object from (host, port, timeout)
+        clock: Monotonic clock, injectable for tests
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        use_starttls: bool = True,
+        max_connections_per_key: int = 4,
+        idle_timeout: float = 240,
+        keepalive_interval: float = 30,
+        max_messages_per_connection: int = 100,
+        timeout: float = 60,
+        smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.host = host
+        self.port = port
+        self.use_starttls = use_starttls
+        self.max_connections_per_key = max_connections_per_key
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+        self.clock = clock
+        self._idle: Dict[PoolKey, List[PooledConnection]] = {}
+        self._open_counts: Dict[PoolKey, int] = {}
+        self._condition = threading.Condition()
+
+    def _key(self, account: str) -> PoolKey:
+        return (self.host, self.port, account.strip().lower())
+
+    def _connect(self, key: PoolKey, account: str, password: str) -> PooledConnection:
+        server = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_starttls:
+                server.starttls()
+            server.login(account, password)
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+            raise
+        return PooledConnection(server, key, _credential(password), self.clock())
+
+    def _is_alive(self, conn: PooledConnection) -> bool:
+        try:
+            code, _ = conn.server.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def _discard(self, conn: PooledConnection):
+        conn.close()
+        with self._condition:
+            self._open_counts[conn.key] = self._open_counts.get(conn.key, 1) - 1
+            self._condition.notify_all()
+
+    def evict_idle(self):
+        """Close every idle connection that has exceeded the idle timeout."""
+        now = self.clock()
+        expired = []
+        with self._condition:
+            for key, idle in self._idle.items():
+                keep = []
+                for conn in idle:
+                    (expired if now - conn.last_used > self.idle_timeout else keep).append(conn)
+                self._idle[key] = keep
+        for conn in expired:
+            self._discard(conn)
+
+    def acquire(self, account: str, password: str, wait_timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Borrow a connection for an account, opening one if none is idle.
+
+        Blocks while the account already has max_connections_per_key
+        connections checked out. Idle connections opened with another
+        password are never reused; one is closed to make room if needed.
+        """
+        self.evict_idle()
+        key = self._key(account)
+        credential = _credential(password)
+        while True:
+            stale = None
+            with self._condition:
+                idle = self._idle.get(key) or []
+                # Only a caller with the password the connection logged in with may reuse it
+                index = next(
+                    (i for i, conn in enumerate(idle) if hmac.compare_digest(conn.credential, credential)),
+                    None
+                )
+                if index is not None:
+                    conn = idle.pop(index)
+                elif self._open_counts.get(key, 0) < self.max_connections_per_key:
+                    self._open_counts[key] = self._open_counts.get(key, 0) + 1
+                    conn = None
+                elif idle:
+                    # Hand the slot of an idle connection with another password to a new one
+                    stale = idle.pop(0)
+                    conn = None
+                else:
+                    if not self._condition.wait(timeout=wait_timeout):
+                        raise TimeoutError(f"No SMTP connection available for {account}")
+                    continue
+
+            if stale is not None:
+                stale.close()
+
+            if conn is None:
+                try:
+                    return self._connect(key, account, password)
+                except Exception:
+                    with self._condition:
+                        self._open_counts[key] -= 1
+                        self._condition.notify_all()
+                    raise
+
+            # Probe connections that have sat idle long enough for the server to drop them
+            if self.clock() - conn.last_used <= self.keepalive_interval or self._is_alive(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn: PooledConnection, broken: bool = False):
+        """Return a borrowed connection, closing it if broken or due for recycling."""
+        conn.last_used = self.clock()
+        if broken or conn.messages_sent >= self.max_messages_per_connection:
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.setdefault(conn.key, []).append(conn)
+            self._condition.notify_all()
+
+    @contextmanager
+    def connection(self, account: str, password: str) -> Iterator[PooledConnection]:
+        """Context manager borrowing a connection and returning it afterwards."""
+        conn = self.acquire(account, password)
+        broken = False
+        try:
+            yield conn
+        except _SESSION_INTACT:
+            raise
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def send(
+        self,
+        account: str,
+        password: str,
+        sender_email: str,
+        recipients: List[str],
+        payload: Union[str, bytes]
+    ) -> str:
+        """
+        Send one message on a pooled connection.
+
+        If the server dropped the connection before DATA, the message is
+        retried once on a freshly opened connection. A drop during or after
+        DATA is raised as SMTPDataDisconnected instead, since the message
+        may already have been accepted.
+
+        Returns:
+            str: The server's reply to DATA
+        """
+        for attempt in range(2):
+            conn = self.acquire(account, password)
+            try:
+                response = transmit(conn.server, sender_email, recipients, payload)
+            except SMTPDataDisconnected:
+                self.release(conn, broken=True)
+                raise
+            except smtplib.SMTPServerDisconnected:
+                self.release(conn, broken=True)
+                if attempt:
+                    raise
+                continue
+            except _SESSION_INTACT:
+                self.release(conn)
+                raise
+            except Exception:
+                self.release(conn, broken=True)
+                raise
+            conn.messages_sent += 1
+            self.release(conn)
+            return response
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._condition:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+
+_default_pool: Optional[SMTPConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> SMTPConnectionPool:
+    """Return the process-wide pool used by the email sender."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SMTPConnectionPool()
+        return _default_pool
@@ -0,0 +1,223 @@
+"""
+Async Email Sender Module for SmartBrew Email Automation System
+Handles bulk sending over several concurrent SMTP sessions
+"""
+
+import asyncio
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from src.services.async_smtp import AsyncSMTPSession
+from src.services.smtp_pool import SMTP_HOST, SMTP_PORT, SMTPDataDisconnected
+from src.utils.email_sender import (
+    _bulk_result, _load_attachment_parts, _prepare_bulk_recipients
+)
+from src.utils.message_builder import MessageBuilder
+from src.utils.job_store import JobStore, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED
+from src.utils.rate_limiter import RateLimitPolicy, default_policy, get_rate_limiter
+
+_DONE = object()
+
+
+async def send_bulk_emails_async(
+    sender_email: str,
+    app_password: str,
+    recipients_file: UploadedFile,
+    subject: str,
+    message: str,
+    cc_email: str = None,
+    attachment_paths: Optional[List[Union[str, Tuple[str, str]]]] = None,
+    executive_name: str = None,
+    executive_number: str = None,
+    executive_gender: str = None,
+    rate_limit_policy: Optional[RateLimitPolicy] = None,
+    job_store: Optional[JobStore] = None,
+    job_id: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+    concurrency: int = 4,
+    max_messages_per_session: int = 100,
+    smtp_host: str = SMTP_HOST,
+    smtp_port: int = SMTP_PORT,
+    use_starttls: bool = True
+) -> dict:
+    """
+    Send bulk emails from a CSV file over several concurrent SMTP sessions.
+
+    Takes the same CSV and returns the same result dictionary as
+    send_bulk_emails. Every session draws send slots from the account's
+    shared rate limiter, so concurrency raises throughput only as far as
+    the policy allows. Job store calls run on a thread of their own, as
+    sqlite blocks, so they never hold up the sessions.
+
+    Args:
+        sender_email (str): Sender's email address
+        app_password (str): App-specific password
+        recipients_file (UploadedFile): CSV file with 'Email' and 'Name' columns
+        subject (str): Email subject
+        message (str): Email message body
+        cc_email (str, optional): CC email address
+        attachment_paths (List[Union[str, Tuple[str, str]]], optional): List of attachment paths
+        executive_name (str, optional): Executive name for signature
+        executive_number (str, optional): Executive contact number
+        executive_gender (str, optional): Executive gender ('male' or 'female')
+        rate_limit_policy (RateLimitPolicy, optional): Sending rate for this account
+        job_store (JobStore, optional): Store recording per-recipient state
+        job_id (str, optional): Existing job to resume from its pending recipients
+        stop_event (threading.Event, optional): When set, no further messages are started
+        concurrency (int): Number of SMTP sessions kept open at once
+        max_messages_per_session (int): Messages after which a session is reopened
+        smtp_host (str): SMTP server host
+        smtp_port (int): SMTP server port
+        use_starttls (bool): Upgrade sessions with STARTTLS
+
+    Returns:
+        dict: Dictionary containing success count, failed count, last email sent
+              and the job ID when a job store is used
+    """
+    loop = asyncio.get_running_loop()
+    # One thread, so the store's per-thread sqlite connection is opened once and writes never contend
+    store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-store')
+
+    async def in_store_thread(function, *args):
+        return await loop.run_in_executor(store_executor, function, *args)
+
+    try:
+        job_id, total_recipients, pending = await in_store_thread(
+            _prepare_bulk_recipients, job_store, job_id, sender_email, recipients_file, subject, message,
+            cc_email, executive_name, executive_number, executive_gender
+        )
+
+        builder = MessageBuilder(
+            subject, message, cc_email, _load_attachment_parts(attachment_paths),
+            executive_name, executive_number, executive_gender
+        )
+        rate_limiter = get_rate_limiter(sender_email, rate_limit_policy or default_policy(total_recipients))
+        concurrency = max(1, min(concurrency, total_recipients or 1))
+
+        counts = {'success': 0, 'failed': 0, 'last_email': None, 'cancelled': False}
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+        async def open_session() -> AsyncSMTPSession:
+            session = AsyncSMTPSession(smtp_host, smtp_port, use_starttls=use_starttls)
+            try:
+                await session.connect()
+                await session.login(sender_email, app_password)
+            except Exception:
+                await session.quit()
+                raise
+            return session
+
+        async def produce():
+            # Feed recipients lazily so large jobs are never fully in memory; pages come from the store
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    counts['cancelled'] = True
+                    break
+                row = await in_store_thread(next, pending, _DONE)
+                if row is _DONE:
+                    break
+                await queue.put(row)
+            for _ in range(concurrency):
+                await queue.put(_DONE)
+
+        async def send_one(session: Optional[AsyncSMTPSession], row) -> Optional[AsyncSMTPSession]:
+            row_index, email_address, name = row
+            message_id = f"<{uuid.uuid4()}@smartbrew.in>"
+            try:
+                # Reserve a slot from the shared bucket and wait for it without blocking other sessions
+                delay = rate_limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                # Cancelled while queued or waiting for the slot; leave the recipient pending
+                if stop_event is not None and stop_event.is_set():
+                    counts['cancelled'] = True
+                    return session
+
+                payload = builder.build(sender_email, email_address, name, message_id)
+                all_recipients = [email_address]
+                if cc_email:
+                    all_recipients.append(cc_email)
+
+                if job_store and not await in_store_thread(job_store.mark_sending, job_id, row_index, message_id):
+                    # Claimed by another run of the job
+                    return session
+
+                for attempt in range(2):
+                    if session is None or session.messages_sent >= max_messages_per_session:
+                        if session is not None:
+                            await session.quit()
+                        session = await open_session()
+                    try:
+                        smtp_response = await session.sendmail(sender_email, all_recipients, payload)
+                        break
+                    except SMTPDataDisconnected:
+                        # The server may have accepted the message, so sending again could duplicate it
+                        await session.quit()
+                        session = None
+                        raise
+                    except smtplib.SMTPServerDisconnected:
+                        # Dropped before DATA: reconnect once, then give up on this recipient
+                        await session.quit()
+                        session = None
+                        if attempt:
+                            raise
+
+                if job_store:
+                    await in_store_thread(job_store.mark_sent, job_id, row_index, smtp_response)
+                counts['success'] += 1
+                counts['last_email'] = email_address
+
+            except Exception as e:
+                print(f"Error sending email to {email_address}: {str(e)}")
+                counts['failed'] += 1
+                if job_store:
+                    await in_store_thread(job_store.mark_failed, job_id, row_index, str(e), message_id)
+            return session
+
+        async def consume():
+            session = None
+            try:
+                while True:
+                    row = await queue.get()
+                    if row is _DONE:
+                        return
+                    session = await send_one(session, row)
+            finally:
+                if session is not None:
+                    await session.quit()
+
+        # Validate the login once before starting the workers
+        first_session = await open_session()
+        await first_session.quit()
+
+        await asyncio.gather(produce(), *(consume() for _ in range(concurrency)))
+
+        if job_store:
+            await in_store_thread(job_store.set_job_status, job_id, JOB_CANCELLED if counts['cancelled'] else JOB_COMPLETED)
+
+        return await in_store_thread(
+            _bulk_result, job_store, job_id, counts['success'], counts['failed'], counts['last_email']
+        )
+
+    except Exception as e:
+        if job_store and job_id:
+            await in_store_thread(job_store.set_job_status, job_id, JOB_FAILED, str(e))
+        raise Exception(f"Error processing bulk emails: {str(e)}")
+    finally:
+        store_executor.shutdown()
+
+
+def send_bulk_emails_concurrent(*args, **kwargs) -> dict:
+    """
+    Blocking entry point for send_bulk_emails_async.
+
+    Accepts the same arguments and returns the same result dictionary as
+    send_bulk_emails, plus the concurrency settings of send_bulk_emails_async.
+    """
+    return asyncio.run(send_bulk_emails_async(*args, **kwargs))
@@ -0,0 +1,148 @@
+"""
+Campaign Analytics Module for SmartBrew Email Automation System
+Handles reply latency and follow-up attribution statistics over matched campaigns
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# Time-to-first-reply buckets, in hours
+LATENCY_BINS = [0, 1, 4, 12, 24, 48, 72, 168, np.inf]
+LATENCY_LABELS = ['< 1h', '1-4h', '4-12h', '12-24h', '1-2d', '2-3d', '3-7d', '> 7d']
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Follow-ups from this touch on are reported together, e.g. as '5+'
+MAX_TOUCH = 5
+
+# Per-row columns added by analyze_campaigns
+ANALYTICS_COLUMNS = ['Touch', 'Replied', 'Hours to Reply']
+
+
+class CampaignAnalytics(NamedTuple):
+    """Reply statistics of a set of matched campaigns."""
+    messages: pd.DataFrame      # The matches, with ANALYTICS_COLUMNS added
+    summary: dict               # Totals: sends, recipients, replies, reply rate and latency percentiles
+    latency: pd.DataFrame       # Replies per time-to-first-reply bucket
+    by_hour: pd.DataFrame       # Sends, replies and reply rate per send hour, 0-23
+    by_weekday: pd.DataFrame    # The same per send weekday
+    by_touch: pd.DataFrame      # The same per follow-up number to the recipient, with latency
+    by_executive: pd.DataFrame  # The same per executive in CC, with latency
+
+
+def analyze_campaigns(df: pd.DataFrame) -> CampaignAnalytics:
+    """
+    Compute reply latency and multi-touch attribution for matched campaigns.
+
+    Every message sent to a recipient is a touch, numbered in send order.
+    A reply is credited to the last touch before it: a touch counts as
+    replied when its first reply came before the next touch to the same
+    recipient. The time to reply runs from that touch to the reply. A
+    message matched once per executive is counted once, except in the
+    per-executive cohorts.
+
+    Frames from before the reply columns existed are still accepted; their
+    touches count as replied by 'Status' and have no latency.
+
+    Args:
+        df: Matches as returned by campaign_matcher.match_campaigns
+
+    Returns:
+        CampaignAnalytics: Per-message columns and the aggregate tables
+    """
+    frame = df.copy()
+    recipient = frame['Follow-up Email'].astype(str).str.strip().str.lower()
+
+    # Send times in UTC, for ordering touches and measuring latency
+    local_date = pd.to_datetime(frame['Date'], format='%Y-%m-%d %H:%M', errors='coerce')
+    if 'Sent At' in frame.columns:
+        sent = pd.to_datetime(frame['Sent At'], utc=True, errors='coerce')
+    else:
+        sent = pd.Series(pd.NaT, index=frame.index, dtype='datetime64[ns, UTC]')
+    sent = sent.fillna(local_date.dt.tz_localize('UTC'))
+
+    if 'First Reply At' in frame.columns:
+        reply = pd.to_datetime(frame['First Reply At'], utc=True, errors='coerce')
+    else:
+        reply = pd.Series(pd.NaT, index=frame.index, dtype='datetime64[ns, UTC]')
+    responded = frame['Status'].eq('Responded').to_numpy()
+
+    # One row per send: the same message matched for several executives is a single touch
+    sends = pd.DataFrame({'recipient': recipient, 'sent': sent, 'reply': reply, 'responded': responded})
+    sends = sends[sends['sent'].notna()]
+    sends = sends.sort_values(['recipient', 'sent'], kind='stable')
+    sends = sends[~sends.duplicated(['recipient', 'sent'])]
+    by_recipient = sends.groupby('recipient', sort=False)
+    sends['touch'] = by_recipient.cumcount().to_numpy() + 1
+    next_sent = by_recipient['sent'].shift(-1)
+
+    if 'First Reply At' in frame.columns:
+        # Last-touch attribution: the reply must come before the next touch
+        sends['replied'] = sends['reply'].notna() & (next_sent.isna() | (sends['reply'] < next_sent))
+    else:
+        sends['replied'] = sends['responded']
+    sends['hours'] = ((sends['reply'] - sends['sent']).dt.total_seconds() / 3600).where(sends['replied'])
+
+    # Spread the per-send results back over every matched row
+    per_row = pd.DataFrame({'recipient': recipient, 'sent': sent}).merge(
+        sends[['recipient', 'sent', 'touch', 'replied', 'hours']], on=['recipient', 'sent'], how='left'
+    )
+    frame['Touch'] = per_row['touch'].astype('Int64').to_numpy()
+    frame['Replied'] = per_row['replied'].fillna(False).astype(bool).to_numpy()
+    frame['Hours to Reply'] = per_row['hours'].to_numpy()
+
+    # Hour and weekday in the sender's own time zone, as shown in 'Date'
+    send_time = local_date.fillna(sent.dt.tz_localize(None))
+    timed = frame.assign(recipient=recipient, hour=send_time.dt.hour, weekday=send_time.dt.dayofweek)
+    timed = timed[timed['Touch'].notna()].drop_duplicates(['recipient', 'Touch'])
+
+    hours = sends['hours'].dropna()
+    latency = pd.cut(hours, LATENCY_BINS, labels=LATENCY_LABELS, right=False).value_counts(sort=False)
+    latency = latency.reindex(LATENCY_LABELS, fill_value=0).to_frame('Replies')
+    latency['Share'] = (latency['Replies'] / max(len(hours), 1) * 100).round(1)
+
+    by_hour = _reply_rates(timed, 'hour').reindex(range(24), fill_value=0)
+    by_hour.index.name = 'Hour'
+    by_weekday = _reply_rates(timed, 'weekday').reindex(range(7), fill_value=0)
+    by_weekday.index = pd.Index(WEEKDAYS, name='Weekday')
+
+    touch = sends['touch'].clip(upper=MAX_TOUCH)
+    touch_labels = [str(number) for number in range(1, MAX_TOUCH)] + [f'{MAX_TOUCH}+']
+    by_touch = _reply_rates(sends.assign(touch=touch), 'touch', replied_column='replied', latency_column='hours')
+    by_touch = by_touch.reindex(range(1, touch.max() + 1) if len(touch) else [])
+    by_touch.index = pd.Index(touch_labels[:len(by_touch)], name='Touch')
+
+    cohorts = frame[frame['Touch'].notna()].assign(
+        executive=frame['Executive Name'].fillna('Unknown') if 'Executive Name' in frame.columns else 'All'
+    )
+    by_executive = _reply_rates(cohorts, 'executive', latency_column='Hours to Reply')
+    by_executive.index.name = 'Executive Name'
+
+    replies = int(sends['replied'].sum())
+    summary = {
+        'sends': len(sends),
+        'recipients': int(sends['recipient'].nunique()),
+        'replies': replies,
+        'reply_rate': round(replies / len(sends) * 100, 1) if len(sends) else 0.0,
+        'median_hours': round(float(hours.median()), 1) if len(hours) else None,
+        'p90_hours': round(float(hours.quantile(0.9)), 1) if len(hours) else None,
+    }
+    return CampaignAnalytics(frame, summary, latency, by_hour, by_weekday, by_touch, by_executive)
+
+
+def _reply_rates(frame: pd.DataFrame, key: str, replied_column: str = 'Replied',
+                 latency_column: Optional[str] = None) -> pd.DataFrame:
+    """Count sends and replies per value of key, with the reply rate and, optionally, latency percentiles."""
+    grouped = frame.groupby(key)
+    stats = pd.DataFrame({
+        'Sent': grouped.size(),
+        'Replied': grouped[replied_column].sum().astype(int),
+    })
+    stats['Reply Rate'] = (stats['Replied'] / stats['Sent'] * 100).round(1)
+    if latency_column:
+        latency = grouped[latency_column]
+        stats['Median Hours'] = latency.median().round(1)
+        stats['P90 Hours'] = latency.quantile(0.9).round(1)
+    return stats
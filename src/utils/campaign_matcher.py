@@ -7,13 +7,33 @@ import imaplib
 import email
 import pandas as pd
 import re
-from email.utils import parseaddr, parsedate_to_datetime
-from datetime import datetime, timedelta
+from bisect import bisect_left
+from email.utils import getaddresses, parseaddr, parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+
+from src.services.imap_fetch import body_section, fetch_batch, fetch_batched, supports_gmail_extensions
+from src.services.imap_search import SearchFilter, search_messages
+from src.services.imap_session import get_session_manager
+from src.utils.mailbox_index import INBOX, get_mailbox_index, quote_mailbox
+
+MATCH_COLUMNS = ['Name', 'Follow-up Email', 'Date', 'Subject', 'Status', 'Executive Name']
+
+# Columns for reply analytics: UTC send time, UTC time of the first reply after it, and the thread
+REPLY_COLUMNS = ['Sent At', 'First Reply At', 'Thread ID']
+
+# The header fields a campaign match is built from; bodies are never downloaded
+MATCH_HEADER_FIELDS = 'FROM TO CC DATE SUBJECT MESSAGE-ID REFERENCES IN-REPLY-TO'
 
 def match_campaigns(campaign_email, app_password, executive_email=None, 
-                    start_date=None, end_date=None, subject_filter=None):
+                    start_date=None, end_date=None, subject_filter=None,
+                    use_index=True, index=None, batch_size=200, executive_emails=None,
+                    session_manager=None):
     """
     Match campaigns from sent emails based on CC executive
+
+    With several executives the Sent folder is still read once. A
+    message is attributed to every executive in its CC, giving one row
+    per executive, so the results group by 'Executive Name'.
     
     Parameters:
     -----------
@@ -22,243 +42,361 @@ def match_campaigns(campaign_email, app_password, executive_email=None,
     app_password : str
         Application-specific password for authentication
     executive_email : str, optional
-        Executive email to filter by (in CC field)
+        Executive email to filter by (in CC field), compared as a whole address
     start_date : datetime.date, optional
         Date to filter emails from (inclusive)
     end_date : datetime.date, optional
         Date to filter emails until (inclusive)
     subject_filter : str, optional
-        Subject line to filter emails by
+        Keywords that must all appear in the subject line
+    use_index : bool, optional
+        Answer from the local mailbox index, downloading only messages
+        that arrived since the last run (default True)
+    index : MailboxIndex, optional
+        Index to use instead of the shared one
+    batch_size : int, optional
+        Messages fetched per FETCH command when reading the server (default 200)
+    executive_emails : list of str, optional
+        Several executive emails to match at once, in addition to executive_email
+    session_manager : IMAPSessionManager, optional
+        Where to borrow the IMAP session from instead of the shared manager
         
     Returns:
     --------
     pandas.DataFrame
-        Dataframe containing matched campaign information
+        Dataframe containing matched campaign information: MATCH_COLUMNS,
+        plus REPLY_COLUMNS for campaign_analytics.analyze_campaigns
     """
+    executives = _executive_addresses(executive_email, executive_emails)
+
     try:
-        # Connect to Gmail IMAP server
-        mail = imaplib.IMAP4_SSL('imap.gmail.com')
-        mail.login(campaign_email, app_password)
-        
-        # Make sure the sent mail folder exists
-        status, folders = mail.list()
-        sent_folder = None
-        for folder in folders:
-            folder_str = folder.decode('utf-8')
-            if '[Gmail]/Sent Mail' in folder_str:
-                sent_folder = '"[Gmail]/Sent Mail"'
-                break
-            elif '[Gmail]/Sent' in folder_str:
-                sent_folder = '"[Gmail]/Sent"'
-                break
-        
-        # If we didn't find the sent folder, try a default
-        if not sent_folder:
-            sent_folder = '"[Gmail]/Sent Mail"'
-        
-        # Select the sent folder
+        # Reuse the account's warm IMAP session; the Sent folder comes from its cached folder map
+        manager = session_manager or get_session_manager()
+        with manager.connection(campaign_email, app_password) as session:
+            if use_index:
+                return _match_from_index(session.mail, index or get_mailbox_index(), campaign_email,
+                                         session.sent_folder(), executives, start_date, end_date, subject_filter)
+            return _match_from_server(session.mail, session.sent_folder(), executives,
+                                      start_date, end_date, subject_filter, batch_size)
+    except Exception as e:
+        raise Exception(f"Error matching campaigns: {str(e)}")
+
+def _match_from_server(mail, sent_folder, executives, start_date, end_date, subject_filter, batch_size):
+    """
+    Helper function to match campaigns by searching and fetching from the server
+
+    Inbox replies are collected first, then the Sent folder is searched
+    with every filter, CC included, and only the header fields of the
+    matches are fetched.
+    """
+    # Default to 30 days ago
+    since = start_date or datetime.now().date() - timedelta(days=30)
+    gmail = supports_gmail_extensions(mail)
+
+    # Collect what the inbox replies to once, so each sent message is a dictionary lookup
+    replies = _inbox_replies(mail, since, gmail)
+
+    # Select the sent folder
+    try:
+        mail.select(quote_mailbox(sent_folder), readonly=True)
+    except Exception as e:
+        raise Exception(f"Could not access sent mail folder: {str(e)}")
+
+    # Search on the server, CC included, so only matching emails are fetched
+    search = SearchFilter(since=since, before=end_date, subject=subject_filter, cc=executives)
+    uids = search_messages(mail, search, gmail=gmail)
+
+    # List to store all matched campaigns
+    matches = []
+
+    # Fetch only the header fields a match needs, one FETCH command per batch
+    for start in range(0, len(uids), batch_size):
         try:
-            mail.select(sent_folder)
-        except Exception as e:
-            raise Exception(f"Could not access sent mail folder: {str(e)}")
-            
-        # Convert start_date to string format if provided
-        if start_date:
-            start_date_str = start_date.strftime("%d-%b-%Y")
-        else:
-            # Default to 30 days ago
-            default_start = datetime.now().date() - timedelta(days=30)
-            start_date_str = default_start.strftime("%d-%b-%Y")
-        
-        # Build search query
-        search_parts = []
-        search_parts.append(f'SINCE "{start_date_str}"')
-        
-        # Add end date if provided
-        if end_date:
-            end_date_str = end_date.strftime("%d-%b-%Y")
-            search_parts.append(f'BEFORE "{end_date_str}"')
-        
-        # Add subject filter if provided
-        if subject_filter:
-            # Escape quotes in subject filter
-            safe_subject = subject_filter.replace('"', '\\"')
-            search_parts.append(f'SUBJECT "{safe_subject}"')
-        
-        # Combine search parts with AND
-        search_query = '(' + ' '.join(search_parts) + ')'
-        
-        # Search for matching emails
-        status, data = mail.search(None, search_query)
-        if status != 'OK':
-            raise Exception(f"Search failed with status: {status}")
-            
-        mail_ids = data[0].split()
-        
-        # List to store all matched campaigns
-        matches = []
-        
-        # Process emails
-        for email_id in mail_ids:
+            records = fetch_batch(mail, uids[start:start + batch_size],
+                                  f'(BODY.PEEK[HEADER.FIELDS ({MATCH_HEADER_FIELDS})])', uid=True)
+        except Exception:
+            # Skip this batch if the server could not return it
+            continue
+
+        for record in records.values():
             try:
-                status, data = mail.fetch(email_id, '(RFC822)')
-                if status != 'OK' or not data or not data[0]:
-                    continue
-                
-                # Parse email data
-                raw_email = data[0][1]
-                msg = email.message_from_bytes(raw_email)
-                
-                # Get CC recipients
-                cc_field = msg.get('Cc', '')
-                cc_list = cc_field if isinstance(cc_field, str) else ''
-                
-                # If executive email is specified, check if in CC
-                if executive_email and executive_email.strip():
-                    # Case insensitive check for the email in CC field
-                    if executive_email.lower() not in cc_list.lower():
-                        continue
-                
-                # Get email details
-                to_field = msg.get('To', '')
-                if not to_field:
+                header_data = body_section(record)
+                if not header_data:
                     continue
-                    
-                # Extract recipient name and email
-                # Try to get name from the To field
-                to_name = "Unknown"
-                to_email = ""
-                
-                # First try parseaddr
-                name, to_email = parseaddr(to_field)
-                if name and name != to_email:
-                    to_name = name
-                # If that fails, try a simple extraction
-                elif '<' in to_field:
-                    to_name = to_field.split('<')[0].strip('" \t\n')
-                    to_email_match = re.search(r'<([^>]+)>', to_field)
-                    if to_email_match:
-                        to_email = to_email_match.group(1)
-                else:
-                    to_email = to_field.strip()
-                
-                # Extract and format date
-                date_str = msg.get('Date', '')
-                try:
-                    # Try to parse the date
-                    parsed_date = parsedate_to_datetime(date_str)
-                    date = parsed_date.strftime("%Y-%m-%d %H:%M")
-                except:
-                    # If parsing fails, use the original string
-                    date = date_str
-                
-                # Get subject
-                subject = msg.get('Subject', '(No Subject)')
-                # Decode subject if needed
-                if isinstance(subject, bytes):
-                    try:
-                        subject = subject.decode('utf-8')
-                    except:
-                        subject = "(Encoding Error)"
-                
-                # Extract message ID for response checking
-                message_id = msg.get('Message-ID', '')
-                
-                # Determine executive name
-                if executive_email:
-                    # Extract name from email (before @)
-                    exec_parts = executive_email.split('@')
-                    if len(exec_parts) > 0:
-                        executive_name = exec_parts[0].capitalize()
-                    else:
-                        executive_name = "Unknown"
-                else:
-                    # Try to get the From field for the sender's name
-                    from_field = msg.get('From', '')
-                    from_name, _ = parseaddr(from_field)
-                    executive_name = from_name if from_name else "Various"
-                
+                msg = email.message_from_bytes(header_data)
+
                 # Check if there was a response
-                has_response = _check_for_response(mail, message_id)
-                
-                # Add to our dataset
-                matches.append({
-                    'Name': to_name,
-                    'Follow-up Email': to_email,
-                    'Date': date,
-                    'Subject': subject,
-                    'Status': 'Responded' if has_response else 'Not Responded',
-                    'Executive Name': executive_name
-                })
-            
-            except Exception as e:
+                reply_times = replies.get(msg.get('Message-ID', '').strip(), [])
+                for match in _match_message(msg, executives):
+                    # Responded only with a reply dated at or after the send, as on the index path
+                    first_reply = _first_reply_after(reply_times, match['Sent At'])
+                    match['Status'] = 'Responded' if first_reply is not None else 'Not Responded'
+                    match['First Reply At'] = first_reply
+                    match['Thread ID'] = _thread_root(msg)
+                    matches.append(match)
+
+            except Exception:
                 # Skip this email if there's an error processing it
                 continue
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(matches)
-        
-        # If DataFrame is empty, return an empty DataFrame with the correct columns
-        if df.empty:
-            return pd.DataFrame(columns=['Name', 'Follow-up Email', 'Date', 'Subject', 'Status', 'Executive Name'])
-            
-        return df
-        
-    except Exception as e:
-        raise Exception(f"Error matching campaigns: {str(e)}")
-    finally:
+
+    # Convert to DataFrame
+    return _matches_frame(matches)
+
+def _match_from_index(mail, index, campaign_email, sent_folder, executives,
+                      start_date, end_date, subject_filter):
+    """
+    Helper function to match campaigns from the local mailbox index
+
+    The Sent folder and inbox are synced first, so only messages that
+    arrived since the last run are downloaded. A sent message counts as
+    responded when its thread holds an inbox message dated at or after
+    it, so the lead's own email that a campaign message answered does
+    not count.
+    """
+    index.sync(mail, campaign_email, [sent_folder, INBOX])
+
+    # Default to 30 days ago
+    since = start_date or datetime.now().date() - timedelta(days=30)
+
+    # When the inbox messages of each thread arrived, for the time to first reply
+    reply_times = {}
+    for page in index.iter_messages(campaign_email, INBOX, since=since):
+        for msg in page:
+            received_at = _utc_date(msg.get('Date'))
+            if msg.get('thread_id') and received_at:
+                reply_times.setdefault(msg['thread_id'], []).append(received_at)
+    for times in reply_times.values():
+        times.sort()
+
+    matches = []
+    sent = index.messages(campaign_email, sent_folder, since=since, before=end_date, subject=subject_filter, cc=executives)
+    for msg in sent:
         try:
-            mail.close()
-            mail.logout()
-        except:
-            pass
+            thread_replies = reply_times.get(msg.get('thread_id'), [])
+            for match in _match_message(msg, executives):
+                first_reply = _first_reply_after(thread_replies, match['Sent At'])
+                match['Status'] = 'Responded' if first_reply is not None else 'Not Responded'
+                match['First Reply At'] = first_reply
+                match['Thread ID'] = msg.get('thread_id')
+                matches.append(match)
+        except Exception:
+            # Skip this email if there's an error processing it
+            continue
 
-def _check_for_response(mail, message_id):
+    return _matches_frame(matches)
+
+def _matches_frame(matches):
+    """
+    Helper function to convert matches to a DataFrame, keeping the columns when there are none
     """
-    Helper function to check if a message has received a response
-    by searching for emails with In-Reply-To header matching the message_id
+    df = pd.DataFrame(matches, columns=MATCH_COLUMNS + REPLY_COLUMNS)
     
+    # If DataFrame is empty, return an empty DataFrame with the correct columns
+    if df.empty:
+        return pd.DataFrame(columns=MATCH_COLUMNS + REPLY_COLUMNS)
+        
+    return df
+
+def _executive_addresses(executive_email=None, executive_emails=None):
+    """
+    Helper function to normalize executive emails into lowercase addresses
+
+    Entries may be plain addresses, "Name <address>" or comma-separated
+    lists of either. Duplicates are dropped and the order is kept.
+    """
+    values = [executive_email] + list(executive_emails or [])
+    addresses = []
+    for _, address in getaddresses([value for value in values if value]):
+        address = address.strip().lower()
+        if address and address not in addresses:
+            addresses.append(address)
+    return addresses
+
+def _cc_addresses(msg):
+    """
+    Helper function to get the lowercase addresses in a message's Cc header(s)
+    """
+    if hasattr(msg, 'get_all'):
+        cc_fields = msg.get_all('Cc') or []
+    else:
+        cc_fields = [msg.get('Cc') or '']
+    return {address.strip().lower() for _, address in getaddresses([str(field) for field in cc_fields]) if address}
+
+def _match_message(msg, executives=()):
+    """
+    Helper function to turn one sent message into campaign matches
+
     Parameters:
     -----------
-    mail : imaplib.IMAP4_SSL
-        Active IMAP connection
-    message_id : str
-        Message ID to check for responses
-        
+    msg : email.message.Message or dict
+        Parsed message, or a message from the mailbox index
+    executives : list of str, optional
+        Lowercase executive addresses, as from _executive_addresses; the
+        message must have at least one of them in CC
+
     Returns:
     --------
-    bool
-        True if response found, False otherwise
+    list of dict
+        One match per executive in CC (a single match when no executives
+        are given), with 'Status', 'First Reply At' and 'Thread ID' still
+        unset; empty if the message does not match
     """
-    if not message_id:
-        return False
-        
+    # Executives are compared with the CC addresses as whole addresses
+    if executives:
+        cc_addresses = _cc_addresses(msg)
+        matched_executives = [address for address in executives if address in cc_addresses]
+        if not matched_executives:
+            return []
+
+    # Get email details
+    to_field = msg.get('To', '')
+    if not to_field:
+        return []
+
+    # Extract recipient name and email
+    # Try to get name from the To field
+    to_name = "Unknown"
+    to_email = ""
+
+    # First try parseaddr
+    name, to_email = parseaddr(to_field)
+    if name and name != to_email:
+        to_name = name
+    # If that fails, try a simple extraction
+    elif '<' in to_field:
+        to_name = to_field.split('<')[0].strip('" \t\n')
+        to_email_match = re.search(r'<([^>]+)>', to_field)
+        if to_email_match:
+            to_email = to_email_match.group(1)
+    else:
+        to_email = to_field.strip()
+
+    # Extract and format date
+    date_str = msg.get('Date', '')
     try:
-        # Save current folder
-        current_folder = mail.select()[1][0].decode('utf-8').split('"')[1]
-        
-        # Switch to inbox to look for replies
-        mail.select('inbox')
-        
-        # Search for emails that are replies to the given message_id
-        # Escape quotes in message ID
-        safe_message_id = message_id.replace('"', '\\"')
-        search_query = f'(HEADER IN-REPLY-TO "{safe_message_id}")'
-        status, data = mail.search(None, search_query)
-        
-        # If we found any replies, return True
-        mail_ids = data[0].split()
-        return len(mail_ids) > 0
-    
-    except Exception as e:
-        # If there's an error, assume no response
-        return False
-    finally:
-        # Switch back to original folder for continued operations
+        # Try to parse the date
+        parsed_date = parsedate_to_datetime(date_str)
+        date = parsed_date.strftime("%Y-%m-%d %H:%M")
+    except:
+        # If parsing fails, use the original string
+        date = date_str
+
+    # Get subject
+    subject = msg.get('Subject', '(No Subject)')
+    # Decode subject if needed
+    if isinstance(subject, bytes):
         try:
-            mail.select(current_folder)
+            subject = subject.decode('utf-8')
         except:
-            try:
-                mail.select('"[Gmail]/Sent Mail"')
-            except:
-                pass 
\ No newline at end of file
+            subject = "(Encoding Error)"
+
+    match = {
+        'Name': to_name,
+        'Follow-up Email': to_email,
+        'Date': date,
+        'Subject': subject,
+        'Status': None,  # Set by the caller once the response check has run
+        'Sent At': _utc_date(date_str),
+    }
+
+    # Determine executive name
+    if executives:
+        # Extract name from email (before @)
+        return [dict(match, **{'Executive Name': address.split('@')[0].capitalize() or "Unknown"})
+                for address in matched_executives]
+
+    # Try to get the From field for the sender's name
+    from_field = msg.get('From', '')
+    from_name, _ = parseaddr(from_field)
+    match['Executive Name'] = from_name if from_name else "Various"
+    return [match]
+
+def _inbox_replies(mail, since, gmail=False, batch_size=500):
+    """
+    Helper function to collect when inbox messages replied to each Message-ID
+
+    Inbox messages from the date window on are fetched in batches, for
+    their arrival time and their In-Reply-To and References headers only.
+    A sent message has been responded to when its Message-ID is a key of
+    the returned dictionary.
+
+    Parameters:
+    -----------
+    mail : imaplib.IMAP4_SSL
+        Active IMAP connection; the inbox is left selected
+    since : datetime.date
+        Only inbox messages received on or after this date
+    gmail : bool, optional
+        Whether the server has Gmail's search extensions
+    batch_size : int, optional
+        Messages per FETCH command
+
+    Returns:
+    --------
+    dict
+        Every Message-ID named in an inbox message's In-Reply-To or
+        References, mapped to the sorted UTC arrival times of those messages
+    """
+    status, _ = mail.select(quote_mailbox(INBOX), readonly=True)
+    if status != 'OK':
+        raise Exception("Could not access inbox")
+
+    replies = {}
+    uids = search_messages(mail, SearchFilter(since=since), gmail=gmail)
+    items = '(INTERNALDATE BODY.PEEK[HEADER.FIELDS (IN-REPLY-TO REFERENCES)])'
+    for _, records in fetch_batched(mail, uids, items, batch_size=batch_size, uid=True):
+        for record in records.values():
+            headers = email.message_from_bytes(body_section(record) or b'')
+            received_at = _internal_date(record.get('INTERNALDATE'))
+            for message_id in set(f"{headers.get('In-Reply-To', '')} {headers.get('References', '')}".split()):
+                replies.setdefault(message_id, []).append(received_at)
+    for times in replies.values():
+        times.sort(key=lambda value: (value is None, value))
+    return replies
+
+def _internal_date(value):
+    """
+    Helper function to parse an INTERNALDATE such as "17-Jul-1996 02:44:25 -0700" to UTC, or None
+    """
+    if isinstance(value, bytes):
+        value = value.decode('ascii', 'replace')
+    try:
+        return datetime.strptime(value.strip(), "%d-%b-%Y %H:%M:%S %z").astimezone(timezone.utc)
+    except (AttributeError, ValueError):
+        return None
+
+def _utc_date(date_str):
+    """
+    Helper function to parse a Date header to a UTC datetime, or None; dates without a zone count as UTC
+    """
+    try:
+        parsed_date = parsedate_to_datetime(str(date_str))
+    except (TypeError, ValueError):
+        return None
+    if parsed_date.tzinfo is None:
+        return parsed_date.replace(tzinfo=timezone.utc)
+    return parsed_date.astimezone(timezone.utc)
+
+def _first_reply_after(reply_times, sent_at):
+    """
+    Helper function to pick the first of the sorted reply times at or after sent_at
+
+    Without a send time the first reply counts. Returns None when no reply came after the send.
+    """
+    reply_times = [value for value in reply_times if value is not None]
+    if not reply_times:
+        return None
+    if sent_at is None:
+        return reply_times[0]
+    position = bisect_left(reply_times, sent_at)
+    return reply_times[position] if position < len(reply_times) else None
+
+def _thread_root(msg):
+    """
+    Helper function to name a message's thread by its first message: the first References
+    entry, else In-Reply-To, else its own Message-ID
+    """
+    references = f"{msg.get('References', '')}".split()
+    if references:
+        return references[0]
+    return (msg.get('In-Reply-To', '') or msg.get('Message-ID', '')).strip() or None
@@ -5,13 +5,80 @@ Handles extraction of emails from a mailbox based on filters
 
 import imaplib
 import email
+import threading
+import time
 import pandas as pd
+from email.message import Message
 from email.utils import parseaddr
 from datetime import datetime
-from typing import List, Dict, Optional, Set
-import gc
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set
 import re
 
+from collections import Counter
+
+from src.services.imap_fetch import (
+    GMAIL_ID_ITEMS,
+    body_section,
+    fetch_batch,
+    fetch_text_bodies,
+    gmail_id,
+    supports_gmail_extensions,
+)
+from src.services.imap_pool import DEFAULT_POOL_SIZE, IMAPConnectionPool, map_uid_chunks
+from src.services.imap_search import SearchFilter, search_messages
+from src.services.imap_session import list_folders
+from src.utils.mailbox_index import INBOX, MailboxIndex, get_mailbox_index, quote_mailbox
+from src.utils.row_buffer import RowBuffer
+from src.utils.thread_index import ThreadIndex
+
+# Fetch profiles: how much of each message extract_emails downloads
+PROFILE_FULL = 'full'        # Whole RFC822 message, attachments included
+PROFILE_HEADERS = 'headers'  # Only the header fields extraction uses
+PROFILE_TEXT = 'text'        # Header fields plus the start of the plain-text part
+FETCH_PROFILES = (PROFILE_FULL, PROFILE_HEADERS, PROFILE_TEXT)
+
+EXTRACT_HEADER_FIELDS = 'FROM TO CC SUBJECT DATE MESSAGE-ID REFERENCES IN-REPLY-TO'
+
+
+
+class ExtractionProgress(NamedTuple):
+    """One step of a streamed extraction."""
+    rows: List[Dict]               # Rows extracted since the previous step
+    processed: int                 # Messages processed so far
+    total: int                     # Messages matching the search
+    notice: Optional[str] = None   # Why the result is incomplete, on the last step
+
+
+# Header names read from a _CompactMessage, and the fields holding them
+_COMPACT_FIELDS = {
+    'Subject': 'subject',
+    'From': 'sender',
+    'To': 'to',
+    'Date': 'date',
+    'References': 'references',
+    'In-Reply-To': 'in_reply_to',
+}
+
+
+class _CompactMessage(NamedTuple):
+    """The parts of a fetched message that rows are built from, kept as a plain tuple."""
+    subject: str
+    sender: str
+    to: str
+    date: str
+    references: str
+    in_reply_to: str
+    body: str
+    thread_key: object  # Message-ID, or Gmail thread ID
+
+    def get(self, header: str, default=''):
+        """Read a header by name, like email.message.Message.get."""
+        field = _COMPACT_FIELDS.get(header)
+        value = getattr(self, field) if field else None
+        return value if value else default
+
+
 def extract_emails(
     email_id: str,
     app_password: str,
@@ -19,12 +86,64 @@ def extract_emails(
     end_date: Optional[datetime] = None,
     folder: str = 'sent',
     batch_size: int = 100,
-    max_emails: int = 3000,
-    subject_filter: Optional[str] = None
+    max_emails: Optional[int] = None,
+    subject_filter: Optional[str] = None,
+    fetch_profile: Optional[str] = None,
+    body_bytes: int = 16384,
+    use_index: bool = True,
+    index: Optional[MailboxIndex] = None,
+    connections: int = DEFAULT_POOL_SIZE,
+    time_budget: Optional[float] = None,
+    thread_time_budget: Optional[float] = None,
+    search: Optional[SearchFilter] = None
 ) -> List[Dict]:
     """
     Extract emails from Gmail account with optimized performance.
 
+    Collects everything iter_extracted_emails() yields; takes the same arguments.
+
+    Returns:
+        List[Dict]: List of extracted emails with details
+    """
+    extracted_emails = []
+    for progress in iter_extracted_emails(
+        email_id, app_password, start_date, end_date, folder, batch_size, max_emails,
+        subject_filter, fetch_profile, body_bytes, use_index, index, connections,
+        time_budget, thread_time_budget, search
+    ):
+        extracted_emails.extend(progress.rows)
+    return extracted_emails
+
+def iter_extracted_emails(
+    email_id: str,
+    app_password: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    folder: str = 'sent',
+    batch_size: int = 100,
+    max_emails: Optional[int] = None,
+    subject_filter: Optional[str] = None,
+    fetch_profile: Optional[str] = None,
+    body_bytes: int = 16384,
+    use_index: bool = True,
+    index: Optional[MailboxIndex] = None,
+    connections: int = DEFAULT_POOL_SIZE,
+    time_budget: Optional[float] = None,
+    thread_time_budget: Optional[float] = None,
+    search: Optional[SearchFilter] = None
+) -> Iterator[ExtractionProgress]:
+    """
+    Extract emails from Gmail account, yielding rows batch by batch as they are parsed.
+
+    Each step carries the rows of the messages processed since the last
+    one and the running count, so a caller can show progress and write
+    results out without holding the whole extraction. Closing the
+    generator early stops the extraction and logs out.
+
+    There is no fixed cap on the number of messages. Memory stays bounded:
+    messages parsed before the thread mapping is ready wait as compact
+    tuples in a RowBuffer, which moves them to disk when there are many.
+
     Args:
         email_id (str): Email address
         app_password (str): App-specific password
@@ -32,337 +151,546 @@ def extract_emails(
         end_date (datetime, optional): End date for filtering (inclusive)
         folder (str): 'sent' or 'inbox'
         batch_size (int): Number of emails to process in each batch
-        max_emails (int, optional): Maximum number of emails to extract
-        subject_filter (str, optional): Filter emails by subject keywords
-
-    Returns:
-        List[Dict]: List of extracted emails with details
+        max_emails (int, optional): Maximum number of emails to extract; all of them if None
+        subject_filter (str, optional): Keywords that must all appear in the subject;
+            double-quoted words are matched as a phrase
+        fetch_profile (str, optional): 'headers', 'text' or 'full'. Defaults to
+            'headers' for the sent folder and 'text' for the inbox
+        body_bytes (int): Maximum bytes of the plain-text part fetched with the 'text' profile
+        use_index (bool): Answer from the local mailbox index, downloading only messages
+            that arrived since the last extraction. The 'full' profile always reads the server
+        index (MailboxIndex, optional): Index to use instead of the shared one
+        connections (int): Extra IMAP connections opened for the extraction. Folders
+            and UID ranges are fetched in parallel over them
+        time_budget (float, optional): Seconds after which no further batch is fetched.
+            The last step's notice says the result was cut short
+        thread_time_budget (float, optional): Seconds the thread mapping may take. Past
+            it, responses are detected from the messages mapped so far, and the last
+            step's notice says so
+        search (SearchFilter, optional): Further criteria such as sender, recipient, CC,
+            attachments or size. start_date, end_date and subject_filter are added to it.
+            The whole filter runs as a server-side SEARCH, so only matching messages are fetched
+
+    Yields:
+        ExtractionProgress: Rows of the latest batch with the processed and total message counts
     """
+    if fetch_profile is None:
+        fetch_profile = PROFILE_HEADERS if folder.lower() == 'sent' else PROFILE_TEXT
+    if fetch_profile not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile '{fetch_profile}', expected one of {', '.join(FETCH_PROFILES)}")
+
+    search = (search or SearchFilter()).narrowed(since=start_date, before=end_date, subject=subject_filter)
+
+    if fetch_profile == PROFILE_FULL:
+        fetch_items = '(RFC822)'
+    elif fetch_profile == PROFILE_HEADERS:
+        fetch_items = f'(BODY.PEEK[HEADER.FIELDS ({EXTRACT_HEADER_FIELDS})])'
+    else:
+        fetch_items = f'(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({EXTRACT_HEADER_FIELDS})])'
+
+    started = time.monotonic()
+    pool = IMAPConnectionPool(email_id, app_password, size=connections)
+    mail = None
+    pending = RowBuffer()
+    # Stops the background thread mapping when the extraction ends early
+    stop_mapping = threading.Event()
+    thread_futures = []
     try:
         # Connect to Gmail IMAP server
         mail = imaplib.IMAP4_SSL('imap.gmail.com')
         mail.login(email_id, app_password)
 
-        # First, let's build a thread mapping to track conversations
-        thread_mapping = {}
-        message_id_to_thread = {}
-
-        # Get both sent and inbox to analyze threads
-        sent_folder = '"[Gmail]/Sent Mail"'
-        inbox_folder = 'inbox'
+        # The Sent folder's name depends on the provider and the account's language
+        sent_folder = list_folders(mail).sent_folder()
 
-        # Function to extract message-id and references
-        def process_emails_for_threads(mail_folder):
-            mail.select(mail_folder)
-
-            # Build basic search for threading
-            thread_search = []
-            if start_date:
-                thread_search.append(f'(SINCE "{start_date.strftime("%d-%b-%Y")}")')
-            if end_date:
-                thread_search.append(f'(BEFORE "{end_date.strftime("%d-%b-%Y")}")')
-
-            # Search for all emails
-            search_criteria = ' '.join(thread_search) if thread_search else 'ALL'
-            _, message_numbers = mail.search(None, search_criteria)
-            message_numbers = message_numbers[0].split()
-
-            # Limit to avoid performance issues (use a smaller limit for thread mapping)
-            message_numbers = message_numbers[:1000]
-
-            # Set a counter for timeout
-            processed = 0
-            start_time = datetime.now()
-            max_processing_time = 60  # Max 60 seconds for thread mapping
-
-            # Process each message
-            for num in message_numbers:
-                try:
-                    # Check if we've spent too much time
-                    current_time = datetime.now()
-                    if (current_time - start_time).total_seconds() > max_processing_time:
-                        print("Thread mapping timeout reached, using partial mapping")
-                        break
+        # The index holds headers only; size and attachment filters need the server
+        if use_index and fetch_profile != PROFILE_FULL and not search.needs_message_structure():
+            yield from _iter_from_index(
+                mail, index or get_mailbox_index(), email_id, search, folder, sent_folder,
+                batch_size, max_emails, fetch_profile, body_bytes, pool,
+                started, time_budget
+            )
+            return
 
-                    # Fetch only headers
-                    _, msg_data = mail.fetch(num, '(BODY.PEEK[HEADER])')
+        # Gmail numbers its conversations; elsewhere threads are rebuilt from headers
+        gmail_threads = supports_gmail_extensions(mail)
+        if gmail_threads:
+            fetch_items = f'(X-GM-THRID {fetch_items[1:]}'
 
-                    # Skip invalid data
-                    if not msg_data or not isinstance(msg_data[0], tuple) or not msg_data[0][1]:
-                        continue
+        # Get both sent and inbox to analyze threads
+        inbox_folder = INBOX
 
-                    # Parse email headers
-                    email_headers = email.message_from_bytes(msg_data[0][1])
+        # Both folders are mapped at once, each on a pooled connection of its own
+        threads = ThreadIndex()
+        gmail_messages = set()
+        threads_lock = threading.Lock()
+        notices = []
 
-                    # Get the unique message ID
-                    message_id = email_headers.get('Message-ID', '')
-                    if not message_id:
+        def process_emails_for_threads(mail_folder):
+            with pool.connection(mail_folder) as folder_mail:
+                return read_thread_headers(folder_mail)
+
+        def thread_budget_spent(mapping_started):
+            # The mapping gets at most what is left of the whole extraction's budget
+            if _budget_spent(started, time_budget):
+                return True
+            if thread_time_budget is None or time.monotonic() - mapping_started <= thread_time_budget:
+                return False
+            print("Thread mapping time budget reached, using partial mapping")
+            return True
+
+        # Function to extract message-id and references; returns whether every message was mapped
+        def read_thread_headers(mail):
+            mapping_started = time.monotonic()
+
+            # Replies can match none of the other criteria, so threads are mapped over the whole date range
+            message_numbers = search_messages(mail, SearchFilter(since=search.since, before=search.before), uid=False)
+
+            if gmail_threads:
+                # Thread and message IDs are a few bytes each
+                for i in range(0, len(message_numbers), batch_size):
+                    if stop_mapping.is_set() or thread_budget_spent(mapping_started):
+                        return False
+                    try:
+                        records = fetch_batch(mail, message_numbers[i:i + batch_size], f'({GMAIL_ID_ITEMS})')
+                    except Exception as e:
+                        print(f"Error fetching Gmail thread IDs: {str(e)}")
                         continue
-
-                    # Get references to track thread
-                    references = email_headers.get('References', '')
-                    in_reply_to = email_headers.get('In-Reply-To', '')
-
-                    # Split references into list
-                    ref_list = []
-                    if references:
-                        ref_list.extend(references.split())
-                    if in_reply_to and in_reply_to not in ref_list:
-                        ref_list.append(in_reply_to)
-
-                    # If this email has references, it belongs to an existing thread
-                    if ref_list:
-                        # Find the thread this belongs to
-                        thread_id = None
-                        for ref in ref_list:
-                            if ref in message_id_to_thread:
-                                thread_id = message_id_to_thread[ref]
-                                break
-
-                        if thread_id:
-                            # Add to existing thread
-                            thread_mapping[thread_id].add(message_id)
-                            message_id_to_thread[message_id] = thread_id
-                        else:
-                            # Start new thread with this message id
-                            thread_id = message_id
-                            thread_mapping[thread_id] = set([message_id] + ref_list)
-                            message_id_to_thread[message_id] = thread_id
-
-                            # Also add references to the mapping
-                            for ref in ref_list:
-                                message_id_to_thread[ref] = thread_id
-                    else:
-                        # This is a new thread
-                        thread_mapping[message_id] = set([message_id])
-                        message_id_to_thread[message_id] = message_id
-
+                    with threads_lock:
+                        gmail_messages.update(
+                            (gmail_id(record, 'X-GM-THRID'), gmail_id(record, 'X-GM-MSGID')) for record in records.values()
+                        )
+                return True
+
+            # Process messages one batch (and one FETCH command) at a time
+            for i in range(0, len(message_numbers), batch_size):
+                # Check if the extraction stopped or we've spent too much time
+                if stop_mapping.is_set() or thread_budget_spent(mapping_started):
+                    return False
+
+                # Fetch only the threading headers
+                batch = message_numbers[i:i + batch_size]
+                try:
+                    records = fetch_batch(mail, batch, '(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID REFERENCES IN-REPLY-TO)])')
                 except Exception as e:
-                    print(f"Error processing email for threading: {str(e)}")
+                    print(f"Error fetching headers for threading: {str(e)}")
                     continue
 
-        # Build thread mapping from both folders
-        process_emails_for_threads(sent_folder)
-        process_emails_for_threads(inbox_folder)
-
-        # Now extract emails from the requested folder with proper thread tracking
-        mail.select(sent_folder if folder.lower() == 'sent' else inbox_folder)
-
-        # Build search query
-        search_query = []
-
-        # Add date filters if provided
-        if start_date:
-            start_date_str = start_date.strftime("%d-%b-%Y")
-            search_query.append(f'(SINCE "{start_date_str}")')
-        if end_date:
-            end_date_str = end_date.strftime("%d-%b-%Y")
-            search_query.append(f'(BEFORE "{end_date_str}")')
+                for num in batch:
+                    # Skip invalid data
+                    header_data = body_section(records.get(int(num), {}))
+                    if not header_data:
+                        continue
 
-        # Add subject filter if provided
-        if subject_filter:
-            # Escape quotes in subject filter
-            safe_subject = subject_filter.replace('"', '\\"')
-            search_query.append(f'(SUBJECT "{safe_subject}")')
+                    email_headers = email.message_from_bytes(header_data)
+                    with threads_lock:
+                        threads.add(
+                            email_headers.get('Message-ID', ''),
+                            email_headers.get('References', ''),
+                            email_headers.get('In-Reply-To', '')
+                        )
+            return True
 
-        # Add size filter to exclude large emails
-        search_query.append('(SMALLER 1000000)')  # Exclude emails larger than 1MB
+        # Now extract emails from the requested folder with proper thread tracking
+        target_folder = sent_folder if folder.lower() == 'sent' else inbox_folder
+        mail.select(quote_mailbox(target_folder), readonly=True)
 
-        # Combine search criteria
-        search_criteria = ' '.join(search_query)
+        # Add size filter to exclude large emails when downloading them whole
+        target_search = search
+        if fetch_profile == PROFILE_FULL:
+            target_search = search.narrowed(smaller=min(search.smaller or 1000000, 1000000))  # Exclude emails larger than 1MB
 
-        # Search for emails
-        _, message_numbers = mail.search(None, search_criteria)
-        message_numbers = message_numbers[0].split()
+        # Search for emails by UID on the server, so only matches are fetched and any pooled connection can fetch them
+        uids = search_messages(mail, target_search, gmail=gmail_threads)
 
         # Limit number of emails if specified
         if max_emails:
-            message_numbers = message_numbers[:max_emails]
+            uids = uids[:max_emails]
 
-        total_emails = len(message_numbers)
+        total_emails = len(uids)
         if total_emails == 0:
-            return []
+            yield ExtractionProgress([], 0, 0)
+            return
+
+        # Build the thread mapping from both folders while the messages themselves are fetched
+        thread_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='imap-threads')
+        thread_futures = [
+            thread_executor.submit(process_emails_for_threads, mail_folder)
+            for mail_folder in (sent_folder, inbox_folder)
+        ]
+        thread_executor.shutdown(wait=False)
+
+        def fetch_chunk(chunk_mail, batch):
+            """Fetch one batch with one command, then its text parts if needed, and parse it."""
+            try:
+                records = fetch_batch(chunk_mail, batch, fetch_items, uid=True)
+                bodies = fetch_text_bodies(chunk_mail, records, body_bytes, uid=True) if fetch_profile == PROFILE_TEXT else {}
+            except Exception as e:
+                return batch, None, e
+
+            messages = []
+            for uid in batch:
+                try:
+                    raw_email = body_section(records.get(uid, {}))
+                    # Invalid message data is reported as None
+                    if not raw_email:
+                        messages.append(None)
+                        continue
 
-        # Process emails in batches
-        extracted_emails = []
-        consecutive_errors = 0  # Track consecutive errors
+                    email_data = email.message_from_bytes(raw_email)
 
-        for i in range(0, total_emails, batch_size):
-            batch = message_numbers[i:i + batch_size]
+                    # Get the body
+                    if fetch_profile != PROFILE_FULL:
+                        body = bodies.get(uid, '')
+                    else:
+                        body = _plain_text_body(email_data)
 
-            # Fetch email content
-            for num in batch:
-                try:
-                    # Fetch the full email content
-                    _, msg_data = mail.fetch(num, '(RFC822)')
+                    # The thread is looked up once the mapping is done
+                    if gmail_threads:
+                        thread_key = gmail_id(records[uid], 'X-GM-THRID')
+                    else:
+                        thread_key = email_data.get('Message-ID', '')
 
-                    # Check if msg_data is valid
-                    if not msg_data or not isinstance(msg_data[0], tuple) or not msg_data[0][1]:
-                        print(f"Warning: Invalid message data for email {num}")
+                    # Keep only what rows are built from, not the whole message
+                    messages.append(_CompactMessage(
+                        *(email_data.get(header, '') for header in _COMPACT_FIELDS), body, thread_key
+                    ))
+                except Exception as e:
+                    messages.append(e)
+            return batch, messages, None
+
+        def merge_thread_mappings() -> Callable[[object], int]:
+            """Wait for the mappings of both folders and return a thread size lookup."""
+            if not all([future.result() for future in thread_futures]):
+                notices.append("The thread mapping was cut short by a time budget, so some responses may not be detected.")
+            if gmail_threads:
+                # A message in both folders has one X-GM-MSGID, so it is counted once
+                thread_sizes = Counter(thread_id for thread_id, _ in gmail_messages)
+                return lambda thread_id: thread_sizes.get(thread_id, 0)
+            return threads.thread_size
+
+        def drain_pending():
+            """Yield the rows of the pending messages a block at a time, then empty the buffer."""
+            if not len(pending):
+                yield ExtractionProgress([], processed, total_emails)
+                return
+            for block in pending.iter_blocks():
+                yield ExtractionProgress(_message_rows(block, thread_size, folder, email_id), processed, total_emails)
+            pending.clear()
+
+        # Batches are fetched in parallel over the pool and come back in UID order.
+        # Until the thread mapping is done, parsed messages wait in pending
+        thread_size = None
+        processed = 0
+        consecutive_errors = 0  # Track consecutive errors
+
+        for batch, messages, error in map_uid_chunks(pool, target_folder, uids, fetch_chunk, chunk_size=batch_size):
+            processed += len(batch)
+            if error is not None:
+                print(f"Warning: Error fetching emails {batch[0]}-{batch[-1]}: {str(error)}")
+                consecutive_errors += 1
+            else:
+                for uid, message in zip(batch, messages):
+                    if not isinstance(message, tuple):
+                        if message is None:
+                            print(f"Warning: Invalid message data for email {uid}")
+                        else:
+                            print(f"Warning: Error processing email {uid}: {str(message)}")
                         consecutive_errors += 1
                         if consecutive_errors >= 5:  # Break if too many consecutive errors
-                            print("Too many consecutive errors, stopping extraction")
                             break
                         continue
 
-                    email_data = email.message_from_bytes(msg_data[0][1])
-
                     # Reset consecutive errors counter on success
                     consecutive_errors = 0
+                    pending.append(message)
 
-                    # Extract basic information from headers with safe defaults
-                    email_info = {
-                        'Subject': email_data.get('Subject', ''),
-                        'From': email_data.get('From', ''),
-                        'To': email_data.get('To', ''),
-                        'Date': email_data.get('Date', ''),
-                        'Message-ID': email_data.get('Message-ID', ''),
-                        'Body': '' # Initialize body
-                    }
-
-                    # Get the body
-                    if email_data.is_multipart():
-                        for part in email_data.walk():
-                            ctype = part.get_content_type()
-                            cdispo = str(part.get('Content-Disposition'))
-
-                            # Look for the plain text part
-                            if ctype == 'text/plain' and 'attachment' not in cdispo:
-                                body = part.get_payload(decode=True).decode()
-                                email_info['Body'] = body
-                                break # Assuming plain text is sufficient
-                    else:
-                        body = email_data.get_payload(decode=True).decode()
-                        email_info['Body'] = body
-
-                    # Check thread status for response
-                    has_response = False
-                    message_id = email_info['Message-ID']
-
-                    # If this message is in a thread, check if the thread has more than one message
-                    if message_id and message_id in message_id_to_thread:
-                        thread_id = message_id_to_thread[message_id]
-                        thread_size = len(thread_mapping.get(thread_id, set()))
-                        has_response = thread_size > 1
-
-                    # Also check standard reply indicators as backup
-                    if not has_response:
-                        # Check for reply prefixes in subject (case insensitive)
-                        subject = email_info['Subject'].lower() if email_info['Subject'] else ""
-                        if "re:" in subject or "fw:" in subject or "fwd:" in subject:
-                            has_response = True
-
-                        # Check for references or in-reply-to headers
-                        if email_data.get('References') or email_data.get('In-Reply-To'):
-                            has_response = True
-
-                    # Process recipient information
-                    if folder.lower() == 'sent':
-                        to_field = email_data.get('To', '')
-                        if not to_field:
-                            continue
-
-                        # Handle multiple recipients
-                        recipients = to_field.split(',')
-                        for recipient in recipients:
-                            try:
-                                name, address = parseaddr(recipient)
-                                if not name:
-                                    name = "Unknown"
-
-                                if not address or "@bounces." in address:
-                                    continue
-
-                                extracted_emails.append({
-                                    'Sender Name': parseaddr(email_info['From'])[0] if email_info['From'] else "Me",
-                                    'Sender Email': parseaddr(email_info['From'])[1] if email_info['From'] else email_id,
-                                    'Recipient Name': name,
-                                    'Recipient Email': address,
-                                    'Date': email_info['Date'],
-                                    'Subject': email_info['Subject'],
-                                    'Status': 'Responded' if has_response else 'Not Responded',
-                                    'Original Recipient Email': None # Not applicable for sent emails
-                                })
-                            except Exception as e:
-                                print(f"Warning: Error processing recipient {recipient}: {str(e)}")
-                                continue
-                    else:  # folder.lower() == 'inbox'
-                        from_field = email_data.get('From', '')
-                        to_field = email_data.get('To', '') # Get the 'To' field of the received email
-                        original_recipient_email = None
-
-                        # If it's a delivery status notification, try to extract the original recipient
-                        subject_lower = email_info['Subject'].lower()
-                        if "delivery status notification" in subject_lower or "delivery incomplete" in subject_lower or "failure" in subject_lower:
-                            email_matches = re.findall(r'[\w\.-]+@[\w\.-]+\.[\w]+', email_info['Body'])
-                            if email_matches:
-                                # Assuming the first valid email found is the original recipient
-                                for match in email_matches:
-                                    if match != email_id and not match.endswith(".bounces.google.com"):
-                                        original_recipient_email = match
-                                        break
-
-                        if not from_field:
-                            continue
-
-                        try:
-                            from_name, from_email = parseaddr(from_field)
-                            if not from_name:
-                                from_name = "Unknown"
-
-                            if not from_email or "@bounces." in from_email:
-                                continue
-
-                            _, to_email = parseaddr(to_field) if to_field else ("", "")
-
-                            extracted_emails.append({
-                                'Sender Name': from_name,
-                                'Sender Email': from_email,
-                                'Recipient Name': parseaddr(to_field)[0] if to_field else "Me",
-                                'Recipient Email': to_email if to_email else email_id, # Default to your email
-                                'Date': email_info['Date'],
-                                'Subject': email_info['Subject'],
-                                'Status': 'Responded' if has_response else 'Not Responded',
-                                'Original Recipient Email': original_recipient_email,
-                                'Body': email_info['Body']
-                            })
-                        except Exception as e:
-                            print(f"Warning: Error processing sender {from_field}: {str(e)}")
-                            continue
-
-                except Exception as e:
-                    print(f"Warning: Error processing email {num}: {str(e)}")
-                    consecutive_errors += 1
-                    if consecutive_errors >= 5:  # Break if too many consecutive errors
-                        print("Too many consecutive errors, stopping extraction")
-                        break
-                    continue
-
-            # Clear memory after each batch
-            del batch
-            gc.collect()
+            if thread_size is None and all(future.done() for future in thread_futures):
+                thread_size = merge_thread_mappings()
+            if thread_size is not None:
+                yield from drain_pending()
+            else:
+                yield ExtractionProgress([], processed, total_emails)
 
             # Break the outer loop if we hit too many consecutive errors
             if consecutive_errors >= 5:
+                print("Too many consecutive errors, stopping extraction")
+                notices.append(f"Stopped after too many consecutive errors, at {processed} of {total_emails} emails.")
                 break
 
-        mail.close()
-        mail.logout()
+            if processed < total_emails and _budget_spent(started, time_budget):
+                notices.append(f"The time budget ran out after {processed} of {total_emails} emails.")
+                # Use what the mapping has so far instead of waiting for it
+                stop_mapping.set()
+                break
 
-        return extracted_emails
+        if thread_size is None:
+            thread_size = merge_thread_mappings()
+        if len(pending):
+            yield from drain_pending()
+        if notices:
+            yield ExtractionProgress([], processed, total_emails, ' '.join(notices))
 
     except Exception as e:
         raise Exception(f"Error extracting emails: {str(e)}")
+    finally:
+        # Let the mapping threads finish their batch and hand back their pooled connections
+        stop_mapping.set()
+        wait(thread_futures)
+        pool.close_all()
+        if mail is not None:
+            try:
+                # The folders may all have been synced over pooled connections
+                if mail.state == 'SELECTED':
+                    mail.close()
+                mail.logout()
+            except Exception:
+                pass
+        pending.close()
+
+def _budget_spent(started: float, time_budget: Optional[float]) -> bool:
+    """Return whether more than time_budget seconds have passed since started."""
+    if time_budget is None or time.monotonic() - started <= time_budget:
+        return False
+    print("Extraction time budget reached, stopping extraction")
+    return True
+
+def _iter_from_index(
+    mail: imaplib.IMAP4,
+    index: MailboxIndex,
+    email_id: str,
+    search: SearchFilter,
+    folder: str,
+    sent_folder: str,
+    batch_size: int,
+    max_emails: Optional[int],
+    fetch_profile: str,
+    body_bytes: int,
+    pool: Optional[IMAPConnectionPool] = None,
+    started: Optional[float] = None,
+    time_budget: Optional[float] = None
+) -> Iterator[ExtractionProgress]:
+    """
+    Sync both folders into the index, then build the extraction from it one batch at a time.
+
+    The sync counts against time_budget. When the budget runs out during it,
+    the indexed part is kept, nothing is extracted and the notice says to
+    run the extraction again.
+    """
+    # Threads span both folders, so both are kept current, each over its own connection
+    results = index.sync(
+        mail, email_id, [sent_folder, INBOX], batch_size=batch_size, pool=pool,
+        should_stop=lambda: _budget_spent(started, time_budget)
+    )
+    if not all(result.complete for result in results):
+        yield ExtractionProgress(
+            [], 0, 0,
+            "The time budget ran out while indexing the mailbox. Run the extraction again to continue from where it stopped."
+        )
+        return
+
+    target_folder = sent_folder if folder.lower() == 'sent' else INBOX
+    criteria = dict(
+        since=search.since, before=search.before, subject=search.subject,
+        sender=search.sender, recipient=search.recipient, cc=search.cc
+    )
+    total = index.count_messages(email_id, target_folder, **criteria)
+    if max_emails:
+        total = min(total, max_emails)
+    if not total:
+        yield ExtractionProgress([], 0, 0)
+        return
+
+    # Read the index a page at a time, so a large folder is never loaded whole
+    processed = 0
+    pages = index.iter_messages(email_id, target_folder, limit=max_emails, page_size=batch_size, **criteria)
+    for batch in pages:
+        if fetch_profile == PROFILE_TEXT:
+            index.load_bodies(mail, email_id, target_folder, batch, body_bytes, batch_size=batch_size)
+
+        extracted_emails = []
+        for message in batch:
+            try:
+                has_response = _has_response(message, message['thread_size'])
+                extracted_emails.extend(_email_rows(message, message.get('body') or '', has_response, folder, email_id))
+            except Exception as e:
+                print(f"Warning: Error processing email {message['uid']}: {str(e)}")
+        processed += len(batch)
+        yield ExtractionProgress(extracted_emails, processed, total)
+
+        if processed < total and _budget_spent(started, time_budget):
+            yield ExtractionProgress([], processed, total, f"The time budget ran out after {processed} of {total} emails.")
+            return
+
+def _message_rows(messages, thread_size: Callable[[object], int], folder: str, email_id: str) -> List[Dict]:
+    """
+    Build the rows of parsed messages once their threads are known.
+
+    Args:
+        messages: _CompactMessage for each message
+        thread_size: Returns the number of messages in the thread of a thread key
+        folder (str): 'sent' or 'inbox'
+        email_id (str): Address of the mailbox owner
+    """
+    rows = []
+    for message in messages:
+        try:
+            # If this message is in a thread, check if the thread has more than one message
+            has_response = _has_response(message, thread_size(message.thread_key))
+            rows.extend(_email_rows(message, message.body, has_response, folder, email_id))
+        except Exception as e:
+            print(f"Warning: Error processing email {message.subject}: {str(e)}")
+    return rows
+
+def _plain_text_body(email_data: Message) -> str:
+    """Decode the first inline text/plain part of a full message."""
+    if not email_data.is_multipart():
+        return email_data.get_payload(decode=True).decode()
+    for part in email_data.walk():
+        ctype = part.get_content_type()
+        cdispo = str(part.get('Content-Disposition'))
+
+        # Look for the plain text part
+        if ctype == 'text/plain' and 'attachment' not in cdispo:
+            return part.get_payload(decode=True).decode()
+    return ''
+
+def _has_response(email_data, thread_size: int) -> bool:
+    """
+    Decide whether a message got a response.
+
+    Args:
+        email_data: Parsed message or indexed message; anything with get(header, default)
+        thread_size (int): Number of messages in the message's thread
+    """
+    if thread_size > 1:
+        return True
+
+    # Also check standard reply indicators as backup
+    # Check for reply prefixes in subject (case insensitive)
+    subject = email_data.get('Subject', '').lower()
+    if "re:" in subject or "fw:" in subject or "fwd:" in subject:
+        return True
+
+    # Check for references or in-reply-to headers
+    return bool(email_data.get('References') or email_data.get('In-Reply-To'))
+
+def _email_rows(email_data, body: str, has_response: bool, folder: str, email_id: str) -> List[Dict]:
+    """
+    Turn one message into extraction rows.
+
+    A sent message gives one row per address in To; an inbox message gives
+    one row for its sender.
 
-def _count_frequency(email_id, app_password, target_email):
+    Args:
+        email_data: Parsed message or indexed message; anything with get(header, default)
+        body (str): Plain-text body
+        has_response (bool): Whether the message got a response
+        folder (str): 'sent' or 'inbox'
+        email_id (str): Address of the mailbox owner
+    """
+    rows = []
+    email_info = {
+        'Subject': email_data.get('Subject', ''),
+        'From': email_data.get('From', ''),
+        'Date': email_data.get('Date', ''),
+        'Body': body
+    }
+
+    # Process recipient information
+    if folder.lower() == 'sent':
+        to_field = email_data.get('To', '')
+        if not to_field:
+            return rows
+
+        # Handle multiple recipients
+        recipients = to_field.split(',')
+        for recipient in recipients:
+            try:
+                name, address = parseaddr(recipient)
+                if not name:
+                    name = "Unknown"
+
+                if not address or "@bounces." in address:
+                    continue
+
+                rows.append({
+                    'Sender Name': parseaddr(email_info['From'])[0] if email_info['From'] else "Me",
+                    'Sender Email': parseaddr(email_info['From'])[1] if email_info['From'] else email_id,
+                    'Recipient Name': name,
+                    'Recipient Email': address,
+                    'Date': email_info['Date'],
+                    'Subject': email_info['Subject'],
+                    'Status': 'Responded' if has_response else 'Not Responded',
+                    'Original Recipient Email': None # Not applicable for sent emails
+                })
+            except Exception as e:
+                print(f"Warning: Error processing recipient {recipient}: {str(e)}")
+                continue
+    else:  # folder.lower() == 'inbox'
+        from_field = email_data.get('From', '')
+        to_field = email_data.get('To', '') # Get the 'To' field of the received email
+        original_recipient_email = None
+
+        # If it's a delivery status notification, try to extract the original recipient
+        subject_lower = email_info['Subject'].lower()
+        if "delivery status notification" in subject_lower or "delivery incomplete" in subject_lower or "failure" in subject_lower:
+            email_matches = re.findall(r'[\w\.-]+@[\w\.-]+\.[\w]+', email_info['Body'])
+            if email_matches:
+                # Assuming the first valid email found is the original recipient
+                for match in email_matches:
+                    if match != email_id and not match.endswith(".bounces.google.com"):
+                        original_recipient_email = match
+                        break
+
+        if not from_field:
+            return rows
+
+        try:
+            from_name, from_email = parseaddr(from_field)
+            if not from_name:
+                from_name = "Unknown"
+
+            if not from_email or "@bounces." in from_email:
+                return rows
+
+            _, to_email = parseaddr(to_field) if to_field else ("", "")
+
+            rows.append({
+                'Sender Name': from_name,
+                'Sender Email': from_email,
+                'Recipient Name': parseaddr(to_field)[0] if to_field else "Me",
+                'Recipient Email': to_email if to_email else email_id, # Default to your email
+                'Date': email_info['Date'],
+                'Subject': email_info['Subject'],
+                'Status': 'Responded' if has_response else 'Not Responded',
+                'Original Recipient Email': original_recipient_email,
+                'Body': email_info['Body']
+            })
+        except Exception as e:
+            print(f"Warning: Error processing sender {from_field}: {str(e)}")
+
+    return rows
+
+def _count_frequency(email_id, app_password, target_email, use_index=True, index=None):
     """
     Helper function to count how many times we've emailed a specific address
+
+    With use_index, the Sent folder is synced into the local mailbox index
+    and counted there instead of searched on the server.
     """
     try:
         # Connect to Gmail IMAP server
         mail = imaplib.IMAP4_SSL('imap.gmail.com')
         mail.login(email_id, app_password)
-        mail.select('"[Gmail]/Sent Mail"')
+        sent_folder = list_folders(mail).sent_folder()
+
+        if use_index:
+            index = index or get_mailbox_index()
+            index.sync(mail, email_id, [sent_folder])
+            return index.count_to(email_id, sent_folder, target_email)
+
+        mail.select(quote_mailbox(sent_folder))
 
         # Search for emails sent to target
         status, data = mail.search(None, f'(TO "{target_email}")')
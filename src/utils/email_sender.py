@@ -3,21 +3,22 @@ Email Sender Module for SmartBrew Email Automation System
 Handles sending of individual and bulk emails
 """
 
-import smtplib
 import os
 import uuid
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
-from datetime import datetime
-import pandas as pd
-from typing import List, Dict, Optional, Union, Tuple
+from typing import Iterator, List, Dict, Optional, Union, Tuple
 from pathlib import Path
+import threading
 import streamlit as st
-import time
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
+from src.services.smtp_pool import SMTPConnectionPool, get_default_pool
+from src.utils.message_builder import MessageBuilder
+from src.utils.recipient_reader import count_recipients, iter_recipients, validate_header
+from src.utils.job_store import JobStore, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED, SENT, FAILED
+from src.utils.rate_limiter import RateLimitPolicy, default_policy, get_rate_limiter
+
 def send_email(
     sender_email: str,
     sender_password: str,
@@ -28,7 +29,8 @@ def send_email(
     attachment_paths: Optional[List[Union[str, Tuple[str, str]]]] = None,
     executive_name: Optional[str] = None,
     executive_number: Optional[str] = None,
-    executive_gender: Optional[str] = None
+    executive_gender: Optional[str] = None,
+    smtp_pool: Optional[SMTPConnectionPool] = None
 ) -> str:
     """
     Sends an email using SMTP with optional attachments.
@@ -46,126 +48,164 @@ def send_email(
         executive_name: Optional sender's name for signature
         executive_number: Optional sender's contact number
         executive_gender: Optional sender's gender ('male' or 'female')
+        smtp_pool: Optional connection pool; defaults to the shared pool so
+                   repeated sends reuse an authenticated connection
 
     Returns:
         str: Success or error message
     """
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-
-        # Set basic headers
-        msg["From"] = f"{executive_name} <{sender_email}>" if executive_name else sender_email
-        msg["To"] = f"{recipient.get('Name', '')} <{recipient['Email']}>" if recipient.get('Name') else recipient['Email']
-        msg["Subject"] = subject
-
-        # Add essential email headers
-        msg.add_header('Message-ID', f"<{uuid.uuid4()}@smartbrew.in>")
-        msg.add_header('Date', datetime.now().strftime("%a, %d %b %Y %H:%M:%S +0530"))
-
-        if cc_email:
-            msg["Cc"] = cc_email
-
-        # Format message with recipient name and gender-based salutation
-        formatted_message = body
-        if '{name}' in formatted_message:
-            if recipient.get('Name') and recipient['Name'].lower() != 'unknown':
-                # If name exists and not unknown, use name with gender-based suffix
-                if executive_gender:
-                    suffix = " sir" if executive_gender.lower() == 'male' else " ma'am"
-                    formatted_message = formatted_message.replace('{name}', recipient['Name'] + suffix)
-                else:
-                    # If no gender selected, just use the name
-                    formatted_message = formatted_message.replace('{name}', recipient['Name'])
-            else:
-                # If name is unknown or empty, use gender-based salutation
-                if executive_gender:
-                    salutation = "Dear sir" if executive_gender.lower() == 'male' else "Dear Ma'am"
-                else:
-                    salutation = "Dear ma'am"  # Default when no gender selected
-                formatted_message = formatted_message.replace('Dear {name},', f'{salutation},')
-
-        # Replace executive name placeholder
-        if '{Executive Name}' in formatted_message and executive_name:
-            formatted_message = formatted_message.replace('{Executive Name}', executive_name)
-
-        # Replace executive number placeholder
-        if '{Executive Number}' in formatted_message and executive_number:
-            formatted_message = formatted_message.replace('{Executive Number}', executive_number)
-
-        # Add plain text version
-        part1 = MIMEText(formatted_message, 'plain')
-        msg.attach(part1)
-
-        # Create HTML version for better deliverability
-        html_body = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{subject}</title>
-</head>
-<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #000000;">
-    <div style="max-width: 680px; margin: 0 auto; padding: 20px;">
-        <div style="color: #000000;">
-        {formatted_message.replace('{', '{{').replace('}', '}}')
-                            .replace('{{recipient_email}}', recipient['Email'])
-                            .replace('\n\n', '</p><p style="margin: 16px 0;">')
-                            .replace('\n', '<br>')
-                            .replace('●', '•')
-                            .replace('○', '•')
-                            .replace('________________________________________', '<hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">')
-                            .replace('💜', '<span style="font-size: 16px;">💜</span>')
-                            .replace('✨', '<span style="font-size: 16px;">✨</span>')
-                            .replace('🌿', '<span style="font-size: 16px;">🌿</span>')
-                            .replace('💬', '<span style="font-size: 16px;">💬</span>')
-                            .replace('📚', '<span style="font-size: 16px;">📚</span>')}
-    </div>
-    </div>
-</body>
-</html>"""
-
-        # Add HTML version
-        part2 = MIMEText(html_body, 'html')
-        msg.attach(part2)
-
-        # Add attachments if provided
-        if attachment_paths:
-            for attachment_path in attachment_paths:
-                # Handle both string and tuple formats
-                if isinstance(attachment_path, tuple):
-                    file_path, original_filename = attachment_path
-                else:
-                    file_path = attachment_path
-                    original_filename = os.path.basename(file_path)
-
-                if os.path.exists(file_path):
-                    with open(file_path, "rb") as attachment:
-                        part = MIMEBase("application", "octet-stream")
-                        part.set_payload(attachment.read())
-                        encoders.encode_base64(part)
-                        # Use the original filename for the attachment
-                        part.add_header("Content-Disposition", f"attachment; filename={original_filename}")
-                        msg.attach(part)
-
-        # Send email
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
+        # Build the message from the compiled template and encoded attachments
+        builder = MessageBuilder(
+            subject, body, cc_email, _load_attachment_parts(attachment_paths),
+            executive_name, executive_number, executive_gender
+        )
+        payload = builder.build(
+            sender_email, recipient['Email'], recipient.get('Name'), f"<{uuid.uuid4()}@smartbrew.in>"
+        )
 
         # Get all recipients (including CC)
         all_recipients = [recipient['Email']]
         if cc_email:
             all_recipients.append(cc_email)
 
-        server.sendmail(sender_email, all_recipients, msg.as_string())
-        server.quit()
+        # Send email on a pooled connection
+        pool = smtp_pool or get_default_pool()
+        pool.send(sender_email, sender_password, sender_email, all_recipients, payload)
 
         return f"✅ Email sent to {recipient['Email']}"
 
     except Exception as e:
         return f"❌ Error sending email to {recipient['Email']}: {str(e)}"
 
+def _load_attachment_parts(attachment_paths: Optional[List[Union[str, Tuple[str, str]]]]) -> List[MIMEBase]:
+    """
+    Read and base64-encode attachments once so they can be reused for every recipient.
+
+    Args:
+        attachment_paths: List of attachment paths. Each item can be either a
+                          path or a tuple (path, original_filename)
+
+    Returns:
+        List[MIMEBase]: Encoded attachment parts
+    """
+    attachment_parts = []
+    if attachment_paths:
+        for attachment_path in attachment_paths:
+            # Handle both string and tuple formats
+            if isinstance(attachment_path, tuple):
+                file_path, original_filename = attachment_path
+            else:
+                file_path = attachment_path
+                original_filename = os.path.basename(file_path)
+
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as attachment:
+                    part = MIMEBase("application", "octet-stream")
+                    part.set_payload(attachment.read())
+                    encoders.encode_base64(part)
+                    part.add_header("Content-Disposition", f"attachment; filename={original_filename}")
+                    attachment_parts.append(part)
+    return attachment_parts
+
+def _prepare_bulk_recipients(
+    job_store: Optional[JobStore],
+    job_id: Optional[str],
+    sender_email: str,
+    recipients_file: UploadedFile,
+    subject: str,
+    message: str,
+    cc_email: Optional[str],
+    executive_name: Optional[str],
+    executive_number: Optional[str],
+    executive_gender: Optional[str]
+) -> Tuple[Optional[str], int, Iterator[Tuple[int, str, str]]]:
+    """
+    Resolve the recipients to send to, creating or resuming a job when a store is given.
+
+    Returns:
+        Tuple: (job_id, total recipients, iterator of (row_index, email, name) still to send)
+    """
+    if job_store and job_id:
+        # Resume an existing job from where it stopped
+        job = job_store.get_job(job_id)
+        if not job:
+            raise ValueError(f"Unknown bulk send job: {job_id}")
+        job_store.recover_interrupted(job_id)
+        total_recipients = job['total']
+    else:
+        # Stream the CSV file from the uploaded file object
+        validate_header(recipients_file)
+        rows = iter_recipients(recipients_file)
+        if job_store:
+            job_id = job_store.create_job(
+                sender_email, rows, subject, message, cc_email,
+                executive_name, executive_number, executive_gender
+            )
+            total_recipients = job_store.get_job(job_id)['total']
+        else:
+            total_recipients = count_recipients(recipients_file)
+            rows = iter_recipients(recipients_file)
+
+    if job_store:
+        job_store.set_job_status(job_id, JOB_RUNNING)
+        pending = job_store.iter_pending(job_id)
+    else:
+        pending = ((index, email_address, name) for index, (email_address, name) in enumerate(rows))
+    return job_id, total_recipients, pending
+
+def _bulk_result(job_store: Optional[JobStore], job_id: Optional[str], success_count: int,
+                 failed_count: int, last_email: Optional[str]) -> dict:
+    """Build the result dictionary, reporting whole-job totals when a job store is used."""
+    if job_store:
+        progress = job_store.progress(job_id)
+        return {
+            'success_count': progress[SENT],
+            'failed_count': progress[FAILED],
+            'last_email': job_store.last_sent_email(job_id),
+            'job_id': job_id
+        }
+
+    return {
+        'success_count': success_count,
+        'failed_count': failed_count,
+        'last_email': last_email
+    }
+
+def create_bulk_send_job(
+    job_store: JobStore,
+    sender_email: str,
+    recipients_file: UploadedFile,
+    subject: str,
+    message: str,
+    cc_email: str = None,
+    executive_name: str = None,
+    executive_number: str = None,
+    executive_gender: str = None
+) -> str:
+    """
+    Record a new bulk send job with all recipients pending, without sending anything.
+
+    Args:
+        job_store (JobStore): Store to record the job in
+        sender_email (str): Sender's email address
+        recipients_file (UploadedFile): CSV file with 'Email' and 'Name' columns
+        subject (str): Email subject
+        message (str): Email message body
+        cc_email (str, optional): CC email address
+        executive_name (str, optional): Executive name for signature
+        executive_number (str, optional): Executive contact number
+        executive_gender (str, optional): Executive gender ('male' or 'female')
+
+    Returns:
+        str: The new job ID
+    """
+    validate_header(recipients_file)
+    return job_store.create_job(
+        sender_email, iter_recipients(recipients_file), subject, message, cc_email,
+        executive_name, executive_number, executive_gender
+    )
+
 def send_bulk_emails(
     sender_email: str,
     app_password: str,
@@ -176,7 +216,12 @@ def send_bulk_emails(
     attachment_paths: Optional[List[Union[str, Tuple[str, str]]]] = None,
     executive_name: str = None,
     executive_number: str = None,
-    executive_gender: str = None
+    executive_gender: str = None,
+    rate_limit_policy: Optional[RateLimitPolicy] = None,
+    job_store: Optional[JobStore] = None,
+    job_id: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+    smtp_pool: Optional[SMTPConnectionPool] = None
 ) -> dict:
     """
     Send bulk emails to recipients from a CSV file.
@@ -192,166 +237,92 @@ def send_bulk_emails(
         executive_name (str, optional): Executive name for signature
         executive_number (str, optional): Executive contact number
         executive_gender (str, optional): Executive gender ('male' or 'female')
+        rate_limit_policy (RateLimitPolicy, optional): Sending rate for this account.
+            Defaults to one email every 90 seconds for 30 or fewer recipients
+            and one every 60 seconds otherwise.
+        job_store (JobStore, optional): Store recording per-recipient state so the
+            job can be resumed after a crash
+        job_id (str, optional): Existing job to resume from its pending recipients.
+            Requires job_store; recipients_file is ignored in that case.
+        stop_event (threading.Event, optional): When set, sending stops before the
+            next recipient and the job is marked cancelled
+        smtp_pool (SMTPConnectionPool, optional): Connection pool to send through;
+            defaults to the shared pool
 
     Returns:
-        dict: Dictionary containing success count, failed count, and last email sent
+        dict: Dictionary containing success count, failed count, last email sent
+              and the job ID when a job store is used
     """
     try:
-        # Read the CSV file from the uploaded file object
-        df = pd.read_csv(recipients_file)
-
-        # Validate required columns
-        required_columns = ['Email', 'Name']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns in CSV: {', '.join(missing_columns)}")
+        job_id, total_recipients, pending = _prepare_bulk_recipients(
+            job_store, job_id, sender_email, recipients_file, subject, message,
+            cc_email, executive_name, executive_number, executive_gender
+        )
 
         # Initialize counters
         success_count = 0
         failed_count = 0
         last_email = None
 
-        # Create SMTP connection once for all emails
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(sender_email, app_password)
-
-        # Pre-process attachments once
-        attachment_parts = []
-        if attachment_paths:
-            for attachment_path in attachment_paths:
-                # Handle both string and tuple formats
-                if isinstance(attachment_path, tuple):
-                    file_path, original_filename = attachment_path
-                else:
-                    file_path = attachment_path
-                    original_filename = os.path.basename(file_path)
-
-                if os.path.exists(file_path):
-                    with open(file_path, "rb") as attachment:
-                        part = MIMEBase("application", "octet-stream")
-                        part.set_payload(attachment.read())
-                        encoders.encode_base64(part)
-                        part.add_header("Content-Disposition", f"attachment; filename={original_filename}")
-                        attachment_parts.append(part)
+        # Borrow connections from the pool; this also validates the login up front
+        pool = smtp_pool or get_default_pool()
+        with pool.connection(sender_email, app_password):
+            pass
 
-        # Process each recipient
-        total_recipients = len(df)
-        for index, row in df.iterrows():
-            try:
-                # Create recipient dictionary
-                recipient = {
-                    'Email': row['Email'],
-                    'Name': row['Name']
-                }
+        # Serialize attachments and static headers once
+        builder = MessageBuilder(
+            subject, message, cc_email, _load_attachment_parts(attachment_paths),
+            executive_name, executive_number, executive_gender
+        )
 
-                # Create message
-                msg = MIMEMultipart('alternative')
+        # Pace sends through the account's shared token bucket
+        rate_limiter = get_rate_limiter(sender_email, rate_limit_policy or default_policy(total_recipients))
 
-                # Set basic headers
-                msg["From"] = f"{executive_name} <{sender_email}>" if executive_name else sender_email
-                msg["To"] = f"{recipient.get('Name', '')} <{recipient['Email']}>" if recipient.get('Name') else recipient['Email']
-                msg["Subject"] = subject
+        # Process each recipient
+        cancelled = False
+        for row_index, email_address, name in pending:
+            if stop_event is not None and stop_event.is_set():
+                cancelled = True
+                break
+
+            message_id = f"<{uuid.uuid4()}@smartbrew.in>"
+            try:
+                # Record the attempt first so a crash cannot cause a resend, and so a
+                # recipient claimed by another run of the job does not use up a send slot
+                if job_store and not job_store.mark_sending(job_id, row_index, message_id):
+                    continue
 
-                # Add essential email headers
-                msg.add_header('Message-ID', f"<{uuid.uuid4()}@smartbrew.in>")
-                msg.add_header('Date', datetime.now().strftime("%a, %d %b %Y %H:%M:%S +0530"))
+                # Wait for the next send slot
+                rate_limiter.wait()
 
-                if cc_email:
-                    msg["Cc"] = cc_email
-
-                # Format message with recipient name and gender-based salutation
-                formatted_message = message
-                if '{name}' in formatted_message:
-                    if recipient.get('Name') and recipient['Name'].lower() != 'unknown':
-                        # If name exists and not unknown, use name with gender-based suffix
-                        if executive_gender:
-                            suffix = " sir" if executive_gender.lower() == 'male' else " ma'am"
-                            formatted_message = formatted_message.replace('{name}', recipient['Name'] + suffix)
-                        else:
-                            # If no gender selected, just use the name
-                            formatted_message = formatted_message.replace('{name}', recipient['Name'])
-                    else:
-                        # If name is unknown or empty, use gender-based salutation
-                        if executive_gender:
-                            salutation = "Dear sir" if executive_gender.lower() == 'male' else "Dear ma'am"
-                        else:
-                            salutation = "Dear ma'am"  # Default when no gender selected
-                        formatted_message = formatted_message.replace('Dear {name},', f'{salutation},')
-
-                # Replace executive placeholders
-                if '{Executive Name}' in formatted_message and executive_name:
-                    formatted_message = formatted_message.replace('{Executive Name}', executive_name)
-                if '{Executive Number}' in formatted_message and executive_number:
-                    formatted_message = formatted_message.replace('{Executive Number}', executive_number)
-
-                # Add plain text version
-                part1 = MIMEText(formatted_message, 'plain')
-                msg.attach(part1)
-
-                # Add HTML version
-                html_body = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{subject}</title>
-</head>
-<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #000000;">
-    <div style="max-width: 680px; margin: 0 auto; padding: 20px;">
-        <div style="color: #000000;">
-        {formatted_message.replace('{', '{{').replace('}', '}}')
-                            .replace('{{recipient_email}}', recipient['Email'])
-                            .replace('\n\n', '</p><p style="margin: 16px 0;">')
-                            .replace('\n', '<br>')
-                            .replace('●', '•')
-                            .replace('○', '•')
-                            .replace('________________________________________', '<hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">')
-                            .replace('💜', '<span style="font-size: 16px;">💜</span>')
-                            .replace('✨', '<span style="font-size: 16px;">✨</span>')
-                            .replace('🌿', '<span style="font-size: 16px;">🌿</span>')
-                            .replace('💬', '<span style="font-size: 16px;">💬</span>')
-                            .replace('📚', '<span style="font-size: 16px;">📚</span>')}
-        </div>
-    </div>
-</body>
-</html>"""
-                part2 = MIMEText(html_body, 'html')
-                msg.attach(part2)
-
-                # Add pre-processed attachments
-                for part in attachment_parts:
-                    msg.attach(part)
+                # Build the personalized message
+                payload = builder.build(sender_email, email_address, name, message_id)
 
                 # Get all recipients (including CC)
-                all_recipients = [recipient['Email']]
+                all_recipients = [email_address]
                 if cc_email:
                     all_recipients.append(cc_email)
 
                 # Send email
-                server.sendmail(sender_email, all_recipients, msg.as_string())
+                smtp_response = pool.send(sender_email, app_password, sender_email, all_recipients, payload)
+                if job_store:
+                    job_store.mark_sent(job_id, row_index, smtp_response)
 
                 success_count += 1
-                last_email = recipient['Email']
-
-                # Add smaller delay for fewer recipients
-                if total_recipients <= 30:
-                    time.sleep(90)  # 90 second delay for small batches
-                else:
-                    time.sleep(60)  # 60 second delay for larger batches
+                last_email = email_address
 
             except Exception as e:
-                print(f"Error sending email to {row['Email']}: {str(e)}")
+                print(f"Error sending email to {email_address}: {str(e)}")
                 failed_count += 1
+                if job_store:
+                    job_store.mark_failed(job_id, row_index, str(e), message_id)
 
-        # Close SMTP connection
-        server.quit()
+        if job_store:
+            job_store.set_job_status(job_id, JOB_CANCELLED if cancelled else JOB_COMPLETED)
 
-        return {
-            'success_count': success_count,
-            'failed_count': failed_count,
-            'last_email': last_email
-        }
+        return _bulk_result(job_store, job_id, success_count, failed_count, last_email)
 
     except Exception as e:
+        if job_store and job_id:
+            job_store.set_job_status(job_id, JOB_FAILED, str(e))
         raise Exception(f"Error processing bulk emails: {str(e)}")
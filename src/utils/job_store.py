@@ -0,0 +1,307 @@
+"""
+Job Store Module for SmartBrew Email Automation System
+Handles durable, resumable bulk-send jobs backed by SQLite
+"""
+
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DATA_DIR = os.getenv('SMARTBREW_DATA_DIR', 'data')
+DEFAULT_JOB_DB = os.path.join(DATA_DIR, 'bulk_jobs.sqlite')
+
+# Recipient states
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+INTERRUPTED_RESPONSE = "Interrupted during delivery; not retried to avoid a duplicate send"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sender_email TEXT NOT NULL,
+    subject TEXT,
+    message TEXT,
+    cc_email TEXT,
+    executive_name TEXT,
+    executive_number TEXT,
+    executive_gender TEXT,
+    total INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    job_id TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    name TEXT,
+    status TEXT NOT NULL,
+    smtp_response TEXT,
+    message_id TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (job_id, row_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_recipients_status ON recipients (job_id, status, row_index);
+CREATE TABLE IF NOT EXISTS account_sends (
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account, day)
+) WITHOUT ROWID;
+"""
+
+_JOB_COLUMNS = (
+    'id', 'created_at', 'updated_at', 'status', 'sender_email', 'subject', 'message', 'cc_email',
+    'executive_name', 'executive_number', 'executive_gender', 'total', 'error'
+)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _today() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+class JobStore:
+    """
+    SQLite-backed store of bulk-send jobs and their per-recipient state.
+
+    The database runs in WAL mode so the sending loop can commit after every
+    recipient while the UI reads progress. Each thread gets its own
+    connection.
+
+    Args:
+        path: Path of the SQLite database file
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_DB):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def create_job(
+        self,
+        sender_email: str,
+        recipients: Iterable[Tuple[str, str]],
+        subject: str = '',
+        message: str = '',
+        cc_email: Optional[str] = None,
+        executive_name: Optional[str] = None,
+        executive_number: Optional[str] = None,
+        executive_gender: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> str:
+        """
+        Create a job and record its recipients as pending.
+
+        Recipients are consumed in chunks, so the iterable can be a generator
+        over a very large file.
+
+        Returns:
+            str: The new job ID
+        """
+        job_id = uuid.uuid4().hex[:12]
+        conn = self._connection()
+        now = _now()
+        total = 0
+        with conn:
+            conn.execute(
+                'INSERT INTO jobs (id, created_at, updated_at, status, sender_email, subject, message, cc_email, '
+                'executive_name, executive_number, executive_gender) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, now, now, JOB_QUEUED, sender_email, subject, message, cc_email,
+                 executive_name, executive_number, executive_gender)
+            )
+            rows = ((job_id, index, email, name, PENDING) for index, (email, name) in enumerate(recipients))
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                conn.executemany(
+                    'INSERT INTO recipients (job_id, row_index, email, name, status) VALUES (?, ?, ?, ?, ?)',
+                    chunk
+                )
+                total += len(chunk)
+            conn.execute('UPDATE jobs SET total = ? WHERE id = ?', (total, job_id))
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Return the job record as a dictionary, or None if it does not exist."""
+        row = self._connection().execute(
+            f'SELECT {", ".join(_JOB_COLUMNS)} FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+    def list_jobs(self, statuses: Optional[List[str]] = None, limit: int = 50) -> List[Dict]:
+        """List the most recent jobs, optionally restricted to the given states."""
+        query = f'SELECT {", ".join(_JOB_COLUMNS)} FROM jobs'
+        params: list = []
+        if statuses:
+            query += f' WHERE status IN ({", ".join("?" * len(statuses))})'
+            params.extend(statuses)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        return [dict(zip(_JOB_COLUMNS, row)) for row in self._connection().execute(query, params)]
+
+    def set_job_status(self, job_id: str, status: str, error: Optional[str] = None):
+        """Update the state of a job."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+                (status, error, _now(), job_id)
+            )
+
+    def recover_interrupted(self, job_id: str) -> int:
+        """
+        Settle recipients that were mid-delivery when the process stopped.
+
+        The SMTP server may or may not have accepted those messages, so they
+        are marked failed rather than retried.
+
+        Returns:
+            int: Number of recipients settled
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                'UPDATE recipients SET status = ?, smtp_response = ?, updated_at = ? WHERE job_id = ? AND status = ?',
+                (FAILED, INTERRUPTED_RESPONSE, _now(), job_id, SENDING)
+            )
+        return cursor.rowcount
+
+    def iter_pending(self, job_id: str, page_size: int = 500) -> Iterator[Tuple[int, str, str]]:
+        """
+        Yield (row_index, email, name) for each pending recipient in file order.
+
+        Rows are read one page at a time using the primary key, so memory use
+        stays flat regardless of the job size.
+        """
+        last_index = -1
+        while True:
+            page = self._connection().execute(
+                'SELECT row_index, email, name FROM recipients '
+                'WHERE job_id = ? AND status = ? AND row_index > ? ORDER BY row_index LIMIT ?',
+                (job_id, PENDING, last_index, page_size)
+            ).fetchall()
+            if not page:
+                return
+            for row_index, email, name in page:
+                yield row_index, email, name or ''
+            last_index = page[-1][0]
+
+    def _update_recipient(self, job_id: str, row_index: int, status: str,
+                          smtp_response: Optional[str], message_id: Optional[str]):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'UPDATE recipients SET status = ?, smtp_response = ?, message_id = COALESCE(?, message_id), '
+                'updated_at = ? WHERE job_id = ? AND row_index = ?',
+                (status, smtp_response, message_id, _now(), job_id, row_index)
+            )
+
+    def mark_sending(self, job_id: str, row_index: int, message_id: str) -> bool:
+        """
+        Claim a pending recipient before its message is handed to the SMTP server.
+
+        Returns:
+            bool: False if the recipient is no longer pending, e.g. because
+            another run of the same job claimed it first; skip it then
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                'UPDATE recipients SET status = ?, smtp_response = NULL, message_id = ?, updated_at = ? '
+                'WHERE job_id = ? AND row_index = ? AND status = ?',
+                (SENDING, message_id, _now(), job_id, row_index, PENDING)
+            )
+        return cursor.rowcount == 1
+
+    def mark_sent(self, job_id: str, row_index: int, smtp_response: str, message_id: Optional[str] = None):
+        """Record a successful delivery with the server's final response."""
+        self._update_recipient(job_id, row_index, SENT, smtp_response, message_id)
+
+    def mark_failed(self, job_id: str, row_index: int, error: str, message_id: Optional[str] = None):
+        """Record a failed delivery."""
+        self._update_recipient(job_id, row_index, FAILED, error, message_id)
+
+    def requeue(self, job_id: str, row_index: int):
+        """Put a recipient back to pending, e.g. when its sender account ran out of quota."""
+        self._update_recipient(job_id, row_index, PENDING, None, None)
+
+    def progress(self, job_id: str) -> Dict[str, int]:
+        """Return recipient counts per state, plus the total."""
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        for status, count in self._connection().execute(
+            'SELECT status, COUNT(*) FROM recipients WHERE job_id = ? GROUP BY status', (job_id,)
+        ):
+            counts[status] = count
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def sends_today(self, account: str) -> int:
+        """Return how many messages an account has been counted for today, across every job."""
+        row = self._connection().execute(
+            'SELECT sent FROM account_sends WHERE account = ? AND day = ?', (account.strip().lower(), _today())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def reserve_send(self, account: str, daily_quota: int) -> Optional[int]:
+        """
+        Count one message against an account's quota for today, if any is left.
+
+        The check and the increment are one transaction, so campaigns
+        sending from the same account at the same time share the quota.
+
+        Returns:
+            Optional[int]: The account's count for today including this
+            message, or None if the quota was already used up
+        """
+        key = (account.strip().lower(), _today())
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO account_sends (account, day, sent) VALUES (?, ?, 0)', key)
+            cursor = conn.execute(
+                'UPDATE account_sends SET sent = sent + 1 WHERE account = ? AND day = ? AND sent < ?',
+                key + (daily_quota,)
+            )
+            if cursor.rowcount == 0:
+                return None
+            return conn.execute('SELECT sent FROM account_sends WHERE account = ? AND day = ?', key).fetchone()[0]
+
+    def last_sent_email(self, job_id: str) -> Optional[str]:
+        """Return the address of the most recent successful delivery."""
+        row = self._connection().execute(
+            'SELECT email FROM recipients WHERE job_id = ? AND status = ? ORDER BY row_index DESC LIMIT 1',
+            (job_id, SENT)
+        ).fetchone()
+        return row[0] if row else None
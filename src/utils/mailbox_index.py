@@ -0,0 +1,768 @@
+"""
+Mailbox Index Module for SmartBrew Email Automation System
+Handles a local SQLite index of mailbox headers kept up to date by UID-based incremental sync
+"""
+
+import email
+import imaplib
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.header import decode_header, make_header
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from src.services.imap_fetch import (
+    FetchRecord,
+    body_section,
+    GMAIL_ID_ITEMS,
+    expand_message_set,
+    fetch_batched,
+    fetch_text_bodies,
+    gmail_id,
+    parse_fetch_response,
+    supports_gmail_extensions,
+)
+from src.services.imap_pool import IMAPConnectionPool, enable_qresync
+from src.services.imap_search import any_of, subject_keywords
+from src.utils.job_store import DATA_DIR
+from src.utils.thread_index import ThreadIndex
+
+DEFAULT_INDEX_DB = os.path.join(DATA_DIR, 'mailbox_index.sqlite')
+
+# IMAP treats INBOX case-insensitively; every other mailbox name is case-sensitive
+INBOX = 'INBOX'
+
+INDEX_HEADER_FIELDS = 'FROM TO CC SUBJECT DATE MESSAGE-ID REFERENCES IN-REPLY-TO'
+
+# How a folder sync found out what changed
+SYNC_INITIAL = 'initial'      # Folder indexed from scratch (first sync or new UIDVALIDITY)
+SYNC_UNCHANGED = 'unchanged'  # HIGHESTMODSEQ had not moved
+SYNC_QRESYNC = 'qresync'      # Vanished UIDs and changed flags reported by SELECT (RFC 7162)
+SYNC_CONDSTORE = 'condstore'  # Changed flags from FETCH CHANGEDSINCE, expunges from UID SEARCH
+SYNC_RESCAN = 'rescan'        # No mod-sequences; all flags and UIDs re-read
+
+# Indexed header columns and the header each one holds
+_HEADER_COLUMNS = (
+    ('message_id', 'Message-ID'),
+    ('in_reply_to', 'In-Reply-To'),
+    ('refs', 'References'),
+    ('subject', 'Subject'),
+    ('from_addr', 'From'),
+    ('to_addr', 'To'),
+    ('cc_addr', 'Cc'),
+    ('date', 'Date'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    account TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    last_uid INTEGER NOT NULL DEFAULT 0,
+    highest_modseq INTEGER,
+    synced_at TEXT,
+    PRIMARY KEY (account, folder)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    account TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    internal_date TEXT,
+    message_id TEXT,
+    in_reply_to TEXT,
+    refs TEXT,
+    subject TEXT,
+    subject_key TEXT,
+    from_addr TEXT,
+    to_addr TEXT,
+    cc_addr TEXT,
+    date TEXT,
+    flags TEXT,
+    body TEXT,
+    gm_thrid INTEGER,
+    gm_msgid INTEGER,
+    thread_id TEXT,
+    thread_size INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account, folder, uid)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (account, folder, internal_date);
+CREATE INDEX IF NOT EXISTS idx_messages_reply ON messages (account, folder, in_reply_to);
+"""
+
+# Needs the gm_thrid column, which older index files only get after _ADDED_COLUMNS is applied
+_GMAIL_THREAD_INDEX = 'CREATE INDEX IF NOT EXISTS idx_messages_gm_thread ON messages (account, gm_thrid)'
+
+# Columns added after the first release of the schema
+_ADDED_COLUMNS = (
+    ('folders', 'highest_modseq', 'INTEGER'),
+    ('messages', 'flags', 'TEXT'),
+    ('messages', 'gm_thrid', 'INTEGER'),
+    ('messages', 'gm_msgid', 'INTEGER'),
+)
+
+_MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+_INTERNAL_DATE = re.compile(r'\s*(\d{1,2})-([A-Za-z]{3})-(\d{4})')
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _account_key(account: str) -> str:
+    return account.strip().lower()
+
+
+def _folder_key(folder: str) -> str:
+    folder = folder.strip().strip('"')
+    return INBOX if folder.upper() == INBOX else folder
+
+
+def quote_mailbox(folder: str) -> str:
+    """Quote a mailbox name for SELECT, e.g. [Gmail]/Sent Mail -> "[Gmail]/Sent Mail"."""
+    folder = _folder_key(folder).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{folder}"'
+
+
+def _day(value) -> Optional[str]:
+    """Format a date or datetime as the YYYY-MM-DD key used for internal dates."""
+    return value.strftime("%Y-%m-%d") if value else None
+
+
+def _internal_day(value) -> Optional[str]:
+    # INTERNALDATE looks like "17-Jul-1996 02:44:25 -0700"; SINCE/BEFORE compare only the date part
+    if isinstance(value, bytes):
+        value = value.decode('ascii', 'replace')
+    match = _INTERNAL_DATE.match(value or '')
+    if not match or match.group(2).lower() not in _MONTHS:
+        return None
+    month = _MONTHS.index(match.group(2).lower()) + 1
+    return f"{match.group(3)}-{month:02d}-{int(match.group(1)):02d}"
+
+
+def _response_int(mail: imaplib.IMAP4, code: str) -> Optional[int]:
+    # Response codes such as [UIDVALIDITY 3] are collected by imaplib under the code name
+    values = [value for value in mail.response(code)[1] if value]
+    try:
+        return int(values[-1].split()[0]) if values else None
+    except ValueError:
+        return None
+
+
+def _flags_by_uid(records: List[Tuple[int, FetchRecord]]) -> Dict[int, str]:
+    return {
+        int(record['UID']): ' '.join(record.get('FLAGS') or [])
+        for _, record in records if 'UID' in record and 'FLAGS' in record
+    }
+
+
+def _vanished_uids(responses: List[Optional[bytes]]) -> List[int]:
+    # e.g. b'(EARLIER) 41,43:116'
+    uids = []
+    for response in responses:
+        if response:
+            uids.extend(expand_message_set(response.replace(b'(EARLIER)', b'')))
+    return uids
+
+
+def _header_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    # Undecodable header bytes come back as surrogates, which SQLite cannot store
+    return str(value).encode('utf-8', 'surrogateescape').decode('utf-8', 'replace')
+
+
+def _subject_key(subject: Optional[str]) -> str:
+    if not subject:
+        return ''
+    try:
+        subject = str(make_header(decode_header(subject)))
+    except Exception:
+        pass
+    return subject.casefold()
+
+
+class FolderSync(NamedTuple):
+    """Outcome of syncing one folder."""
+    folder: str
+    mode: str
+    added: int
+    removed: int
+    flags_changed: int
+    gmail_ids_added: int = 0
+    complete: bool = True
+
+
+
+class MailboxIndex:
+    """
+    Local index of the messages in each account's folders.
+
+    Messages are keyed by (account, folder, UID) and stored with their
+    parsed headers, internal date, conversation thread and, once fetched,
+    the start of their plain-text body. Each folder remembers its
+    UIDVALIDITY, the highest UID synced and the HIGHESTMODSEQ it was
+    synced at, so a sync only downloads the headers of messages that
+    arrived since the last one, plus the flags and expunges that changed
+    (see sync_folder). A UIDVALIDITY
+    change means the server renumbered the folder, and its entries are
+    dropped and rebuilt.
+
+    Like the job store, the database runs in WAL mode with one connection
+    per thread.
+
+    Args:
+        path: Path of the SQLite database file
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_DB):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        for table, column, column_type in _ADDED_COLUMNS:
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if column not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+        conn.execute(_GMAIL_THREAD_INDEX)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def folder_state(self, account: str, folder: str) -> Optional[Dict]:
+        """Return the folder's UIDVALIDITY, last synced UID, HIGHESTMODSEQ and sync time, or None if never synced."""
+        columns = ('uidvalidity', 'last_uid', 'highest_modseq', 'synced_at')
+        row = self._connection().execute(
+            f'SELECT {", ".join(columns)} FROM folders WHERE account = ? AND folder = ?',
+            (_account_key(account), _folder_key(folder))
+        ).fetchone()
+        return dict(zip(columns, row)) if row else None
+
+    def _reset_folder(self, account: str, folder: str, uidvalidity: int):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM messages WHERE account = ? AND folder = ?', (account, folder))
+            conn.execute(
+                'INSERT OR REPLACE INTO folders (account, folder, uidvalidity, last_uid, synced_at) '
+                'VALUES (?, ?, ?, 0, ?)',
+                (account, folder, uidvalidity, _now())
+            )
+
+    @staticmethod
+    def _message_row(account: str, folder: str, uid: int, record: FetchRecord) -> tuple:
+        headers = email.message_from_bytes(body_section(record) or b'')
+        values = {column: _header_text(headers.get(header)) for column, header in _HEADER_COLUMNS}
+        for column in ('message_id', 'in_reply_to'):
+            if values[column]:
+                values[column] = values[column].strip()
+        return (
+            account, folder, uid, _internal_day(record.get('INTERNALDATE')),
+            *values.values(), _subject_key(values['subject']), ' '.join(record.get('FLAGS') or []),
+            gmail_id(record, 'X-GM-THRID'), gmail_id(record, 'X-GM-MSGID')
+        )
+
+    def _indexed_uids(self, account: str, folder: str) -> Set[int]:
+        return {
+            row[0] for row in self._connection().execute(
+                'SELECT uid FROM messages WHERE account = ? AND folder = ?', (account, folder)
+            )
+        }
+
+    def _remove_uids(self, account: str, folder: str, uids: Iterable[int]) -> int:
+        conn = self._connection()
+        with conn:
+            cursor = conn.executemany(
+                'DELETE FROM messages WHERE account = ? AND folder = ? AND uid = ?',
+                [(account, folder, uid) for uid in uids]
+            )
+        return max(cursor.rowcount, 0)
+
+    def _update_flags(self, account: str, folder: str, flags: Dict[int, str]) -> int:
+        conn = self._connection()
+        with conn:
+            cursor = conn.executemany(
+                'UPDATE messages SET flags = ? WHERE account = ? AND folder = ? AND uid = ? AND flags IS NOT ?',
+                [(value, account, folder, uid, value) for uid, value in flags.items()]
+            )
+        return max(cursor.rowcount, 0)
+
+    @staticmethod
+    def _fetch_flags(mail: imaplib.IMAP4, last_uid: int, changed_since: Optional[int] = None) -> Dict[int, str]:
+        items = '(UID FLAGS)' + (f' (CHANGEDSINCE {changed_since})' if changed_since else '')
+        status, data = mail.uid('FETCH', f'1:{last_uid}', items)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"FETCH failed with status: {status}")
+        return _flags_by_uid(parse_fetch_response(data))
+
+    @staticmethod
+    def _search_uids(mail: imaplib.IMAP4, message_set: str) -> List[int]:
+        status, data = mail.uid('SEARCH', None, f'UID {message_set}')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID SEARCH failed with status: {status}")
+        return [int(value) for value in (data[0] or b'').split()]
+
+    def _backfill_gmail_ids(self, mail: imaplib.IMAP4, account: str, folder: str, batch_size: int) -> int:
+        conn = self._connection()
+        uids = [
+            row[0] for row in conn.execute(
+                'SELECT uid FROM messages WHERE account = ? AND folder = ? AND gm_thrid IS NULL ORDER BY uid',
+                (account, folder)
+            )
+        ]
+        added = 0
+        for batch, records in fetch_batched(mail, uids, f'({GMAIL_ID_ITEMS})', batch_size=batch_size, uid=True):
+            updates = [
+                (gmail_id(record, 'X-GM-THRID'), gmail_id(record, 'X-GM-MSGID'), account, folder, uid)
+                for uid, record in records.items() if gmail_id(record, 'X-GM-THRID') is not None
+            ]
+            with conn:
+                conn.executemany(
+                    'UPDATE messages SET gm_thrid = ?, gm_msgid = ? WHERE account = ? AND folder = ? AND uid = ?',
+                    updates
+                )
+            added += len(updates)
+        return added
+
+    def sync_folder(
+        self,
+        mail: imaplib.IMAP4,
+        account: str,
+        folder: str,
+        batch_size: int = 500,
+        qresync: bool = False,
+        gmail: bool = False,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> FolderSync:
+        """
+        Bring one folder of the index up to date with the server.
+
+        New messages are found with UID SEARCH UID n:* above the last
+        synced UID, and their header fields and flags fetched, one FETCH
+        per batch. The watermark is saved after every batch, so an
+        interrupted sync picks up where it stopped.
+
+        Changes to messages already indexed are found in the cheapest way
+        the server allows:
+
+        - QRESYNC: the SELECT itself reports the UIDs expunged and the flags
+          changed since the last sync's HIGHESTMODSEQ
+        - CONDSTORE: flags come from FETCH (CHANGEDSINCE modseq), and
+          expunged UIDs from a UID SEARCH over the indexed range
+        - neither: every flag and UID in the indexed range is re-read
+
+        With CONDSTORE or QRESYNC, an unchanged HIGHESTMODSEQ means nothing
+        happened in the folder and no further command is sent. The folder
+        is left selected read-only.
+
+        On Gmail, each message's X-GM-THRID and X-GM-MSGID come in the same
+        FETCH as its headers. Messages indexed without them are filled in
+        with one FETCH per batch.
+
+        When should_stop returns True after a batch, the sync ends there
+        with complete=False; the next sync carries on from that batch. At
+        least one batch is synced per call, so repeated runs make progress.
+
+        Args:
+            mail: Logged-in IMAP connection
+            account: Account the connection belongs to
+            folder: Mailbox name, e.g. '[Gmail]/Sent Mail' or 'INBOX'
+            batch_size: Messages per FETCH command
+            qresync: QRESYNC has been enabled on the connection
+            gmail: The server supports Gmail's X-GM-THRID and X-GM-MSGID
+            should_stop: Checked after each batch of new messages
+
+        Returns:
+            FolderSync: What the sync did
+        """
+        account, folder = _account_key(account), _folder_key(folder)
+        state = self.folder_state(account, folder)
+        condstore = qresync or 'CONDSTORE' in mail.capabilities
+
+        mailbox = quote_mailbox(folder)
+        use_qresync = qresync and state is not None and bool(state['highest_modseq']) and state['last_uid'] > 0
+        if use_qresync:
+            mailbox += f" (QRESYNC ({state['uidvalidity']} {state['highest_modseq']}))"
+        status, _ = mail.select(mailbox, readonly=True)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Could not select folder {folder}")
+        uidvalidity = _response_int(mail, 'UIDVALIDITY') or 0
+        highest_modseq = _response_int(mail, 'HIGHESTMODSEQ') if condstore else None
+        # Always collect these, so they are not mistaken for answers to a later FETCH
+        vanished = mail.response('VANISHED')[1]
+        changed = mail.response('FETCH')[1]
+
+        removed = flags_changed = gmail_ids_added = 0
+        if state is None or state['uidvalidity'] != uidvalidity:
+            self._reset_folder(account, folder, uidvalidity)
+            last_uid, mode = 0, SYNC_INITIAL
+        else:
+            # Fill in missing Gmail IDs only now that the indexed UIDs are known to be valid
+            if gmail:
+                gmail_ids_added = self._backfill_gmail_ids(mail, account, folder, batch_size)
+            if highest_modseq and highest_modseq == state['highest_modseq']:
+                return FolderSync(folder, SYNC_UNCHANGED, 0, 0, 0, gmail_ids_added)
+
+            last_uid = state['last_uid']
+            if use_qresync:
+                mode = SYNC_QRESYNC
+                removed = self._remove_uids(account, folder, _vanished_uids(vanished))
+                flags_changed = self._update_flags(account, folder, _flags_by_uid(parse_fetch_response(changed)))
+            elif last_uid:
+                mode = SYNC_CONDSTORE if highest_modseq and state['highest_modseq'] else SYNC_RESCAN
+                present = set(self._search_uids(mail, f'1:{last_uid}'))
+                removed = self._remove_uids(account, folder, self._indexed_uids(account, folder) - present)
+                changed_since = state['highest_modseq'] if mode == SYNC_CONDSTORE else None
+                flags_changed = self._update_flags(account, folder, self._fetch_flags(mail, last_uid, changed_since))
+            else:
+                mode = SYNC_RESCAN
+
+        # n:* always matches the highest UID, even when that is below n
+        uids = sorted(uid for uid in self._search_uids(mail, f'{last_uid + 1}:*') if uid > last_uid)
+
+        columns = ', '.join(column for column, _ in _HEADER_COLUMNS)
+        insert = (
+            f'INSERT OR IGNORE INTO messages (account, folder, uid, internal_date, {columns}, subject_key, flags, '
+            f'gm_thrid, gm_msgid) VALUES ({", ".join("?" * (len(_HEADER_COLUMNS) + 8))})'
+        )
+        gmail_items = f'{GMAIL_ID_ITEMS} ' if gmail else ''
+        items = f'(INTERNALDATE FLAGS {gmail_items}BODY.PEEK[HEADER.FIELDS ({INDEX_HEADER_FIELDS})])'
+        conn = self._connection()
+        added = 0
+        for batch, records in fetch_batched(mail, uids, items, batch_size=batch_size, uid=True):
+            rows = [self._message_row(account, folder, uid, records[uid]) for uid in batch if uid in records]
+            with conn:
+                conn.executemany(insert, rows)
+                conn.execute(
+                    'UPDATE folders SET last_uid = ?, synced_at = ? WHERE account = ? AND folder = ?',
+                    (batch[-1], _now(), account, folder)
+                )
+            added += len(batch)
+            # Batches are fetched lazily, so stopping here skips the next FETCH
+            if should_stop and should_stop():
+                break
+
+        if added < len(uids):
+            return FolderSync(folder, mode, added, removed, flags_changed, gmail_ids_added, complete=False)
+
+        # Only a completed sync may advance the modseq, or changes could be skipped next time
+        with conn:
+            conn.execute(
+                'UPDATE folders SET highest_modseq = ?, synced_at = ? WHERE account = ? AND folder = ?',
+                (highest_modseq, _now(), account, folder)
+            )
+        return FolderSync(folder, mode, added, removed, flags_changed, gmail_ids_added)
+
+    def sync(
+        self,
+        mail: imaplib.IMAP4,
+        account: str,
+        folders: Sequence[str],
+        batch_size: int = 500,
+        pool: Optional[IMAPConnectionPool] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> List[FolderSync]:
+        """
+        Sync several folders, then refresh the threads if messages came or went.
+
+        QRESYNC is used when the server offers it and it is on for the
+        connection: pooled and session manager connections enable it at
+        login, and any other connection has it enabled here if no mailbox
+        is selected yet. Gmail thread IDs are indexed when the server has Gmail's extensions.
+
+        Args:
+            mail: Logged-in IMAP connection
+            account: Account the connection belongs to
+            folders: Mailbox names
+            batch_size: Messages per FETCH command
+            pool: Connections to the same account. When given, the folders are
+                synced at the same time, each over its own pooled connection
+            should_stop: Passed on to sync_folder, to end the sync early
+
+        Returns:
+            List[FolderSync]: One result per folder
+        """
+        if pool is None or len(folders) < 2:
+            qresync = enable_qresync(mail)
+            gmail = supports_gmail_extensions(mail)
+            results = [self.sync_folder(mail, account, folder, batch_size, qresync, gmail, should_stop) for folder in folders]
+        else:
+            def sync_one(folder: str) -> FolderSync:
+                with pool.connection() as pooled:
+                    qresync = enable_qresync(pooled)
+                    gmail = supports_gmail_extensions(pooled)
+                    return self.sync_folder(pooled, account, folder, batch_size, qresync, gmail, should_stop)
+
+            with ThreadPoolExecutor(max_workers=min(pool.size, len(folders)), thread_name_prefix='imap-sync') as executor:
+                results = list(executor.map(sync_one, folders))
+        if any(result.added or result.removed or result.gmail_ids_added for result in results):
+            self.rebuild_threads(account)
+        return results
+
+    def rebuild_threads(self, account: str) -> int:
+        """
+        Recompute the thread of every message of an account across its folders.
+
+        When every message has a Gmail thread ID, threads are Gmail's own and
+        their sizes come from a single GROUP BY on that ID, counting each
+        X-GM-MSGID once (a message can sit in more than one folder).
+        Otherwise threads are rebuilt from References and In-Reply-To with a
+        ThreadIndex. Only rows whose thread changed are written back.
+
+        Returns:
+            int: Number of messages whose thread changed
+        """
+        account = _account_key(account)
+        conn = self._connection()
+        without_gmail_id = conn.execute(
+            'SELECT COUNT(*) FROM messages WHERE account = ? AND gm_thrid IS NULL', (account,)
+        ).fetchone()[0]
+
+        if not without_gmail_id:
+            thread_sizes = dict(conn.execute(
+                'SELECT gm_thrid, COUNT(DISTINCT gm_msgid) FROM messages WHERE account = ? GROUP BY gm_thrid',
+                (account,)
+            ))
+            rows = conn.execute(
+                'SELECT rowid, gm_thrid, thread_id, thread_size FROM messages WHERE account = ?', (account,)
+            )
+            assignments = (
+                (rowid, str(gm_thrid), thread_sizes[gm_thrid], thread_id, thread_size)
+                for rowid, gm_thrid, thread_id, thread_size in rows
+            )
+        else:
+            rows = conn.execute(
+                'SELECT rowid, message_id, refs, in_reply_to, thread_id, thread_size FROM messages '
+                'WHERE account = ?',
+                (account,)
+            ).fetchall()
+            threads = ThreadIndex()
+            threads.add_all((row[1], row[2], row[3]) for row in rows)
+            assignments = (
+                (rowid, threads.thread_id(message_id), threads.thread_size(message_id), thread_id, thread_size)
+                for rowid, message_id, _, _, thread_id, thread_size in rows
+            )
+
+        updates = [
+            (new_thread, new_size, rowid)
+            for rowid, new_thread, new_size, thread_id, thread_size in assignments
+            if (new_thread, new_size) != (thread_id, thread_size)
+        ]
+        with conn:
+            conn.executemany('UPDATE messages SET thread_id = ?, thread_size = ? WHERE rowid = ?', updates)
+        return len(updates)
+
+    @staticmethod
+    def _message_filter(
+        account: str,
+        folder: str,
+        since,
+        before,
+        subject: Optional[str],
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        cc: Union[str, Sequence[str], None] = None
+    ) -> Tuple[str, list]:
+        where = 'account = ? AND folder = ?'
+        params: list = [_account_key(account), _folder_key(folder)]
+        if since:
+            where += ' AND internal_date >= ?'
+            params.append(_day(since))
+        if before:
+            where += ' AND internal_date < ?'
+            params.append(_day(before))
+        for keyword in subject_keywords(subject):
+            where += ' AND instr(subject_key, ?) > 0'
+            params.append(keyword.casefold())
+        for column, value in (('from_addr', sender), ('to_addr', recipient)):
+            if value and value.strip():
+                where += f' AND instr(lower({column}), ?) > 0'
+                params.append(value.strip().lower())
+        cc_values = any_of(cc)
+        if cc_values:
+            where += ' AND (' + ' OR '.join(['instr(lower(cc_addr), ?) > 0'] * len(cc_values)) + ')'
+            params.extend(value.lower() for value in cc_values)
+        return where, params
+
+    def messages(
+        self,
+        account: str,
+        folder: str,
+        since=None,
+        before=None,
+        subject: Optional[str] = None,
+        limit: Optional[int] = None,
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        cc: Union[str, Sequence[str], None] = None
+    ) -> List[Dict]:
+        """
+        Query indexed messages in UID order, with the same meaning as IMAP SEARCH.
+
+        Args:
+            account: Account the folder belongs to
+            folder: Mailbox name
+            since: Internal date on or after this date (SINCE)
+            before: Internal date before this date (BEFORE)
+            subject: Keywords that must all be case-insensitive substrings of the
+                decoded subject (one SUBJECT key each); see subject_keywords
+            limit: Maximum number of messages
+            sender: Case-insensitive substring of the From header (FROM)
+            recipient: Case-insensitive substring of the To header (TO)
+            cc: Case-insensitive substring of the Cc header (CC), or several
+                alternatives of which any may match (OR CC ... CC ...)
+
+        Returns:
+            List[Dict]: One dictionary per message holding the headers that are
+            present under their header names ('Subject', 'To', ...), plus 'uid',
+            'internal_date', 'flags', 'body', 'thread_id' and 'thread_size'
+        """
+        return [
+            message
+            for page in self.iter_messages(
+                account, folder, since, before, subject, limit, sender=sender, recipient=recipient, cc=cc
+            )
+            for message in page
+        ]
+
+    def iter_messages(
+        self,
+        account: str,
+        folder: str,
+        since=None,
+        before=None,
+        subject: Optional[str] = None,
+        limit: Optional[int] = None,
+        page_size: int = 500,
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        cc: Union[str, Sequence[str], None] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Query indexed messages like messages(), a page at a time.
+
+        Each page is its own query continuing after the last UID of the
+        previous one, so a large folder is never held in memory and no
+        cursor stays open while the caller writes to the index.
+
+        Yields:
+            List[Dict]: Up to page_size messages, as returned by messages()
+        """
+        columns = ', '.join(column for column, _ in _HEADER_COLUMNS)
+        where, params = self._message_filter(account, folder, since, before, subject, sender, recipient, cc)
+        query = (
+            f'SELECT uid, internal_date, flags, body, thread_id, thread_size, {columns} FROM messages '
+            f'WHERE {where} AND uid > ? ORDER BY uid LIMIT ?'
+        )
+
+        last_uid, remaining = 0, limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = self._connection().execute(query, params + [last_uid, size]).fetchall()
+            if not rows:
+                return
+
+            page = []
+            for row in rows:
+                message = dict(zip(('uid', 'internal_date', 'flags', 'body', 'thread_id', 'thread_size'), row[:6]))
+                message.update(
+                    (header, value) for (_, header), value in zip(_HEADER_COLUMNS, row[6:]) if value is not None
+                )
+                page.append(message)
+            yield page
+
+            last_uid = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
+
+    def count_messages(
+        self,
+        account: str,
+        folder: str,
+        since=None,
+        before=None,
+        subject: Optional[str] = None,
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        cc: Union[str, Sequence[str], None] = None
+    ) -> int:
+        """Count the messages messages() would return without a limit."""
+        where, params = self._message_filter(account, folder, since, before, subject, sender, recipient, cc)
+        return self._connection().execute(f'SELECT COUNT(*) FROM messages WHERE {where}', params).fetchone()[0]
+
+    def load_bodies(
+        self,
+        mail: imaplib.IMAP4,
+        account: str,
+        folder: str,
+        messages: List[Dict],
+        max_bytes: Optional[int] = None,
+        batch_size: int = 500
+    ):
+        """
+        Fill in 'body' for messages from messages() whose text was never fetched.
+
+        The plain-text part (at most max_bytes of it) is fetched once and
+        kept in the index; messages without one get an empty body.
+        """
+        missing = {message['uid']: message for message in messages if message.get('body') is None}
+        if not missing:
+            return
+
+        account, folder = _account_key(account), _folder_key(folder)
+        status, _ = mail.select(quote_mailbox(folder), readonly=True)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Could not select folder {folder}")
+
+        conn = self._connection()
+        for batch, records in fetch_batched(mail, sorted(missing), '(BODYSTRUCTURE)', batch_size=batch_size, uid=True):
+            bodies = fetch_text_bodies(mail, records, max_bytes, uid=True)
+            updates = []
+            for uid in batch:
+                if uid in records:
+                    missing[uid]['body'] = bodies.get(uid, '')
+                    updates.append((missing[uid]['body'], account, folder, uid))
+            with conn:
+                conn.executemany('UPDATE messages SET body = ? WHERE account = ? AND folder = ? AND uid = ?', updates)
+
+    def count_to(self, account: str, folder: str, address: str) -> int:
+        """Count the messages whose To header contains an address (IMAP SEARCH TO)."""
+        row = self._connection().execute(
+            'SELECT COUNT(*) FROM messages WHERE account = ? AND folder = ? AND instr(lower(to_addr), ?) > 0',
+            (_account_key(account), _folder_key(folder), address.strip().lower())
+        ).fetchone()
+        return row[0]
+
+    def thread_ids(self, account: str, folder: str = INBOX) -> Set[str]:
+        """Return the threads that have at least one indexed message in a folder."""
+        return {
+            row[0] for row in self._connection().execute(
+                'SELECT DISTINCT thread_id FROM messages WHERE account = ? AND folder = ? AND thread_id IS NOT NULL',
+                (_account_key(account), _folder_key(folder))
+            )
+        }
+
+
+_indexes: Dict[str, MailboxIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_mailbox_index(path: str = DEFAULT_INDEX_DB) -> MailboxIndex:
+    """Return the process-wide index stored at path, creating it if needed."""
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = MailboxIndex(path)
+        return index
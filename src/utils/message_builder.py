@@ -0,0 +1,133 @@
+"""
+Message Builder Module for SmartBrew Email Automation System
+Handles assembling outgoing messages from pre-serialized MIME parts
+"""
+
+import re
+import uuid
+from datetime import datetime
+from email import base64mime
+from email.mime.base import MIMEBase
+from email.policy import compat32
+from typing import Dict, List, Optional
+
+from src.utils.message_template import compile_template
+
+# Same header handling as Message.as_string() (no folding), with SMTP line endings
+_POLICY = compat32.clone(linesep='\r\n', max_line_length=0)
+_CRLF = b'\r\n'
+_EOL = re.compile(r'\r\n|\r|\n')
+
+
+def _header(name: str, value: str) -> bytes:
+    return _POLICY.fold(name, value).encode('ascii')
+
+
+def _text_part_headers(subtype: str, charset: str, encoding: str) -> bytes:
+    return (
+        f'Content-Type: text/{subtype}; charset="{charset}"\r\n'
+        f'MIME-Version: 1.0\r\n'
+        f'Content-Transfer-Encoding: {encoding}\r\n\r\n'
+    ).encode('ascii')
+
+
+class MessageBuilder:
+    """
+    Builds the serialized message for each recipient of a campaign.
+
+    Everything that is the same for every recipient is serialized once:
+    the static headers, the multipart boundaries and the base64-encoded
+    attachments. Building a message encodes only the recipient's headers
+    and the two rendered bodies, then joins them with the cached bytes.
+    The result has CRLF line endings, ready for SMTP DATA, and matches the
+    structure MIMEMultipart('alternative').as_string() produced before.
+
+    Args:
+        subject: Email subject
+        message: Message text with placeholders
+        cc_email: Optional CC email address
+        attachment_parts: Encoded attachment parts from _load_attachment_parts
+        executive_name: Executive name for signature
+        executive_number: Executive contact number
+        executive_gender: Executive gender ('male' or 'female')
+    """
+
+    _PART_HEADERS = {
+        (subtype, ascii_only): _text_part_headers(subtype, 'us-ascii', '7bit') if ascii_only
+        else _text_part_headers(subtype, 'utf-8', 'base64')
+        for subtype in ('plain', 'html') for ascii_only in (True, False)
+    }
+
+    def __init__(
+        self,
+        subject: str,
+        message: str,
+        cc_email: Optional[str] = None,
+        attachment_parts: Optional[List[MIMEBase]] = None,
+        executive_name: Optional[str] = None,
+        executive_number: Optional[str] = None,
+        executive_gender: Optional[str] = None
+    ):
+        self.template = compile_template(message, subject, executive_name, executive_number, executive_gender)
+        self.executive_name = executive_name
+
+        boundary = f"{'=' * 15}{uuid.uuid4().int % 10 ** 19:019d}=="
+        self._content_type = _header('Content-Type', f'multipart/alternative; boundary="{boundary}"') + \
+            _header('MIME-Version', '1.0')
+        self._subject = _header('Subject', subject)
+        self._cc = _header('Cc', cc_email) if cc_email else b''
+        self._separator = f'\r\n--{boundary}\r\n'.encode('ascii')
+        self._first_separator = self._separator[2:]
+
+        # Attachments and the closing boundary never change
+        self._tail = b''.join(
+            self._separator + part.as_bytes(policy=_POLICY) for part in attachment_parts or []
+        ) + f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+        self._from_headers: Dict[str, bytes] = {}
+
+    def _from_header(self, sender_email: str) -> bytes:
+        header = self._from_headers.get(sender_email)
+        if header is None:
+            value = f"{self.executive_name} <{sender_email}>" if self.executive_name else sender_email
+            header = self._from_headers[sender_email] = _header('From', value)
+        return header
+
+    def _text_part(self, subtype: str, text: str) -> bytes:
+        try:
+            body = _EOL.sub('\r\n', text).encode('ascii')
+            return self._PART_HEADERS[(subtype, True)] + body
+        except UnicodeEncodeError:
+            body = base64mime.body_encode(text.encode('utf-8'), eol='\r\n').encode('ascii')
+            return self._PART_HEADERS[(subtype, False)] + body
+
+    def build(self, sender_email: str, recipient_email: str, name: Optional[str], message_id: str) -> bytes:
+        """
+        Build the message for one recipient.
+
+        Args:
+            sender_email: Sender's email address
+            recipient_email: Recipient email address
+            name: Recipient name, may be empty
+            message_id: Message-ID header value
+
+        Returns:
+            bytes: The serialized message
+        """
+        plain_body, html_body = self.template.render(name, recipient_email)
+        to_value = f"{name} <{recipient_email}>" if name else recipient_email
+        return b''.join((
+            self._content_type,
+            self._from_header(sender_email),
+            _header('To', to_value),
+            self._subject,
+            _header('Message-ID', message_id),
+            _header('Date', datetime.now().strftime("%a, %d %b %Y %H:%M:%S +0530")),
+            self._cc,
+            _CRLF,
+            self._first_separator,
+            self._text_part('plain', plain_body),
+            self._separator,
+            self._text_part('html', html_body),
+            self._tail,
+        ))
@@ -0,0 +1,182 @@
+"""
+Message Template Module for SmartBrew Email Automation System
+Handles compiling email messages once and rendering them per recipient
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Slot names filled in per recipient
+NAME_SLOT = 'name'
+EMAIL_SLOT = 'email'
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{subject}</title>
+</head>
+<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #000000;">
+    <div style="max-width: 680px; margin: 0 auto; padding: 20px;">
+        <div style="color: #000000;">
+        """
+
+_HTML_TAIL = """
+        </div>
+    </div>
+</body>
+</html>"""
+
+# Plain text to HTML rewrites, applied in order
+_HTML_REPLACEMENTS = (
+    ('\n\n', '</p><p style="margin: 16px 0;">'),
+    ('\n', '<br>'),
+    ('●', '•'),
+    ('○', '•'),
+    ('________________________________________', '<hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">'),
+    ('💜', '<span style="font-size: 16px;">💜</span>'),
+    ('✨', '<span style="font-size: 16px;">✨</span>'),
+    ('🌿', '<span style="font-size: 16px;">🌿</span>'),
+    ('💬', '<span style="font-size: 16px;">💬</span>'),
+    ('📚', '<span style="font-size: 16px;">📚</span>'),
+)
+
+# Placeholder for the recipient's address once braces have been doubled
+_EMAIL_MARKER = '{{recipient_email}}'
+
+
+def to_html(text: str) -> str:
+    """
+    Convert plain message text to the HTML body markup.
+
+    Braces are doubled as in the original f-string based formatting, so
+    '{recipient_email}' comes out as '{{recipient_email}}' here and is
+    substituted by the template.
+    """
+    text = text.replace('{', '{{').replace('}', '}}')
+    for old, new in _HTML_REPLACEMENTS:
+        text = text.replace(old, new)
+    return text
+
+
+class _Segments:
+    """Static text split around named slots: static[0] slot[0] static[1] ... static[n]."""
+
+    __slots__ = ('static', 'slots')
+
+    def __init__(self, static: List[str], slots: List[str]):
+        self.static = static
+        self.slots = slots
+
+    def render(self, values: dict) -> str:
+        if not self.slots:
+            return self.static[0]
+        parts = [self.static[0]]
+        for slot, text in zip(self.slots, self.static[1:]):
+            parts.append(values[slot])
+            parts.append(text)
+        return ''.join(parts)
+
+
+def _html_segments(plain_static: List[str], subject: str) -> _Segments:
+    """Build the HTML body segments from the plain text segments around the name slot."""
+    static: List[str] = []
+    slots: List[str] = []
+    for index, piece in enumerate(plain_static):
+        if index:
+            slots.append(NAME_SLOT)
+        for chunk_index, chunk in enumerate(to_html(piece).split(_EMAIL_MARKER)):
+            if chunk_index:
+                slots.append(EMAIL_SLOT)
+            static.append(chunk)
+    static[0] = _HTML_HEAD.format(subject=subject) + static[0]
+    static[-1] = static[-1] + _HTML_TAIL
+    return _Segments(static, slots)
+
+
+class MessageTemplate:
+    """
+    A message compiled once for a whole campaign.
+
+    The executive placeholders, salutation rules and HTML conversion are
+    resolved at compile time, leaving only the recipient's name and address
+    as slots. Rendering a recipient is then a single join per body.
+
+    Args:
+        message: Message text with {name}, {Executive Name}, {Executive Number}
+                 and {recipient_email} placeholders
+        subject: Email subject, used as the HTML title
+        executive_name: Executive name for signature
+        executive_number: Executive contact number
+        executive_gender: Executive gender ('male' or 'female')
+    """
+
+    def __init__(
+        self,
+        message: str,
+        subject: str = '',
+        executive_name: Optional[str] = None,
+        executive_number: Optional[str] = None,
+        executive_gender: Optional[str] = None
+    ):
+        self.subject = subject
+
+        # Suffix for known names, salutation for unknown ones
+        if executive_gender:
+            self.name_suffix = " sir" if executive_gender.lower() == 'male' else " ma'am"
+            salutation = "Dear sir" if executive_gender.lower() == 'male' else "Dear ma'am"
+        else:
+            self.name_suffix = ''
+            salutation = "Dear ma'am"  # Default when no gender selected
+
+        if '{name}' in message:
+            named = message.split('{name}')
+            unnamed = [message.replace('Dear {name},', f'{salutation},')]
+        else:
+            named = unnamed = [message]
+
+        named = [self._fill_executive(text, executive_name, executive_number) for text in named]
+        unnamed = [self._fill_executive(text, executive_name, executive_number) for text in unnamed]
+
+        self._named_plain = _Segments(named, [NAME_SLOT] * (len(named) - 1))
+        self._unnamed_plain = unnamed[0]
+        self._named_html = _html_segments(named, subject)
+        self._unnamed_html = _html_segments(unnamed, subject)
+
+    @staticmethod
+    def _fill_executive(text: str, executive_name: Optional[str], executive_number: Optional[str]) -> str:
+        if executive_name:
+            text = text.replace('{Executive Name}', executive_name)
+        if executive_number:
+            text = text.replace('{Executive Number}', executive_number)
+        return text
+
+    def render(self, name: Optional[str], email: str) -> Tuple[str, str]:
+        """
+        Render the message for one recipient.
+
+        Args:
+            name: Recipient name; empty or 'unknown' uses the generic salutation
+            email: Recipient email address
+
+        Returns:
+            Tuple[str, str]: The plain text and HTML bodies
+        """
+        if name and name.lower() != 'unknown':
+            display_name = name + self.name_suffix
+            values = {NAME_SLOT: to_html(display_name), EMAIL_SLOT: email}
+            return self._named_plain.render({NAME_SLOT: display_name}), self._named_html.render(values)
+        return self._unnamed_plain, self._unnamed_html.render({EMAIL_SLOT: email})
+
+
+@lru_cache(maxsize=32)
+def compile_template(
+    message: str,
+    subject: str = '',
+    executive_name: Optional[str] = None,
+    executive_number: Optional[str] = None,
+    executive_gender: Optional[str] = None
+) -> MessageTemplate:
+    """Return the compiled template for a message, reusing it across recipients and sends."""
+    return MessageTemplate(message, subject, executive_name, executive_number, executive_gender)
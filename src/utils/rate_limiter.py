@@ -0,0 +1,211 @@
+"""
+Rate Limiter Module for SmartBrew Email Automation System
+Handles pacing of outgoing emails with per-account token buckets
+"""
+
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+WARMUP_CURVES = ('linear', 'exponential', 'step')
+
+
+@dataclass
+class WarmupRamp:
+    """
+    Warm-up curve that scales the sending rate of a fresh account.
+
+    Args:
+        messages: Number of messages over which the rate ramps up to full speed
+        start_fraction: Fraction of the full rate used for the first message
+        curve: 'linear', 'exponential' or 'step'
+        steps: Number of plateaus when curve is 'step'
+    """
+    messages: int = 50
+    start_fraction: float = 0.2
+    curve: str = 'linear'
+    steps: int = 4
+
+    def __post_init__(self):
+        if self.curve not in WARMUP_CURVES:
+            raise ValueError(f"Unknown warm-up curve '{self.curve}', expected one of {', '.join(WARMUP_CURVES)}")
+        if not 0 < self.start_fraction <= 1:
+            raise ValueError("Warm-up start fraction must be between 0 and 1")
+
+    def fraction(self, sent: int) -> float:
+        """Return the fraction of the full rate allowed after `sent` messages."""
+        if self.messages <= 0 or sent >= self.messages:
+            return 1.0
+
+        progress = sent / self.messages
+        if self.curve == 'exponential':
+            return self.start_fraction * (1 / self.start_fraction) ** progress
+        if self.curve == 'step':
+            step = math.floor(progress * self.steps) / self.steps
+            return self.start_fraction + (1 - self.start_fraction) * step
+        return self.start_fraction + (1 - self.start_fraction) * progress
+
+
+@dataclass
+class RateLimitPolicy:
+    """
+    Sending policy for a single sender account.
+
+    Args:
+        messages_per_minute: Sustained sending rate
+        burst: Number of messages that may be sent back-to-back before pacing kicks in
+        jitter: Maximum random delay in seconds added on top of each wait
+        warmup: Optional warm-up ramp applied to the sustained rate
+    """
+    messages_per_minute: float = 1.0
+    burst: int = 1
+    jitter: float = 0.0
+    warmup: Optional[WarmupRamp] = field(default=None)
+
+    def __post_init__(self):
+        if self.messages_per_minute <= 0:
+            raise ValueError("Messages per minute must be greater than zero")
+        if self.burst < 1:
+            raise ValueError("Burst must be at least 1")
+        if self.jitter < 0:
+            raise ValueError("Jitter cannot be negative")
+
+
+def default_policy(total_recipients: Optional[int] = None) -> RateLimitPolicy:
+    """
+    Policy matching the historical fixed delays: one email every 90 seconds
+    for batches of 30 or fewer recipients, one every 60 seconds otherwise.
+    """
+    if total_recipients is not None and total_recipients <= 30:
+        return RateLimitPolicy(messages_per_minute=60 / 90)
+    return RateLimitPolicy(messages_per_minute=1.0)
+
+
+class TokenBucket:
+    """
+    Token bucket supporting reservations.
+
+    A reservation always takes a token, letting the balance go negative, and
+    returns how long the caller has to wait before the token becomes valid.
+    This keeps concurrent callers fairly ordered without holding a lock
+    while sleeping.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(float(self.capacity), self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def time_until_available(self) -> float:
+        """Return the seconds until a token is available, without taking it."""
+        elapsed = max(0.0, self.clock() - self.updated)
+        tokens = min(float(self.capacity), self.tokens + elapsed * self.rate)
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate
+
+    def reserve(self, rate_per_second: Optional[float] = None) -> float:
+        """Take one token and return the number of seconds until it is available."""
+        now = self.clock()
+        self._refill(now)
+        if rate_per_second is not None:
+            self.rate = rate_per_second
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class SendRateLimiter:
+    """
+    Paces sends for one sender account according to a RateLimitPolicy.
+
+    Args:
+        policy: Sending policy to enforce
+        clock: Monotonic clock, injectable for tests
+        sleep: Sleep function, injectable for tests
+        rng: Random source used for jitter
+    """
+
+    def __init__(
+        self,
+        policy: RateLimitPolicy,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random
+    ):
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+        self.sent = 0
+        self._lock = threading.Lock()
+        self.bucket = TokenBucket(self._rate_for(policy, 0), policy.burst, clock)
+        self.policy = policy
+
+    @staticmethod
+    def _rate_for(policy: RateLimitPolicy, sent: int) -> float:
+        rate = policy.messages_per_minute / 60
+        if policy.warmup:
+            rate *= policy.warmup.fraction(sent)
+        return rate
+
+    def set_policy(self, policy: RateLimitPolicy):
+        """Switch to a new policy, keeping the current token balance."""
+        with self._lock:
+            self.policy = policy
+            self.bucket.capacity = policy.burst
+
+    def reserve(self) -> float:
+        """Reserve a send slot and return the delay (including jitter) before using it."""
+        with self._lock:
+            delay = self.bucket.reserve(self._rate_for(self.policy, self.sent))
+            self.sent += 1
+            jitter = self.policy.jitter
+        if jitter:
+            delay += self.rng() * jitter
+        return delay
+
+    def time_until_available(self) -> float:
+        """Return the seconds until the next send slot opens, without reserving it."""
+        with self._lock:
+            return self.bucket.time_until_available()
+
+    def wait(self) -> float:
+        """Block until the next send is allowed. Returns the time slept."""
+        delay = self.reserve()
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+
+_limiters: Dict[str, SendRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(account: str, policy: Optional[RateLimitPolicy] = None) -> SendRateLimiter:
+    """
+    Return the shared rate limiter for a sender account, creating it if needed.
+
+    Campaigns running for the same account share one bucket so that their
+    combined throughput stays within the account's policy. If a policy is
+    given, it replaces the policy of an existing limiter.
+    """
+    key = account.strip().lower()
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = SendRateLimiter(policy or default_policy())
+            _limiters[key] = limiter
+        elif policy is not None:
+            limiter.set_policy(policy)
+        return limiter
@@ -0,0 +1,166 @@
+"""
+Recipient Preflight Module for SmartBrew Email Automation System
+Handles cleaning a recipient list before any email is sent
+"""
+
+import io
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Optional
+
+import pandas as pd
+
+from src.utils.job_store import DATA_DIR
+from src.utils.recipient_reader import REQUIRED_COLUMNS
+
+DEFAULT_DOMAIN_BLOCKLIST = os.getenv('SMARTBREW_DOMAIN_BLOCKLIST', os.path.join(DATA_DIR, 'domain_blocklist.txt'))
+
+# Practical address syntax check: local part, one @, dotted domain with a 2+ letter TLD
+EMAIL_PATTERN = (
+    r"^[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$"
+)
+
+# Shared mailboxes that rarely reach a single decision maker
+ROLE_ACCOUNTS = frozenset((
+    'abuse', 'accounts', 'admin', 'administrator', 'billing', 'careers', 'contact', 'enquiries',
+    'enquiry', 'hello', 'help', 'hr', 'info', 'jobs', 'mail', 'marketing', 'no-reply', 'noreply',
+    'office', 'postmaster', 'sales', 'security', 'support', 'team', 'webmaster'
+))
+
+# Rejection reasons
+REASON_MISSING = 'Missing email'
+REASON_INVALID = 'Invalid email syntax'
+REASON_DUPLICATE = 'Duplicate email'
+REASON_BLOCKED = 'Blocked domain'
+REASON_ROLE = 'Role account'
+
+
+@dataclass
+class PreflightResult:
+    """
+    Outcome of a preflight run.
+
+    Attributes:
+        clean: Recipients to send to, with normalized 'Email', 'Name' and a 'Role Account' flag
+        rejects: Rows left out, with a 'Reason' column
+        total: Number of rows in the input
+    """
+    clean: pd.DataFrame
+    rejects: pd.DataFrame
+    total: int
+
+    def summary(self) -> dict:
+        """Count the clean rows, role accounts and rejects per reason."""
+        counts = self.rejects['Reason'].value_counts().to_dict() if len(self.rejects) else {}
+        return {
+            'total': self.total,
+            'clean': len(self.clean),
+            'role_accounts': int(self.clean['Role Account'].sum()) if len(self.clean) else 0,
+            'rejected': len(self.rejects),
+            **{reason: int(count) for reason, count in counts.items()}
+        }
+
+    def clean_csv(self) -> io.BytesIO:
+        """Return the clean list as a CSV file object the senders can read."""
+        return io.BytesIO(self.clean[list(REQUIRED_COLUMNS)].to_csv(index=False).encode('utf-8'))
+
+
+def _read_domain_file(path: str) -> FrozenSet[str]:
+    with open(path, encoding='utf-8') as domain_file:
+        return frozenset(
+            line.split('#', 1)[0].strip().lower()
+            for line in domain_file
+            if line.split('#', 1)[0].strip()
+        )
+
+
+@lru_cache(maxsize=8)
+def _cached_domains(path: str, modified: float) -> FrozenSet[str]:
+    return _read_domain_file(path)
+
+
+def load_blocked_domains(path: Optional[str] = DEFAULT_DOMAIN_BLOCKLIST) -> FrozenSet[str]:
+    """
+    Load a blocklist of domains, one per line, with '#' comments.
+
+    The file typically lists domains known to have no MX record or to bounce.
+    It is re-read only when it changes on disk. A missing file means no
+    domains are blocked.
+    """
+    if not path or not os.path.exists(path):
+        return frozenset()
+    return _cached_domains(path, os.path.getmtime(path))
+
+
+def read_recipients_frame(recipients_file) -> pd.DataFrame:
+    """
+    Read the recipients CSV as text, keeping every column.
+
+    Raises:
+        ValueError: If a required column is missing
+    """
+    if hasattr(recipients_file, 'seek'):
+        recipients_file.seek(0)
+    df = pd.read_csv(recipients_file, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    df.columns = [str(column).strip() for column in df.columns]
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns in CSV: {', '.join(missing_columns)}")
+    return df
+
+
+def preflight_recipients(
+    df: pd.DataFrame,
+    blocked_domains: Optional[FrozenSet[str]] = None,
+    drop_role_accounts: bool = False
+) -> PreflightResult:
+    """
+    Normalize, dedupe and validate a recipient list in bulk.
+
+    Addresses are stripped and lowercased, then checked in this order:
+    missing, invalid syntax, blocked domain, duplicate of an earlier row,
+    and (if requested) role account. Each rejected row carries the first
+    reason that applied. All checks are vectorized over the DataFrame.
+
+    Args:
+        df: Recipients with 'Email' and 'Name' columns
+        blocked_domains: Domains to reject; defaults to the configured blocklist file
+        drop_role_accounts: Reject role accounts instead of only flagging them
+
+    Returns:
+        PreflightResult: Clean list and rejects report
+    """
+    if blocked_domains is None:
+        blocked_domains = load_blocked_domains()
+
+    df = df.copy()
+    df['Email'] = df['Email'].fillna('').astype(str).str.strip().str.lower()
+    df['Name'] = df['Name'].fillna('').astype(str).str.strip()
+
+    local_part = df['Email'].str.split('@', n=1).str[0]
+    domain = df['Email'].str.rsplit('@', n=1).str[-1]
+    df['Role Account'] = local_part.isin(ROLE_ACCOUNTS)
+
+    missing = df['Email'] == ''
+    invalid = ~missing & ~df['Email'].str.match(EMAIL_PATTERN)
+    blocked = ~missing & ~invalid & domain.isin(blocked_domains)
+    duplicate = ~missing & ~invalid & ~blocked & df['Email'].duplicated()
+    role = df['Role Account'] & drop_role_accounts
+
+    reason = pd.Series('', index=df.index)
+    for mask, label in (
+        (role, REASON_ROLE),
+        (duplicate, REASON_DUPLICATE),
+        (blocked, REASON_BLOCKED),
+        (invalid, REASON_INVALID),
+        (missing, REASON_MISSING),
+    ):
+        # Later assignments win, so the first check in the docstring order is kept
+        reason = reason.mask(mask, label)
+
+    rejected = reason != ''
+    rejects = df[rejected].drop(columns=['Role Account']).assign(Reason=reason[rejected])
+    clean = df[~rejected].reset_index(drop=True)
+    return PreflightResult(clean=clean, rejects=rejects.reset_index(drop=True), total=len(df))
@@ -0,0 +1,96 @@
+"""
+Recipient Reader Module for SmartBrew Email Automation System
+Handles streaming recipients out of large CSV uploads
+"""
+
+import csv
+import io
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, NamedTuple, Union
+
+REQUIRED_COLUMNS = ('Email', 'Name')
+
+# Values pandas reads as missing; kept so names come out as before
+_MISSING_VALUES = frozenset(('', 'nan', 'NaN', 'NA', 'N/A', 'n/a', 'null', 'NULL', 'None'))
+
+RecipientSource = Union[str, BinaryIO]
+
+
+class Recipient(NamedTuple):
+    """One row of the recipients CSV."""
+    email: str
+    name: str
+
+
+@contextmanager
+def _open_text(recipients_file: RecipientSource) -> Iterator[io.TextIOWrapper]:
+    if isinstance(recipients_file, str):
+        with open(recipients_file, newline='', encoding='utf-8-sig') as stream:
+            yield stream
+        return
+
+    # Decode the upload incrementally, then hand it back open for later reads
+    recipients_file.seek(0)
+    stream = io.TextIOWrapper(recipients_file, encoding='utf-8-sig', newline='')
+    try:
+        yield stream
+    finally:
+        stream.detach()
+
+
+def _column_positions(header: List[str]) -> List[int]:
+    header = [column.strip() for column in header]
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing_columns:
+        raise ValueError(f"Missing required columns in CSV: {', '.join(missing_columns)}")
+    return [header.index(column) for column in REQUIRED_COLUMNS]
+
+
+def validate_header(recipients_file: RecipientSource):
+    """
+    Check that the CSV has the required columns, reading only the header row.
+
+    Raises:
+        ValueError: If the file is empty or a required column is missing
+    """
+    with _open_text(recipients_file) as stream:
+        header = next(csv.reader(stream), None)
+    if header is None:
+        raise ValueError("The recipients CSV is empty")
+    _column_positions(header)
+
+
+def iter_recipients(recipients_file: RecipientSource) -> Iterator[Recipient]:
+    """
+    Stream recipients from a CSV file one row at a time.
+
+    The header is validated before the first row is yielded. Blank lines
+    are skipped and a missing name comes out as an empty string. Memory
+    use does not depend on the size of the file.
+
+    Args:
+        recipients_file: Uploaded file object or path with 'Email' and 'Name' columns
+
+    Yields:
+        Recipient: (email, name) for each row
+    """
+    with _open_text(recipients_file) as stream:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("The recipients CSV is empty")
+        email_position, name_position = _column_positions(header)
+        width = max(email_position, name_position) + 1
+
+        for row in reader:
+            if not row or not any(row):
+                continue
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            name = row[name_position]
+            yield Recipient(row[email_position], '' if name in _MISSING_VALUES else name)
+
+
+def count_recipients(recipients_file: RecipientSource) -> int:
+    """Count the recipient rows in a CSV file without keeping them in memory."""
+    return sum(1 for _ in iter_recipients(recipients_file))
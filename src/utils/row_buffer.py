@@ -0,0 +1,102 @@
+"""
+Row Buffer Module for SmartBrew Email Automation System
+Handles an append-only row buffer that spills to a temporary file once it outgrows memory
+"""
+
+import pickle
+import tempfile
+from typing import Any, Iterable, Iterator, List, Optional
+
+# Rows held in memory before the buffer starts writing them to disk
+DEFAULT_MEMORY_ROWS = 5000
+
+
+class RowBuffer:
+    """
+    Append-only sequence of rows with a fixed memory ceiling.
+
+    Up to max_memory_rows rows are kept in memory. When more arrive, the
+    rows in memory are pickled to an anonymous temporary file as one
+    block, and read back block by block when the buffer is iterated, in
+    the order they were added. Rows can be anything picklable; compact
+    tuples keep both the memory and the file small.
+
+    The file is removed when the buffer is closed or garbage-collected.
+
+    Args:
+        max_memory_rows: Rows kept in memory before spilling to disk
+        directory: Where to create the temporary file; defaults to the system temp directory
+    """
+
+    def __init__(self, max_memory_rows: int = DEFAULT_MEMORY_ROWS, directory: Optional[str] = None):
+        self.max_memory_rows = max(1, max_memory_rows)
+        self.directory = directory
+        self._rows: List[Any] = []
+        self._file = None
+        self._spilled = 0
+
+    def __enter__(self) -> 'RowBuffer':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._rows)
+
+    @property
+    def spilled(self) -> int:
+        """Number of rows written to disk."""
+        return self._spilled
+
+    def append(self, row: Any):
+        """Add one row."""
+        self._rows.append(row)
+        if len(self._rows) >= self.max_memory_rows:
+            self._spill()
+
+    def extend(self, rows: Iterable[Any]):
+        """Add rows in order."""
+        for row in rows:
+            self.append(row)
+
+    def _spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.directory)
+        self._file.seek(0, 2)
+        pickle.dump(self._rows, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spilled += len(self._rows)
+        self._rows = []
+
+    def iter_blocks(self) -> Iterator[List[Any]]:
+        """Yield the rows in blocks, oldest first: each block written to disk, then the rows in memory."""
+        if self._file is not None:
+            self._file.flush()
+            position = 0
+            while position < self._file.seek(0, 2):
+                self._file.seek(position)
+                block = pickle.load(self._file)
+                position = self._file.tell()
+                yield block
+        if self._rows:
+            yield list(self._rows)
+
+    def __iter__(self) -> Iterator[Any]:
+        for block in self.iter_blocks():
+            yield from block
+
+    def clear(self):
+        """Drop every row, keeping the buffer usable."""
+        self._rows = []
+        self._spilled = 0
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+
+    def close(self):
+        """Drop every row and delete the temporary file."""
+        self._rows = []
+        self._spilled = 0
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,264 @@
+"""
+Sender Pool Module for SmartBrew Email Automation System
+Handles sharding a bulk campaign across several sender accounts
+"""
+
+import smtplib
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from src.services.smtp_pool import SMTPConnectionPool, get_default_pool
+from src.utils.email_sender import (
+    _bulk_result, _load_attachment_parts, _prepare_bulk_recipients
+)
+from src.utils.message_builder import MessageBuilder
+from src.utils.job_store import JobStore, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED
+from src.utils.rate_limiter import RateLimitPolicy, SendRateLimiter, default_policy, get_rate_limiter
+
+SHARDING_STRATEGIES = ('least_loaded', 'weighted_round_robin')
+
+# Fragments of SMTP replies that mean an account has hit its sending limit
+_QUOTA_MARKERS = (
+    '5.4.5',
+    'quota exceeded',
+    'sending limit exceeded',
+    'daily user sending',
+    'rate limit exceeded',
+)
+
+
+@dataclass
+class SenderAccount:
+    """
+    One mailbox taking part in a sharded campaign.
+
+    Args:
+        email: Account address, also used as the From address
+        app_password: App-specific password
+        daily_quota: Maximum messages this account may send per day. With a job
+            store the count is kept per calendar day and shared by every
+            campaign; without one it only covers the current campaign
+        weight: Share of traffic for weighted round-robin
+        rate_limit_policy: Sending rate for this account; defaults to the standard policy
+    """
+    email: str
+    app_password: str
+    daily_quota: int = 500
+    weight: float = 1.0
+    rate_limit_policy: Optional[RateLimitPolicy] = None
+    sent: int = field(default=0, init=False)
+    sent_today: int = field(default=0, init=False)
+    active: bool = field(default=True, init=False)
+    current_weight: float = field(default=0.0, init=False, repr=False)
+
+    @property
+    def remaining(self) -> int:
+        # sent_today includes this campaign's messages when it comes from the job store
+        return max(0, self.daily_quota - max(self.sent, self.sent_today))
+
+    @property
+    def available(self) -> bool:
+        return self.active and self.remaining > 0
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Return True if an SMTP error means the account has run out of sending quota."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(is_quota_error(smtplib.SMTPResponseException(code, resp))
+                   for code, resp in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        message = error.smtp_error
+        if isinstance(message, bytes):
+            message = message.decode('utf-8', 'replace')
+        message = message.lower()
+        return any(marker in message for marker in _QUOTA_MARKERS)
+    return False
+
+
+def _pick_account(
+    accounts: List[SenderAccount],
+    limiters: Dict[str, SendRateLimiter],
+    strategy: str
+) -> Optional[SenderAccount]:
+    """Choose the account for the next recipient, or None if every account is exhausted."""
+    candidates = [account for account in accounts if account.available]
+    if not candidates:
+        return None
+
+    if strategy == 'weighted_round_robin':
+        # Smooth weighted round-robin: raise every weight, take the highest, pay it back
+        total_weight = sum(account.weight for account in candidates)
+        for account in candidates:
+            account.current_weight += account.weight
+        chosen = max(candidates, key=lambda account: account.current_weight)
+        chosen.current_weight -= total_weight
+        return chosen
+
+    # Least loaded: prefer accounts that can send right now, then the lowest share of quota used
+    return min(
+        candidates,
+        key=lambda account: (
+            limiters[account.email].time_until_available(),
+            max(account.sent, account.sent_today) / max(1, account.daily_quota)
+        )
+    )
+
+
+def send_bulk_emails_multi_account(
+    accounts: List[SenderAccount],
+    recipients_file: UploadedFile,
+    subject: str,
+    message: str,
+    cc_email: str = None,
+    attachment_paths: Optional[List[Union[str, Tuple[str, str]]]] = None,
+    executive_name: str = None,
+    executive_number: str = None,
+    executive_gender: str = None,
+    strategy: str = 'least_loaded',
+    job_store: Optional[JobStore] = None,
+    job_id: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+    smtp_pool: Optional[SMTPConnectionPool] = None
+) -> dict:
+    """
+    Send bulk emails from a CSV file, sharding recipients across several accounts.
+
+    Each recipient goes to the account chosen by the sharding strategy. When
+    an account reports a quota error it is taken out of rotation and the
+    recipient is retried on another account. If every account is exhausted,
+    the remaining recipients are left unsent (and stay pending in the job
+    store, ready to resume).
+
+    Args:
+        accounts (List[SenderAccount]): Sender accounts with their quotas and rates
+        recipients_file (UploadedFile): CSV file with 'Email' and 'Name' columns
+        subject (str): Email subject
+        message (str): Email message body
+        cc_email (str, optional): CC email address
+        attachment_paths (List[Union[str, Tuple[str, str]]], optional): List of attachment paths
+        executive_name (str, optional): Executive name for signature
+        executive_number (str, optional): Executive contact number
+        executive_gender (str, optional): Executive gender ('male' or 'female')
+        strategy (str): 'least_loaded' or 'weighted_round_robin'
+        job_store (JobStore, optional): Store recording per-recipient state
+        job_id (str, optional): Existing job to resume from its pending recipients
+        stop_event (threading.Event, optional): When set, sending stops before the next recipient
+        smtp_pool (SMTPConnectionPool, optional): Connection pool to send through
+
+    Returns:
+        dict: The send_bulk_emails result, plus 'accounts' (messages sent per
+              account) and 'unsent_count' (recipients left when every account was exhausted)
+    """
+    if not accounts:
+        raise ValueError("At least one sender account is required")
+    if strategy not in SHARDING_STRATEGIES:
+        raise ValueError(f"Unknown sharding strategy '{strategy}', expected one of {', '.join(SHARDING_STRATEGIES)}")
+
+    try:
+        job_id, total_recipients, pending = _prepare_bulk_recipients(
+            job_store, job_id, ', '.join(account.email for account in accounts), recipients_file,
+            subject, message, cc_email, executive_name, executive_number, executive_gender
+        )
+
+        pool = smtp_pool or get_default_pool()
+        builder = MessageBuilder(
+            subject, message, cc_email, _load_attachment_parts(attachment_paths),
+            executive_name, executive_number, executive_gender
+        )
+        limiters = {
+            account.email: get_rate_limiter(account.email, account.rate_limit_policy or default_policy(total_recipients))
+            for account in accounts
+        }
+        if job_store:
+            # Start from what each account already sent today, in this or other campaigns
+            for account in accounts:
+                account.sent_today = job_store.sends_today(account.email)
+
+        success_count = 0
+        failed_count = 0
+        unsent_count = 0
+        last_email = None
+        cancelled = False
+
+        # Recipients handed back by an exhausted account are retried first
+        retry = deque()
+        pending = iter(pending)
+
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                cancelled = True
+                break
+
+            row = retry.popleft() if retry else next(pending, None)
+            if row is None:
+                break
+            row_index, email_address, name = row
+
+            account = _pick_account(accounts, limiters, strategy)
+            if account is None:
+                # Every account is out of quota; leave the rest pending
+                unsent_count = 1 + len(retry) + sum(1 for _ in pending)
+                break
+
+            message_id = f"<{uuid.uuid4()}@smartbrew.in>"
+            try:
+                # Claimed by another run of the job; skip it before it takes a send slot
+                if job_store and not job_store.mark_sending(job_id, row_index, message_id):
+                    continue
+
+                limiters[account.email].wait()
+
+                payload = builder.build(account.email, email_address, name, message_id)
+                all_recipients = [email_address]
+                if cc_email:
+                    all_recipients.append(cc_email)
+
+                if job_store:
+                    sent_today = job_store.reserve_send(account.email, account.daily_quota)
+                    if sent_today is None:
+                        # Another campaign used up the account's quota; hand the recipient to another account
+                        account.sent_today = account.daily_quota
+                        job_store.requeue(job_id, row_index)
+                        retry.append(row)
+                        continue
+                    account.sent_today = sent_today
+                smtp_response = pool.send(account.email, account.app_password, account.email, all_recipients, payload)
+                if job_store:
+                    job_store.mark_sent(job_id, row_index, f"{smtp_response} (via {account.email})")
+
+                account.sent += 1
+                success_count += 1
+                last_email = email_address
+
+            except Exception as e:
+                if is_quota_error(e):
+                    # Take the account out of rotation and hand the recipient to another one
+                    print(f"Sender {account.email} hit its sending quota: {str(e)}")
+                    account.active = False
+                    if job_store:
+                        job_store.requeue(job_id, row_index)
+                    retry.append(row)
+                    continue
+
+                print(f"Error sending email to {email_address} via {account.email}: {str(e)}")
+                failed_count += 1
+                if job_store:
+                    job_store.mark_failed(job_id, row_index, str(e), message_id)
+
+        if job_store:
+            job_store.set_job_status(job_id, JOB_CANCELLED if cancelled or unsent_count else JOB_COMPLETED)
+
+        result = _bulk_result(job_store, job_id, success_count, failed_count, last_email)
+        result['accounts'] = {account.email: account.sent for account in accounts}
+        result['unsent_count'] = unsent_count
+        return result
+
+    except Exception as e:
+        if job_store and job_id:
+            job_store.set_job_status(job_id, JOB_FAILED, str(e))
+        raise Exception(f"Error processing bulk emails: {str(e)}")
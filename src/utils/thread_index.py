@@ -0,0 +1,119 @@
+"""
+Thread Index Module for SmartBrew Email Automation System
+Handles grouping messages into conversation threads with a union-find forest
+"""
+
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class ThreadIndex:
+    """
+    Conversation threads over Message-IDs, kept as a disjoint-set forest.
+
+    Every Message-ID seen, as a message or only as a reference, is a node.
+    Adding a message unions it with everything in its References and
+    In-Reply-To headers, so two threads merge as soon as a message links
+    them. A thread is named by its smallest Message-ID, so the result does
+    not depend on the order messages are added in.
+    Lookups use path compression and unions go by size, so each operation
+    takes effectively constant time (O(α(n))).
+
+    Message-IDs are interned and numbered, and the forest lives in flat
+    lists, so a thread costs a few list slots rather than a set of strings.
+    Thread sizes count messages that were added, each Message-ID once,
+    and not IDs that were only referenced.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._parent: List[int] = []
+        self._weight: List[int] = []    # Nodes under a root, for union by size
+        self._messages: List[int] = []  # Messages under a root
+        self._names: List[int] = []     # Node with the smallest Message-ID under a root
+        self._added = bytearray()       # 1 for nodes added as messages, not only referenced
+        self._message_count = 0
+
+    def __len__(self) -> int:
+        """Number of messages added."""
+        return self._message_count
+
+    def __contains__(self, message_id: str) -> bool:
+        node = self._nodes.get(message_id)
+        return node is not None and bool(self._added[node])
+
+    def _node(self, message_id: str) -> int:
+        node = self._nodes.get(message_id)
+        if node is None:
+            node = len(self._parent)
+            message_id = sys.intern(message_id)
+            self._nodes[message_id] = node
+            self._ids.append(message_id)
+            self._parent.append(node)
+            self._weight.append(1)
+            self._messages.append(0)
+            self._names.append(node)
+            self._added.append(0)
+        return node
+
+    def _find(self, node: int) -> int:
+        parent = self._parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression: point every node on the way straight at the root
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def _union(self, first: int, second: int) -> int:
+        """Merge the trees of two roots and return the new root."""
+        if first == second:
+            return first
+        if self._weight[first] < self._weight[second]:
+            first, second = second, first
+        self._parent[second] = first
+        self._weight[first] += self._weight[second]
+        self._messages[first] += self._messages[second]
+        if self._ids[self._names[second]] < self._ids[self._names[first]]:
+            self._names[first] = self._names[second]
+        return first
+
+    def add(self, message_id: str, references: str = '', in_reply_to: str = ''):
+        """
+        Add a message and link it to the messages it refers to.
+
+        Args:
+            message_id: The message's Message-ID; messages without one are ignored
+            references: References header, whitespace-separated Message-IDs
+            in_reply_to: In-Reply-To header
+        """
+        message_id = (message_id or '').strip()
+        if not message_id:
+            return
+
+        node = self._node(message_id)
+        root = self._find(node)
+        if not self._added[node]:
+            self._added[node] = 1
+            self._messages[root] += 1
+            self._message_count += 1
+
+        for reference in f"{references or ''} {in_reply_to or ''}".split():
+            root = self._union(root, self._find(self._node(reference)))
+
+    def add_all(self, messages: Iterable[Tuple[str, str, str]]):
+        """Add (Message-ID, References, In-Reply-To) for each message."""
+        for message_id, references, in_reply_to in messages:
+            self.add(message_id, references, in_reply_to)
+
+    def thread_id(self, message_id: str) -> Optional[str]:
+        """Return the Message-ID that stands for the message's thread, or None if it is unknown."""
+        node = self._nodes.get((message_id or '').strip())
+        return None if node is None else self._ids[self._names[self._find(node)]]
+
+    def thread_size(self, message_id: str) -> int:
+        """Return the number of messages in the message's thread, or 0 if it is unknown."""
+        node = self._nodes.get((message_id or '').strip())
+        return 0 if node is None else self._messages[self._find(node)]
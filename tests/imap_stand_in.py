@@ -0,0 +1,204 @@
+"""
+IMAP Stand-in Module for SmartBrew Email Automation System tests
+Handles a small local IMAP server that advertises or hides CONDSTORE and QRESYNC
+"""
+
+import re
+import socketserver
+import threading
+from typing import Dict, List, Optional
+
+HEADER_FIELDS = re.compile(r'BODY\.PEEK\[HEADER\.FIELDS \(([^)]*)\)\]', re.IGNORECASE)
+
+
+class StandInMessage:
+    """One message of a stand-in folder."""
+
+    def __init__(self, uid: int, headers: Dict[str, str], modseq: int):
+        self.uid = uid
+        self.headers = headers
+        self.flags = ''
+        self.modseq = modseq
+
+
+class StandInFolder:
+    """A folder with UIDs, flags and a modification sequence, as RFC 7162 describes them."""
+
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.messages: List[StandInMessage] = []
+        self.expunged: List[tuple] = []  # (uid, modseq)
+        self.next_uid = 1
+        self.modseq = 1
+
+    def append(self, headers: Dict[str, str]) -> int:
+        self.modseq += 1
+        self.messages.append(StandInMessage(self.next_uid, headers, self.modseq))
+        self.next_uid += 1
+        return self.next_uid - 1
+
+    def set_flags(self, uid: int, flags: str):
+        self.modseq += 1
+        message = next(message for message in self.messages if message.uid == uid)
+        message.flags, message.modseq = flags, self.modseq
+
+    def expunge(self, uid: int):
+        self.modseq += 1
+        self.messages = [message for message in self.messages if message.uid != uid]
+        self.expunged.append((uid, self.modseq))
+
+
+class IMAPStandIn(socketserver.ThreadingTCPServer):
+    """
+    A local IMAP server with just the commands MailboxIndex, the pool and the session manager send.
+
+    Every command is logged as (connection number, command line) in
+    self.commands, so tests can check their order per connection.
+
+    Args:
+        capabilities: Extensions to advertise besides IMAP4rev1, e.g. ['CONDSTORE']
+        folders: Folders by name
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, capabilities: List[str], folders: Dict[str, StandInFolder]):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.capabilities = ['IMAP4rev1', *capabilities]
+        self.folders = folders
+        self.commands: List[tuple] = []
+        self._connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def next_connection(self) -> int:
+        with self._lock:
+            self._connections += 1
+            return self._connections
+
+    def start(self) -> 'IMAPStandIn':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server: IMAPStandIn = self.server
+        connection = server.next_connection()
+        self.folder: Optional[StandInFolder] = None
+        self.write('* OK IMAP stand-in ready')
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            tag, _, command = line.partition(' ')
+            server.commands.append((connection, command))
+            name, _, args = command.partition(' ')
+            name = name.upper()
+            if name == 'UID':
+                name, _, args = args.partition(' ')
+                name = 'UID ' + name.upper()
+
+            if name == 'CAPABILITY':
+                self.write('* CAPABILITY ' + ' '.join(server.capabilities))
+            elif name == 'ENABLE' and 'ENABLE' in server.capabilities:
+                enabled = [value for value in args.split() if value.upper() in server.capabilities]
+                self.write('* ENABLED ' + ' '.join(enabled))
+            elif name in ('SELECT', 'EXAMINE'):
+                if not self.select(args):
+                    self.write(f'{tag} NO no such mailbox')
+                    continue
+            elif name == 'LIST':
+                for folder in server.folders:
+                    self.write(f'* LIST (\\HasNoChildren) "/" "{folder}"')
+            elif name == 'UID SEARCH':
+                self.write('* SEARCH' + ''.join(f' {uid}' for uid in self.search(args)))
+            elif name == 'UID FETCH':
+                self.fetch(args)
+            elif name in ('CLOSE', 'UNSELECT'):
+                self.folder = None
+            elif name == 'LOGOUT':
+                self.write('* BYE')
+                self.write(f'{tag} OK done')
+                return
+            elif name not in ('LOGIN', 'NOOP'):
+                self.write(f'{tag} BAD unknown command')
+                continue
+            self.write(f'{tag} OK done')
+
+    def write(self, line: str):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def select(self, args: str) -> bool:
+        server: IMAPStandIn = self.server
+        name = re.match(r'"((?:[^"\\]|\\.)*)"', args).group(1)
+        self.folder = server.folders.get(name)
+        if self.folder is None:
+            return False
+        self.write(f'* {len(self.folder.messages)} EXISTS')
+        self.write(f'* OK [UIDVALIDITY {self.folder.uidvalidity}] UIDs valid')
+        if 'CONDSTORE' in server.capabilities or 'QRESYNC' in server.capabilities:
+            self.write(f'* OK [HIGHESTMODSEQ {self.folder.modseq}] modseq')
+
+        qresync = re.search(r'\(QRESYNC \((\d+) (\d+)\)\)', args)
+        if qresync and int(qresync.group(1)) == self.folder.uidvalidity:
+            since = int(qresync.group(2))
+            vanished = [str(uid) for uid, modseq in self.folder.expunged if modseq > since]
+            if vanished:
+                self.write('* VANISHED (EARLIER) ' + ','.join(vanished))
+            for number, message in enumerate(self.folder.messages, 1):
+                if message.modseq > since:
+                    self.write(f'* {number} FETCH (UID {message.uid} FLAGS ({message.flags}) MODSEQ ({message.modseq}))')
+        return True
+
+    def uids(self, message_set: str) -> List[int]:
+        highest = self.folder.next_uid - 1
+        wanted = set()
+        for piece in message_set.split(','):
+            first, _, last = piece.partition(':')
+            first = highest if first == '*' else int(first)
+            last = first if not last else highest if last == '*' else int(last)
+            wanted.update(range(min(first, last), max(first, last) + 1))
+        return [message.uid for message in self.folder.messages if message.uid in wanted]
+
+    def search(self, args: str) -> List[int]:
+        # Only UID criteria are needed; n:* always matches the highest UID
+        uids = self.uids(re.search(r'UID (\S+)', args).group(1))
+        if not uids and self.folder.messages and args.rstrip().endswith(':*'):
+            uids = [self.folder.messages[-1].uid]
+        return uids
+
+    def fetch(self, args: str):
+        message_set, _, items = args.partition(' ')
+        changed_since = re.search(r'CHANGEDSINCE (\d+)', items)
+        fields = HEADER_FIELDS.search(items)
+        wanted = set(self.uids(message_set))
+        for number, message in enumerate(self.folder.messages, 1):
+            if message.uid not in wanted or (changed_since and message.modseq <= int(changed_since.group(1))):
+                continue
+            parts = [f'UID {message.uid}', f'FLAGS ({message.flags})']
+            if changed_since:
+                parts.append(f'MODSEQ ({message.modseq})')
+            if 'INTERNALDATE' in items.upper():
+                parts.append('INTERNALDATE "01-Jan-2024 10:00:00 +0000"')
+            if not fields:
+                self.write(f'* {number} FETCH ({" ".join(parts)})')
+                continue
+            names = fields.group(1).upper().split()
+            header = ''.join(
+                f'{key}: {value}\r\n' for key, value in message.headers.items() if key.upper() in names
+            ) + '\r\n'
+            literal = header.encode()
+            self.wfile.write(
+                f'* {number} FETCH ({" ".join(parts)} BODY[HEADER.FIELDS ({fields.group(1).upper()})] '
+                f'{{{len(literal)}}}\r\n'.encode() + literal + b')\r\n'
+            )
@@ -0,0 +1,122 @@
+import imaplib
+
+import pytest
+
+from imap_stand_in import IMAPStandIn, StandInFolder
+from src.services.imap_pool import IMAPConnectionPool, enable_qresync
+from src.services.imap_session import IMAPSessionManager
+from src.utils.mailbox_index import (
+    INBOX, SYNC_CONDSTORE, SYNC_INITIAL, SYNC_QRESYNC, SYNC_RESCAN, MailboxIndex
+)
+
+SENT = 'Sent'
+
+
+def _folder(count: int) -> StandInFolder:
+    folder = StandInFolder()
+    for number in range(1, count + 1):
+        folder.append({
+            'From': 'me@example.com', 'To': f'r{number}@example.com',
+            'Subject': f'Hello {number}', 'Message-ID': f'<m{number}@example.com>',
+        })
+    return folder
+
+
+@pytest.fixture
+def server_with(monkeypatch):
+    servers = []
+
+    def start(capabilities):
+        server = IMAPStandIn(capabilities, {SENT: _folder(6), INBOX: _folder(3)}).start()
+        servers.append(server)
+        monkeypatch.setattr(imaplib, 'IMAP4_SSL', lambda host: imaplib.IMAP4('127.0.0.1', server.port))
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _sync_twice(server, tmp_path, change):
+    """Sync both folders over a pool, apply change on the server, and sync again."""
+    index = MailboxIndex(str(tmp_path / 'index.db'))
+    with IMAPConnectionPool('me@example.com', 'secret', size=2) as pool:
+        # Fetches borrow pooled connections with a folder selected, as an extraction does
+        with pool.connection(SENT), pool.connection(INBOX):
+            pass
+        first = index.sync(None, 'me@example.com', [SENT, INBOX], batch_size=4, pool=pool)
+        change(server.folders)
+        second = index.sync(None, 'me@example.com', [SENT, INBOX], batch_size=4, pool=pool)
+    return index, first, second
+
+
+def _flag_and_expunge(folders):
+    folders[SENT].set_flags(2, '\\Seen')
+    folders[SENT].expunge(5)
+
+
+@pytest.mark.parametrize('capabilities, mode', [
+    (['ENABLE', 'CONDSTORE', 'QRESYNC'], SYNC_QRESYNC),
+    (['CONDSTORE'], SYNC_CONDSTORE),
+    ([], SYNC_RESCAN),
+])
+def test_resync_uses_the_cheapest_mode_the_server_offers(server_with, tmp_path, capabilities, mode):
+    server = server_with(capabilities)
+    index, first, second = _sync_twice(server, tmp_path, _flag_and_expunge)
+
+    assert [result.mode for result in first] == [SYNC_INITIAL, SYNC_INITIAL]
+    assert second[0].mode == mode
+    assert (second[0].removed, second[0].flags_changed) == (1, 1)
+    assert index.folder_state('me@example.com', SENT)['last_uid'] == 6
+
+
+def test_qresync_is_enabled_right_after_login(server_with, tmp_path):
+    server = server_with(['ENABLE', 'CONDSTORE', 'QRESYNC'])
+    _sync_twice(server, tmp_path, _flag_and_expunge)
+
+    connections = {connection for connection, _ in server.commands}
+    assert len(connections) == 2
+    for connection in connections:
+        names = [command.split()[0].upper() for number, command in server.commands if number == connection]
+        assert names[names.index('LOGIN') + 1] == 'ENABLE'
+
+
+@pytest.mark.parametrize('capabilities', [['CONDSTORE'], ['ENABLE', 'CONDSTORE'], []])
+def test_no_enable_without_qresync(server_with, tmp_path, capabilities):
+    server = server_with(capabilities)
+    _sync_twice(server, tmp_path, _flag_and_expunge)
+
+    assert not [command for _, command in server.commands if command.upper().startswith('ENABLE')]
+
+
+def test_sync_stops_between_batches(server_with, tmp_path):
+    server = server_with(['CONDSTORE'])
+    index = MailboxIndex(str(tmp_path / 'index.db'))
+    mail = imaplib.IMAP4_SSL('imap.example.com')
+    mail.login('me@example.com', 'secret')
+
+    partial = index.sync_folder(mail, 'me@example.com', SENT, batch_size=4, should_stop=lambda: True)
+    assert (partial.added, partial.complete) == (4, False)
+    assert not index.folder_state('me@example.com', SENT)['highest_modseq']
+
+    rest = index.sync_folder(mail, 'me@example.com', SENT, batch_size=4)
+    assert (rest.added, rest.complete) == (2, True)
+    assert index.folder_state('me@example.com', SENT)['last_uid'] == 6
+    mail.logout()
+
+
+
+def test_session_manager_enables_qresync_at_login(server_with):
+    server = server_with(['ENABLE', 'CONDSTORE', 'QRESYNC'])
+    manager = IMAPSessionManager(imap_factory=imaplib.IMAP4_SSL)
+    session = manager.acquire('me@example.com', 'secret')
+    try:
+        session.mail.select('"Sent"', readonly=True)
+        # Recorded at login, so still reported once a mailbox is selected
+        assert enable_qresync(session.mail)
+    finally:
+        session.logout()
+
+    names = [command.split()[0].upper() for _, command in server.commands]
+    assert names.count('ENABLE') == 1
+    assert names.index('LOGIN') < names.index('ENABLE') < names.index('EXAMINE')
@@ -0,0 +1,108 @@
+import pytest
+
+from src.utils import rate_limiter
+from src.utils.rate_limiter import (
+    RateLimitPolicy, SendRateLimiter, TokenBucket, WarmupRamp, default_policy, get_rate_limiter
+)
+
+
+class FakeClock:
+    """A monotonic clock that only moves when told to, and records the sleeps it is asked for."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_bucket_allows_a_burst_then_queues_reservations():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=1.0, capacity=2, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+
+
+def test_bucket_refills_with_time_up_to_its_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=0.5, capacity=2, clock=clock)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.advance(1)
+    assert bucket.time_until_available() == pytest.approx(1.0)
+    # Looking does not take a token
+    assert bucket.time_until_available() == pytest.approx(1.0)
+
+    clock.advance(60)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, pytest.approx(2.0)]
+
+
+@pytest.mark.parametrize('curve, sent, fraction', [
+    ('linear', 0, 0.2),
+    ('linear', 2, 0.6),
+    ('linear', 4, 1.0),
+    ('exponential', 0, 0.2),
+    ('exponential', 2, 0.2 * 5 ** 0.5),
+    ('step', 1, 0.4),
+    ('step', 3, 0.8),
+    ('step', 10, 1.0),
+])
+def test_warmup_fraction(curve, sent, fraction):
+    ramp = WarmupRamp(messages=4, start_fraction=0.2, curve=curve, steps=4)
+    assert ramp.fraction(sent) == pytest.approx(fraction)
+
+
+def test_warmup_rejects_unknown_curves_and_fractions():
+    with pytest.raises(ValueError):
+        WarmupRamp(curve='sigmoid')
+    with pytest.raises(ValueError):
+        WarmupRamp(start_fraction=0)
+
+
+def test_limiter_ramps_the_rate_during_warmup():
+    clock = FakeClock()
+    policy = RateLimitPolicy(messages_per_minute=60, warmup=WarmupRamp(messages=2, start_fraction=0.5))
+    limiter = SendRateLimiter(policy, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        limiter.wait()
+
+    # 0.5, then 0.75, then 1 message per second; waits are spent on the fake clock
+    assert clock.sleeps == [pytest.approx(1 / 0.75), pytest.approx(1.0), pytest.approx(1.0)]
+
+
+def test_limiter_adds_jitter_to_reservations():
+    clock = FakeClock()
+    policy = RateLimitPolicy(messages_per_minute=60, jitter=2.0)
+    limiter = SendRateLimiter(policy, clock=clock, sleep=clock.sleep, rng=lambda: 0.25)
+
+    assert limiter.reserve() == pytest.approx(0.5)
+    assert limiter.reserve() == pytest.approx(1.5)
+
+
+def test_limiters_are_shared_per_account(monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+    limiter = get_rate_limiter('Sender@Example.com ', RateLimitPolicy(messages_per_minute=30, burst=3))
+    limiter.reserve()
+
+    same = get_rate_limiter('sender@example.com')
+    assert same is limiter
+    assert same.policy.messages_per_minute == 30
+
+    # A new policy takes over the existing bucket, reservations and all
+    faster = RateLimitPolicy(messages_per_minute=120, burst=5)
+    assert get_rate_limiter('sender@example.com', faster) is limiter
+    assert limiter.policy is faster and limiter.bucket.capacity == 5
+    assert limiter.sent == 1
+
+    assert get_rate_limiter('other@example.com') is not limiter
+    assert get_rate_limiter('other@example.com').policy == default_policy()